@@ -4,10 +4,14 @@ from autofile import file
 from autofile import info
 from autofile import system
 from autofile import fs
+from autofile import check
+from autofile import bundle
 
 __all__ = [
     'file',
     'info',
     'system',
     'fs',
+    'check',
+    'bundle',
 ]
@@ -0,0 +1,126 @@
+""" autofile command-line tools
+
+usage: python -m autofile <command> [options]
+"""
+import sys
+import argparse
+import autofile.system
+import autofile.check
+import autofile.bundle
+
+
+def rebuild_index(args):
+    """ regenerate the SQLite index of a filesystem prefix
+    """
+    nleaves, nfiles = autofile.system.index.rebuild(args.prefix,
+                                                    db_path=args.db_path)
+    print("Indexed {} leaves and {} files under {}"
+          .format(nleaves, nfiles, args.prefix))
+
+
+def check(args):
+    """ check run and save trees for stale runs, missing energies, subrun
+    debris and saved runs
+    """
+    problems = autofile.check.check(
+        run_prefix=args.run_prefix, save_prefix=args.save_prefix,
+        stale_hours=args.stale_hours, nworkers=args.nworkers)
+    for kind, pth in problems:
+        print("{}: {}".format(kind, pth))
+    print("Found {} problems".format(len(problems)))
+
+    if args.repair:
+        repaired = autofile.check.repair(problems)
+        print("Reset {} stale runs".format(len(repaired)))
+    if args.prune:
+        pruned = autofile.check.prune(problems)
+        print("Pruned {} directories".format(len(pruned)))
+
+
+def export(args):
+    """ export a species, reaction or theory subtree to a single-file bundle
+    """
+    archive = sys.stdout.buffer if args.archive == '-' else args.archive
+    nfiles = autofile.bundle.export(args.prefix, args.path, archive,
+                                    compression=args.compression)
+    print("Exported {} files from {}".format(nfiles, args.path),
+          file=sys.stderr)
+
+
+def import_(args):
+    """ import a single-file bundle into a filesystem prefix
+    """
+    archive = sys.stdin.buffer if args.archive == '-' else args.archive
+    nfiles = autofile.bundle.import_(archive, args.prefix, kinds=args.only)
+    print("Imported {} files into {}".format(nfiles, args.prefix),
+          file=sys.stderr)
+
+
+def collect_blobs(args):
+    """ delete the deduplicated file contents that are no longer in use
+    """
+    nblobs, nbytes = autofile.system.blob.collect(args.prefix)
+    print("Deleted {} blobs ({} bytes) from {}"
+          .format(nblobs, nbytes, args.prefix))
+
+
+def main(argv=None):
+    """ run an autofile command
+    """
+    parser = argparse.ArgumentParser(prog='autofile')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    rebuild_parser = subparsers.add_parser(
+        'rebuild-index', help=rebuild_index.__doc__.strip())
+    rebuild_parser.add_argument('prefix')
+    rebuild_parser.add_argument('--db-path', default=None)
+    rebuild_parser.set_defaults(function=rebuild_index)
+
+    check_parser = subparsers.add_parser(
+        'check', help=check.__doc__.strip())
+    check_parser.add_argument('--run-prefix', default=None)
+    check_parser.add_argument('--save-prefix', default=None)
+    check_parser.add_argument('--stale-hours', type=float,
+                              default=autofile.check.STALE_HOURS)
+    check_parser.add_argument('--nworkers', type=int, default=None)
+    check_parser.add_argument('--repair', action='store_true',
+                              help="reset stale runs to failed")
+    check_parser.add_argument('--prune', action='store_true',
+                              help="delete subrun debris and saved runs")
+    check_parser.set_defaults(function=check)
+
+    export_parser = subparsers.add_parser(
+        'export', help=export.__doc__.strip())
+    export_parser.add_argument('prefix')
+    export_parser.add_argument('path',
+                               help="the subtree, relative to the prefix")
+    export_parser.add_argument('archive', help="the bundle ('-' for stdout)")
+    export_parser.add_argument(
+        '--compression', default=autofile.bundle.Compression.GZIP,
+        choices=[autofile.bundle.Compression.NONE,
+                 autofile.bundle.Compression.GZIP,
+                 autofile.bundle.Compression.XZ])
+    export_parser.set_defaults(function=export)
+
+    import_parser = subparsers.add_parser(
+        'import', help=import_.__doc__.strip())
+    import_parser.add_argument('archive', help="the bundle ('-' for stdin)")
+    import_parser.add_argument('prefix')
+    import_parser.add_argument(
+        '--only', nargs='+', default=None, metavar='KIND',
+        help="only import files of these kinds (e.g. .xyz .ene .hess), "
+             "along with the locator files")
+    import_parser.set_defaults(function=import_)
+
+    collect_parser = subparsers.add_parser(
+        'collect-blobs', help=collect_blobs.__doc__.strip())
+    collect_parser.add_argument('prefix')
+    collect_parser.set_defaults(function=collect_blobs)
+
+    args = parser.parse_args(argv)
+    args.function(args)
+
+
+if __name__ == '__main__':
+    main()
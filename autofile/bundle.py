@@ -0,0 +1,201 @@
+""" single-file bundles of filesystem subtrees
+
+A bundle is a (streamable) tar archive of a subtree of a filesystem prefix,
+such as a species, reaction or theory directory. Its first member is an
+index of the files that follow, so the contents of a bundle can be listed
+without reading the rest of it, and a bundle can be written to or read from
+a pipe. Paths are stored relative to the prefix, so a bundle imported into
+another prefix lands at the same place in the tree.
+"""
+import os
+import io
+import json
+import tarfile
+import autofile.file
+from autofile.system import blob
+from autofile.system import index
+from autofile.system import journal
+from autofile.system import model
+
+BUNDLE_INDEX_NAME = 'BUNDLE_INDEX.json'
+BUNDLE_VERSION = 1
+
+# locator files are always imported, so that the tree can still be navigated
+LOCATOR_FILE_NAMES = (index.LOCATOR_FILE_NAME, model.MANIFEST_FILE_NAME)
+
+# pack containers hold the files of packed leaves, whatever their kinds, so
+# they are always imported too
+PACK_FILE_NAMES = (model.PACK_FILE_NAME,)
+
+
+class Compression():
+    """ bundle compression formats """
+    NONE = ''
+    GZIP = 'gz'
+    XZ = 'xz'
+
+
+def export(prefix, subtree_path, archive, compression=Compression.GZIP):
+    """ write a subtree of a filesystem prefix to a bundle
+
+    :param prefix: the filesystem prefix
+    :type prefix: str
+    :param subtree_path: the directory to export, e.g.
+        `spc_fs.leaf.path(spc_locs)` (absolute, or relative to the prefix)
+    :type subtree_path: str
+    :param archive: the bundle file path, or a binary file object to stream
+        the bundle to
+    :param compression: the compression format (see `Compression`)
+    :type compression: str
+    :returns: the number of files exported
+    :rtype: int
+    """
+    prefix = os.path.abspath(prefix)
+    subtree_path = os.path.join(prefix, subtree_path)
+    assert os.path.isdir(subtree_path)
+    rel_root = os.path.relpath(subtree_path, prefix)
+    if rel_root == os.pardir or rel_root.startswith(os.pardir + os.sep):
+        raise ValueError("{} is not inside the prefix {}"
+                         .format(subtree_path, prefix))
+
+    file_dcts = []
+    for dir_pth, dir_names, file_names in os.walk(subtree_path):
+        # the files that link into a blob store are exported as plain files
+        if blob.BLOB_DIR_NAME in dir_names:
+            dir_names.remove(blob.BLOB_DIR_NAME)
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if _is_excluded(file_name):
+                continue
+            pth = os.path.join(dir_pth, file_name)
+            file_dcts.append({'path': os.path.relpath(pth, prefix),
+                              'size': os.path.getsize(pth),
+                              'kind': _kind(file_name)})
+
+    idx_bytes = json.dumps({'version': BUNDLE_VERSION, 'root': rel_root,
+                            'files': file_dcts}, indent=1).encode()
+
+    with _open_tar(archive, 'w|' + compression) as tar_obj:
+        idx_info = tarfile.TarInfo(BUNDLE_INDEX_NAME)
+        idx_info.size = len(idx_bytes)
+        tar_obj.addfile(idx_info, io.BytesIO(idx_bytes))
+        for file_dct in file_dcts:
+            pth = os.path.join(prefix, file_dct['path'])
+            # always store contents, rather than hard links between members
+            member = tar_obj.gettarinfo(pth, arcname=file_dct['path'])
+            member.type = tarfile.REGTYPE
+            member.linkname = ''
+            member.size = os.path.getsize(pth)
+            with open(pth, 'rb') as file_obj:
+                tar_obj.addfile(member, file_obj)
+
+    return len(file_dcts)
+
+
+def contents(archive):
+    """ read the index of a bundle
+
+    :param archive: the bundle file path, or a binary file object
+    :returns: the index, with the root of the subtree ('root') and the path,
+        size and kind of each file ('files')
+    :rtype: dict
+    """
+    with _open_tar(archive, 'r|*') as tar_obj:
+        return _read_index(tar_obj)
+
+
+def import_(archive, prefix, kinds=None):
+    """ extract a bundle into a filesystem prefix
+
+    :param archive: the bundle file path, or a binary file object to stream
+        the bundle from
+    :param prefix: the filesystem prefix
+    :type prefix: str
+    :param kinds: only extract files of these kinds (file extensions, such as
+        `autofile.file.name.Extension.HESSIAN`), along with the locator files
+        and pack containers (see `PACK_FILE_NAMES`); by default, everything
+        is extracted
+    :type kinds: tuple[str]
+    :returns: the number of files extracted
+    :rtype: int
+    """
+    prefix = os.path.abspath(prefix)
+    assert os.path.isdir(prefix)
+
+    nfiles = 0
+    with _open_tar(archive, 'r|*') as tar_obj:
+        idx_dct = _read_index(tar_obj)
+        paths = frozenset(file_dct['path'] for file_dct in idx_dct['files'])
+        for member in tar_obj:
+            if not member.isfile() or member.name not in paths:
+                continue
+            if kinds is not None and not _is_selected(member.name, kinds):
+                continue
+
+            pth = os.path.abspath(os.path.join(prefix, member.name))
+            if not pth.startswith(prefix + os.sep):
+                raise ValueError("Bundle member {} is outside the prefix"
+                                 .format(member.name))
+            os.makedirs(os.path.dirname(pth), exist_ok=True)
+            # files are replaced, rather than overwritten, so that an
+            # interrupted import doesn't leave truncated files, and files
+            # that link into a blob store don't change the blob
+            with tar_obj.extractfile(member) as src_obj:
+                autofile.file.write_stream(pth, src_obj)
+            model.READ_CACHE.invalidate(pth)
+            nfiles += 1
+
+    return nfiles
+
+
+def _read_index(tar_obj):
+    """ read the index, which is the first member of a bundle
+    """
+    member = tar_obj.next()
+    if member is None or member.name != BUNDLE_INDEX_NAME:
+        raise ValueError("This is not an autofile bundle")
+    idx_dct = json.loads(tar_obj.extractfile(member).read().decode())
+    if idx_dct['version'] > BUNDLE_VERSION:
+        raise ValueError("Unsupported bundle version {}"
+                         .format(idx_dct['version']))
+    return idx_dct
+
+
+def _open_tar(archive, mode):
+    """ open a tar archive by path or file object
+    """
+    if isinstance(archive, str):
+        tar_obj = tarfile.open(archive, mode=mode)
+    else:
+        tar_obj = tarfile.open(fileobj=archive, mode=mode)
+    return tar_obj
+
+
+def _is_excluded(file_name):
+    """ is this a file that doesn't belong in a bundle? (indices, which can be
+    rebuilt, journals, temporary files from writes in progress, and lock
+    files)
+    """
+    return (file_name in (index.INDEX_FILE_NAME, journal.JOURNAL_FILE_NAME)
+            or (file_name.startswith('.')
+                and file_name.endswith(('.tmp', '.lock'))))
+
+
+def _is_selected(pth, kinds):
+    """ is this file a locator file, a pack container, or one of these
+    kinds?
+    """
+    file_name = os.path.basename(pth)
+    kind = _kind(file_name)
+    suffix = autofile.file.compression_suffix(kind)
+    if suffix:
+        kind = kind[:-len(suffix)]
+    return (file_name in LOCATOR_FILE_NAMES + PACK_FILE_NAMES
+            or kind in kinds)
+
+
+def _kind(file_name):
+    """ file kind, given by its (full) extension
+    """
+    _, sep, ext = file_name.partition('.')
+    return sep + ext
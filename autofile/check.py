@@ -0,0 +1,250 @@
+""" consistency checks and garbage collection for run and save trees
+
+`check()` walks a run prefix and/or a save prefix, without writing anything
+to them, and reports:
+ - run leaves left in the RUNNING state by jobs that have died
+ - conformer save leaves with a geometry but no energy
+ - subrun directories left behind in run leaves that are no longer running
+ - successful run leaves whose results have already been saved
+
+`repair()` resets stale runs to FAILURE, so that drivers retry them instead
+of skipping them, and `prune()` deletes subrun debris and saved runs.
+"""
+import os
+import time
+import shutil
+import concurrent.futures
+import elstruct
+import autofile.file
+from autofile import fs
+from autofile.system import file_
+from autofile.system import info
+from autofile.system import map_
+
+# runs that haven't written anything for this long are assumed to be dead
+STALE_HOURS = 24.
+
+CHECK_MAX_WORKERS = 16
+
+# the files in a save directory that hold the results of each job
+SAVED_RESULT_FILE_NAMES_DCT = {
+    elstruct.Job.ENERGY: (autofile.file.name.energy(fs.FilePrefix.SP),
+                          autofile.file.name.energy(fs.FilePrefix.HS)),
+    elstruct.Job.OPTIMIZATION: (
+        autofile.file.name.geometry(fs.FilePrefix.GEOM),),
+    elstruct.Job.GRADIENT: (autofile.file.name.gradient(fs.FilePrefix.GRAD),),
+    elstruct.Job.HESSIAN: (autofile.file.name.hessian(fs.FilePrefix.HESS),),
+    elstruct.Job.VPT2: (
+        autofile.file.name.anharmonic_zpve(fs.FilePrefix.VPT2),),
+}
+
+
+class Problem():
+    """ kinds of problems found by `check` """
+    STALE_RUN = 'stale run'
+    MISSING_ENERGY = 'missing energy'
+    SUBRUN_DEBRIS = 'subrun debris'
+    SAVED_RUN = 'saved run'
+
+
+def check(run_prefix=None, save_prefix=None, stale_hours=STALE_HOURS,
+          nworkers=None):
+    """ check a run tree and/or a save tree for problems
+
+    The directories at the top of each prefix are searched for run and
+    conformer trunks in parallel, and each trunk is then checked in parallel
+    as soon as it is found.
+
+    :param run_prefix: the run tree prefix
+    :type run_prefix: str
+    :param save_prefix: the save tree prefix; if a run prefix is also given,
+        runs whose results are in the save tree are reported
+    :type save_prefix: str
+    :param stale_hours: how long a RUNNING job can go without writing
+        anything before it is considered dead
+    :type stale_hours: float
+    :param nworkers: the number of threads (default: `CHECK_MAX_WORKERS`)
+    :type nworkers: int
+    :returns: sorted pairs of problem kinds (see `Problem`) and paths
+    :rtype: tuple[(str, str)]
+    """
+    # (top directory, trunk name, look inside trunks?, trunk check, and
+    # its extra arguments)
+    searches = []
+    if run_prefix is not None:
+        run_prefix = os.path.abspath(run_prefix)
+        save_prefix_ = (None if save_prefix is None else
+                        os.path.abspath(save_prefix))
+        searches.extend(
+            (pth, map_.run_trunk(), False, _check_run_trunk,
+             (run_prefix, save_prefix_, stale_hours))
+            for pth in _top_directories(run_prefix))
+    if save_prefix is not None:
+        # (conformer leaves can hold trees with conformer trunks of their own)
+        searches.extend(
+            (pth, map_.conformer_trunk(), True, _check_conformer_trunk, ())
+            for pth in _top_directories(save_prefix))
+
+    if not searches:
+        return ()
+
+    nworkers = CHECK_MAX_WORKERS if nworkers is None else nworkers
+    with concurrent.futures.ThreadPoolExecutor(nworkers) as executor:
+        search_futures = {
+            executor.submit(_find_trunks, pth, name, nested): (function, args)
+            for pth, name, nested, function, args in searches}
+        check_futures = []
+        for future in concurrent.futures.as_completed(search_futures):
+            function, args = search_futures[future]
+            check_futures.extend(executor.submit(function, pth, *args)
+                                 for pth in future.result())
+        problems = [problem for future in check_futures
+                    for problem in future.result()]
+
+    return tuple(sorted(problems))
+
+
+def repair(problems):
+    """ reset stale runs to FAILURE, so that they will be retried
+
+    :param problems: problems found by `check`
+    :returns: the problems that were repaired
+    """
+    inf_dfile = file_.information(fs.FilePrefix.RUN, function=info.run)
+    repaired = []
+    for kind, pth in problems:
+        if kind == Problem.STALE_RUN and inf_dfile.exists(pth):
+            inf_obj = inf_dfile.read(pth)
+            if inf_obj.status == info.RunStatus.RUNNING:
+                inf_obj.status = info.RunStatus.FAILURE
+                inf_dfile.write(inf_obj, pth)
+                repaired.append((kind, pth))
+    return tuple(repaired)
+
+
+def prune(problems):
+    """ delete subrun debris and runs whose results have been saved
+
+    :param problems: problems found by `check`
+    :returns: the problems that were pruned
+    """
+    pruned = []
+    for kind, pth in problems:
+        if (kind in (Problem.SUBRUN_DEBRIS, Problem.SAVED_RUN)
+                and os.path.isdir(pth)):
+            shutil.rmtree(pth)
+            pruned.append((kind, pth))
+    return tuple(pruned)
+
+
+def _find_trunks(top_pth, trunk_name, nested):
+    """ the trunk directories with this name at or under a directory
+
+    :param nested: look for trunks inside trunks?
+    :type nested: bool
+    """
+    trunk_pths = []
+    if os.path.basename(top_pth) == trunk_name:
+        trunk_pths.append(top_pth)
+        if not nested:
+            return trunk_pths
+
+    for dir_pth, dir_names, _ in os.walk(top_pth):
+        if trunk_name in dir_names:
+            trunk_pths.append(os.path.join(dir_pth, trunk_name))
+            if not nested:
+                dir_names.remove(trunk_name)
+    return trunk_pths
+
+
+def _check_run_trunk(trunk_pth, run_prefix, save_prefix, stale_hours):
+    """ check the run leaves in a run trunk
+    """
+    run_fs = fs.run(os.path.dirname(trunk_pth))
+    inf_dfile = file_.information(fs.FilePrefix.RUN, function=info.run)
+    save_pth = None
+    if save_prefix is not None:
+        save_pth = os.path.join(
+            save_prefix, os.path.relpath(os.path.dirname(trunk_pth),
+                                         run_prefix))
+
+    problems = []
+    # the leaves are listed and read directly, since reading their locators
+    # through the data series would update the trunk manifest
+    for leaf_pth in run_fs.leaf.existing_paths():
+        try:
+            job, = run_fs.leaf.loc_dfile.read(leaf_pth)
+        except FileNotFoundError:
+            continue
+        status = None
+        if inf_dfile.exists(leaf_pth):
+            status = inf_dfile.read(leaf_pth).status
+
+        active = False
+        if status == info.RunStatus.RUNNING:
+            age = time.time() - _latest_mtime(leaf_pth)
+            active = age < stale_hours * 3600.
+            if not active:
+                problems.append((Problem.STALE_RUN, leaf_pth))
+
+        if not active:
+            subrun_fs = fs.subrun(leaf_pth)
+            problems.extend((Problem.SUBRUN_DEBRIS, pth)
+                            for pth in subrun_fs.leaf.existing_paths())
+
+        if (status == info.RunStatus.SUCCESS and save_pth is not None
+                and any(_is_stored(os.path.join(save_pth, name))
+                        for name in SAVED_RESULT_FILE_NAMES_DCT.get(job, ()))):
+            problems.append((Problem.SAVED_RUN, leaf_pth))
+
+    return problems
+
+
+def _check_conformer_trunk(trunk_pth):
+    """ check the conformer save leaves in a conformer trunk
+
+    (Other save directories, such as theory leaves, can legitimately have a
+    geometry without an energy.)
+    """
+    geo_dfile = file_.geometry(fs.FilePrefix.GEOM)
+    ene_dfile = file_.energy(fs.FilePrefix.GEOM)
+    problems = []
+    for dir_pth in _top_directories(trunk_pth):
+        if geo_dfile.exists(dir_pth) and not ene_dfile.exists(dir_pth):
+            problems.append((Problem.MISSING_ENERGY, dir_pth))
+    return problems
+
+
+def _top_directories(prefix):
+    """ the directories at the top of a prefix
+    """
+    return sorted(ent.path for ent in os.scandir(prefix) if ent.is_dir())
+
+
+def _latest_mtime(pth):
+    """ the latest modification time of anything under a directory
+    """
+    mtime = _mtime(pth)
+    for dir_pth, _, file_names in os.walk(pth):
+        mtime = max([mtime, _mtime(dir_pth)] +
+                    [_mtime(os.path.join(dir_pth, name))
+                     for name in file_names])
+    return mtime
+
+
+def _mtime(pth):
+    """ the modification time of a file, or 0 if it has gone (e.g. a
+    temporary file from a write in progress)
+    """
+    try:
+        return os.stat(pth).st_mtime
+    except FileNotFoundError:
+        return 0.
+
+
+def _is_stored(file_pth):
+    """ is this file stored, either plain or compressed?
+    """
+    return any(os.path.isfile(file_pth + suffix)
+               for suffix in ((autofile.file.Compression.NONE,)
+                              + autofile.file.COMPRESSION_SUFFIXES))
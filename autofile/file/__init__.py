@@ -5,6 +5,17 @@ from autofile.file import write
 from autofile.file import read
 from autofile.file._util import read_file
 from autofile.file._util import write_file
+from autofile.file._util import write_stream
+from autofile.file._util import open_file
+from autofile.file._util import Compression
+from autofile.file._util import compression_suffix
+from autofile.file._util import COMPRESSION_SUFFIXES
+from autofile.file._util import read_array
+from autofile.file._util import write_array
+from autofile.file._util import Durability
+from autofile.file._util import set_durability
+from autofile.file._util import durability
+from autofile.file._util import sync
 
 __all__ = [
     'name',
@@ -12,4 +23,14 @@ __all__ = [
     'read',
     'write_file',
     'read_file',
+    'open_file',
+    'Compression',
+    'compression_suffix',
+    'COMPRESSION_SUFFIXES',
+    'write_array',
+    'read_array',
+    'Durability',
+    'set_durability',
+    'durability',
+    'sync',
 ]
@@ -1,19 +1,210 @@
 """ utilities
 """
 import os
+import gzip
+import lzma
+import types
+import atexit
+import shutil
+import binascii
+import threading
+import contextlib
+import numpy
+
+
+class Durability():
+    """ durability policies for file writes
+
+    Every write goes to a temporary file in the target directory, which is
+    then renamed over the target, so readers never see a partial file. The
+    policy determines when the data is forced to disk:
+     - NONE: never (left to the operating system)
+     - FILE: each file, and its directory, is fsynced as it is written
+     - BATCH: files and directories are fsynced together, once `batch_size`
+       writes have accumulated, when `sync()` is called, or at exit
+    """
+    NONE = 'none'
+    FILE = 'file'
+    BATCH = 'batch'
+
+
+class Compression():
+    """ compression formats for stored files, given by their file name
+    suffixes
+
+    Files whose names end in one of these suffixes are compressed on write
+    and decompressed on read.
+    """
+    NONE = ''
+    GZIP = '.gz'
+    XZ = '.xz'
+
+
+COMPRESSION_SUFFIXES = (Compression.GZIP, Compression.XZ)
+
+_SETTINGS = types.SimpleNamespace(durability=Durability.NONE, batch_size=100)
+_PENDING = {'files': set(), 'dirs': set()}
+_PENDING_LOCK = threading.Lock()
+
+
+def set_durability(policy, batch_size=100):
+    """ set the durability policy for file writes
+
+    :param policy: the policy (see `Durability`)
+    :type policy: str
+    :param batch_size: the number of writes to accumulate before a batched
+        sync
+    :type batch_size: int
+    """
+    assert policy in (Durability.NONE, Durability.FILE, Durability.BATCH)
+    sync()
+    _SETTINGS.durability = policy
+    _SETTINGS.batch_size = batch_size
+
+
+def durability():
+    """ the durability policy for file writes, and its batch size (see
+    `set_durability`)
+
+    :rtype: (str, int)
+    """
+    return _SETTINGS.durability, _SETTINGS.batch_size
+
+
+def sync():
+    """ fsync the files and directories written since the last batched sync
+    """
+    with _PENDING_LOCK:
+        file_paths = tuple(_PENDING['files'])
+        dir_paths = tuple(_PENDING['dirs'])
+        _PENDING['files'].clear()
+        _PENDING['dirs'].clear()
+
+    for file_path in file_paths:
+        if os.path.isfile(file_path):
+            _fsync_path(file_path)
+    for dir_path in dir_paths:
+        _fsync_path(dir_path)
 
 
 def read_file(file_path):
-    """ read a file as a string
+    """ read a file as a string, decompressing it if it has a compression
+    suffix
     """
     assert os.path.isfile(file_path)
-    with open(file_path, 'r') as file_obj:
+    with open_file(file_path) as file_obj:
         file_str = file_obj.read()
     return file_str
 
 
+def open_file(file_path):
+    """ open a file for reading as text, decompressing it on the fly if it has
+    a compression suffix
+
+    :returns: a text file object, which can be iterated over line by line
+        without reading the whole file into memory
+    """
+    assert os.path.isfile(file_path)
+    compression = compression_suffix(file_path)
+    if compression == Compression.GZIP:
+        file_obj = gzip.open(file_path, 'rt')
+    elif compression == Compression.XZ:
+        file_obj = lzma.open(file_path, 'rt')
+    else:
+        file_obj = open(file_path, 'r')
+    return file_obj
+
+
 def write_file(file_path, string):
-    """ write a string to a file
+    """ write a string to a file, compressing it if it has a compression
+    suffix
     """
-    with open(file_path, 'w') as file_obj:
-        file_obj.write(string)
+    compression = compression_suffix(file_path)
+    if compression == Compression.NONE:
+        with _atomic_open(file_path, 'w') as file_obj:
+            file_obj.write(string)
+    else:
+        with _atomic_open(file_path, 'wb') as file_obj:
+            if compression == Compression.GZIP:
+                comp_obj = gzip.GzipFile(fileobj=file_obj, mode='wb',
+                                         filename='', mtime=0)
+            else:
+                comp_obj = lzma.LZMAFile(file_obj, mode='wb')
+            with comp_obj:
+                comp_obj.write(string.encode())
+
+
+def write_stream(file_path, src_obj):
+    """ copy a binary file object to a file, as is
+    """
+    with _atomic_open(file_path, 'wb') as file_obj:
+        shutil.copyfileobj(src_obj, file_obj)
+
+
+def compression_suffix(file_path):
+    """ the compression suffix of a file name, if it has one
+    """
+    for suffix in COMPRESSION_SUFFIXES:
+        if str(file_path).endswith(suffix):
+            return suffix
+    return Compression.NONE
+
+
+def read_array(file_path, mmap=True):
+    """ read a numpy array from a binary .npy file, memory-mapped by default
+    """
+    assert os.path.isfile(file_path)
+    return numpy.load(file_path, mmap_mode=('r' if mmap else None))
+
+
+def write_array(file_path, arr):
+    """ write a numpy array to a binary .npy file
+    """
+    with _atomic_open(file_path, 'wb') as file_obj:
+        numpy.save(file_obj, numpy.asarray(arr))
+
+
+@contextlib.contextmanager
+def _atomic_open(file_path, mode):
+    """ open a temporary file that replaces `file_path` once it is closed
+    """
+    dir_path, file_name = os.path.split(os.path.abspath(file_path))
+    tmp_path = os.path.join(dir_path, '.{}.{}.tmp'.format(
+        file_name, binascii.hexlify(os.urandom(4)).decode()))
+
+    policy = _SETTINGS.durability
+    fdesc = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fdesc, mode) as file_obj:
+            yield file_obj
+            if policy == Durability.FILE:
+                file_obj.flush()
+                os.fsync(file_obj.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if policy == Durability.FILE:
+        _fsync_path(dir_path)
+    elif policy == Durability.BATCH:
+        with _PENDING_LOCK:
+            _PENDING['files'].add(os.path.abspath(file_path))
+            _PENDING['dirs'].add(dir_path)
+            full = len(_PENDING['files']) >= _SETTINGS.batch_size
+        if full:
+            sync()
+
+
+def _fsync_path(path):
+    """ fsync a file or directory by path
+    """
+    fdesc = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fdesc)
+    finally:
+        os.close(fdesc)
+
+
+atexit.register(sync)
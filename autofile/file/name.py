@@ -27,6 +27,7 @@ class Extension():
     LJ_EPSILON = '.eps'
     LJ_SIGMA = '.sig'
     EXTERNAL_SYMMETRY_FACTOR = '.esym'
+    NUMPY_ARRAY = '.npy'
 
 
 def information(file_name):
@@ -167,6 +168,12 @@ def external_symmetry_factor(file_name):
     return _add_extension(file_name, Extension.EXTERNAL_SYMMETRY_FACTOR)
 
 
+def numpy_array(file_name):
+    """ adds binary numpy array extension, if missing
+    """
+    return _add_extension(file_name, Extension.NUMPY_ARRAY)
+
+
 def _add_extension(file_name, ext):
     if not str(file_name).endswith(ext):
         file_name = '{}{}'.format(file_name, ext)
@@ -7,10 +7,13 @@ import autoparse.find as apf
 import autofile.info
 
 
-def information(inf_str):
+def information(inf_str, record_class=None):
     """ read information (any dict/list combination) from a string
+
+    :param record_class: an `autofile.info.Record` class to read the
+        information into, if it has the right keys
     """
-    inf_obj = autofile.info.from_string(inf_str)
+    inf_obj = autofile.info.from_string(inf_str, record_class=record_class)
     return inf_obj
 
 
@@ -3,6 +3,7 @@
 import os
 import tempfile
 import numpy
+import pytest
 import automol
 import autofile.info
 import autofile.file
@@ -53,6 +54,42 @@ def test__file():
     autofile.file.write_file(scr_file_path, scr_str)
 
 
+def test__write_file__durability():
+    """ test atomic file writes under each durability policy
+    """
+    file_path = os.path.join(TMP_DIR, 'durability.txt')
+
+    for policy in (autofile.file.Durability.NONE,
+                   autofile.file.Durability.FILE,
+                   autofile.file.Durability.BATCH):
+        autofile.file.set_durability(policy, batch_size=2)
+        autofile.file.write_file(file_path, policy)
+        assert autofile.file.read_file(file_path) == policy
+
+    autofile.file.sync()
+    autofile.file.set_durability(autofile.file.Durability.NONE)
+
+    # a failed write leaves the original file, and no temporary file, behind
+    with pytest.raises(TypeError):
+        autofile.file.write_file(file_path, 0)
+    assert autofile.file.read_file(file_path) == autofile.file.Durability.BATCH
+    assert not [name for name in os.listdir(TMP_DIR) if name.endswith('.tmp')]
+
+
+def test__write_file__compression():
+    """ test compressed file writes and reads
+    """
+    ref_str = 'line 1\nline 2\n' * 1000
+    for suffix in autofile.file.COMPRESSION_SUFFIXES:
+        file_path = os.path.join(TMP_DIR, 'compression.out' + suffix)
+        autofile.file.write_file(file_path, ref_str)
+        assert os.path.getsize(file_path) < len(ref_str)
+        assert autofile.file.read_file(file_path) == ref_str
+
+        with autofile.file.open_file(file_path) as file_obj:
+            assert next(iter(file_obj)) == 'line 1\n'
+
+
 def test__energy():
     """ test the energy read/write functions
     """
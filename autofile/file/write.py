@@ -10,7 +10,7 @@ import autofile.info
 def information(inf_obj):
     """ write information (any dict/list combination) to a string
     """
-    assert isinstance(inf_obj, autofile.info.Info)
+    assert isinstance(inf_obj, (autofile.info.Info, autofile.info.Record))
     inf_str = autofile.info.string(inf_obj)
     return inf_str
 
@@ -106,7 +106,7 @@ def theory(prefix):
     return dir_fs
 
 
-def conformer(prefix):
+def conformer(prefix, packed=False):
     """ construct the conformer filesystem [trunk/leaf]
 
     layers:
@@ -115,9 +115,12 @@ def conformer(prefix):
 
     :param prefix: sets the path where this filesystem will sit
     :type prefix: str
+    :param packed: keep the files of each series of leaves in a single
+        container, rather than in separate files?
+    :type packed: bool
     """
     trunk_ds = dir_.conformer_trunk(prefix)
-    leaf_ds = dir_.conformer_leaf(prefix, root_ds=trunk_ds)
+    leaf_ds = dir_.conformer_leaf(prefix, root_ds=trunk_ds, packed=packed)
 
     min_ene_dfile = file_.energy(FilePrefix.MIN)
     vma_dfile = file_.vmatrix(FilePrefix.CONF)
@@ -231,7 +234,7 @@ def high_spin(prefix):
     return dir_fs
 
 
-def scan(prefix):
+def scan(prefix, packed=False):
     """ construct the scan filesystem
 
     layers:
@@ -241,10 +244,13 @@ def scan(prefix):
 
     :param prefix: sets the path where this filesystem will sit
     :type prefix: str
+    :param packed: keep the files of each series of leaves in a single
+        container, rather than in separate files?
+    :type packed: bool
     """
     trunk_ds = dir_.scan_trunk(prefix)
     branch_ds = dir_.scan_branch(prefix, root_ds=trunk_ds)
-    leaf_ds = dir_.scan_leaf(prefix, root_ds=branch_ds)
+    leaf_ds = dir_.scan_leaf(prefix, root_ds=branch_ds, packed=packed)
 
     vma_dfile = file_.vmatrix(FilePrefix.SCAN)
     trunk_ds.add_data_files({
@@ -289,7 +295,7 @@ def scan(prefix):
     return dir_fs
 
 
-def cscan(prefix):
+def cscan(prefix, packed=False):
     """ construct the constrained scan filesystem
 
     layers:
@@ -300,11 +306,14 @@ def cscan(prefix):
 
     :param prefix: sets the path where this filesystem will sit
     :type prefix: str
+    :param packed: keep the files of each series of leaves in a single
+        container, rather than in separate files?
+    :type packed: bool
     """
     trunk_ds = dir_.cscan_trunk(prefix)
     branch1_ds = dir_.cscan_branch1(prefix, root_ds=trunk_ds)
     branch2_ds = dir_.cscan_branch2(prefix, root_ds=branch1_ds)
-    leaf_ds = dir_.cscan_leaf(prefix, root_ds=branch2_ds)
+    leaf_ds = dir_.cscan_leaf(prefix, root_ds=branch2_ds, packed=packed)
 
     vma_dfile = file_.vmatrix(FilePrefix.SCAN)
     trunk_ds.add_data_files({
@@ -349,7 +358,7 @@ def cscan(prefix):
     return dir_fs
 
 
-def tau(prefix):
+def tau(prefix, packed=False):
     """ construct the tau filesystem
 
     layers:
@@ -358,9 +367,12 @@ def tau(prefix):
 
     :param prefix: sets the path where this filesystem will sit
     :type prefix: str
+    :param packed: keep the files of each series of leaves in a single
+        container, rather than in separate files?
+    :type packed: bool
     """
     trunk_ds = dir_.tau_trunk(prefix)
-    leaf_ds = dir_.tau_leaf(prefix, root_ds=trunk_ds)
+    leaf_ds = dir_.tau_leaf(prefix, root_ds=trunk_ds, packed=packed)
 
     vma_dfile = file_.vmatrix(FilePrefix.TAU)
     inf_dfile = file_.information(FilePrefix.TAU,
@@ -5,7 +5,10 @@ from autofile.info._info import string
 from autofile.info._info import dict_
 from autofile.info._info import from_string
 from autofile.info._info import matches_function_signature
+from autofile.info._info import set_json_encoding
+from autofile.info._info import json_encoding
 from autofile.info._info import Info
+from autofile.info._info import Record
 
 __all__ = [
     'object_',
@@ -13,5 +16,8 @@ __all__ = [
     'dict_',
     'from_string',
     'matches_function_signature',
+    'set_json_encoding',
+    'json_encoding',
     'Info',
+    'Record',
 ]
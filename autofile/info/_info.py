@@ -1,5 +1,6 @@
 """ implements an class for YAML-style information
 """
+import json
 import numbers
 from types import SimpleNamespace
 try:
@@ -9,6 +10,27 @@ except ImportError:
 import yaml
 from autofile.info._inspect import function_keys as _function_keys
 
+# use the libyaml bindings, if PyYAML was built with them
+_YAML_LOADER = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+_YAML_DUMPER = getattr(yaml, 'CDumper', yaml.Dumper)
+
+_SETTINGS = SimpleNamespace(json=False)
+
+
+def set_json_encoding(use_json):
+    """ turn on (or off) writing information objects as compact JSON
+
+    JSON strings are read back through `from_string` like YAML ones, so files
+    written either way can be mixed freely.
+    """
+    _SETTINGS.json = use_json
+
+
+def json_encoding():
+    """ are information objects written as JSON? (see `set_json_encoding`)
+    """
+    return _SETTINGS.json
+
 
 def object_(inf_dct):
     """ create an information object from a dictionary
@@ -37,6 +59,8 @@ def dict_(inf_obj):
             keys = obj.keys_()
             ret = {key: _cast(val)
                    for key, val in vars(obj).items() if key in keys}
+        elif isinstance(obj, Record):
+            ret = {key: _cast(getattr(obj, key)) for key in obj.__slots__}
         elif _is_nonstring_sequence(obj):
             ret = _normalized_nonstring_sequence(map(_cast, obj))
         else:
@@ -47,25 +71,51 @@ def dict_(inf_obj):
 
 
 def string(inf_obj):
-    """ write an information object to a YAML string
+    """ write an information object to a YAML (or, if turned on, JSON) string
     """
     inf_dct = dict(inf_obj)
-    inf_str = yaml.dump(inf_dct, default_flow_style=False)
+    inf_str = None
+    if _SETTINGS.json:
+        try:
+            inf_str = json.dumps(inf_dct, sort_keys=True,
+                                 separators=(',', ':')) + '\n'
+        except (TypeError, ValueError):
+            inf_str = None
+
+    if inf_str is None:
+        inf_str = yaml.dump(inf_dct, default_flow_style=False,
+                            Dumper=_YAML_DUMPER)
     return inf_str
 
 
-def from_string(inf_str):
-    """ read an information object from a YAML string
+def from_string(inf_str, record_class=None):
+    """ read an information object from a YAML or JSON string
+
+    :param record_class: a `Record` class to read the object into, if it has
+        the right keys
     """
-    inf_dct = yaml.load(inf_str, Loader=yaml.FullLoader)
-    inf_obj = object_(inf_dct)
+    inf_dct = None
+    if inf_str.lstrip().startswith('{'):
+        try:
+            inf_dct = json.loads(inf_str)
+        except ValueError:
+            inf_dct = None
+
+    if inf_dct is None:
+        inf_dct = yaml.load(inf_str, Loader=_YAML_LOADER)
+
+    if (record_class is not None and isinstance(inf_dct, dict)
+            and frozenset(inf_dct) == frozenset(record_class.__slots__)):
+        inf_obj = record_class(**inf_dct)
+    else:
+        inf_obj = object_(inf_dct)
     return inf_obj
 
 
 def matches_function_signature(inf_obj, function):
     """ does the information object match this function signature?
     """
-    assert isinstance(inf_obj, Info)
+    assert isinstance(inf_obj, (Info, Record))
     return inf_obj.keys_() == _function_keys(function)
 
 
@@ -98,6 +148,8 @@ class Info(SimpleNamespace):
             yield key, val
 
     def __eq__(self, other):
+        if isinstance(other, Record):
+            return other == self
         return self.__dict__ == other.__dict__
 
     def __repr__(self):
@@ -113,6 +165,51 @@ class Info(SimpleNamespace):
         object.__setattr__(self, key, value)
 
 
+class Record():
+    """ lightweight information container for flat records with a fixed set
+    of keys
+
+    Subclasses list their keys in `__slots__`, so instances carry no
+    `__dict__` and can't gain new keys. Records write and compare like the
+    equivalent `Info` objects.
+    """
+    __slots__ = ()
+
+    def __init__(self, **kwargs):
+        for key in self.__slots__:
+            if key not in kwargs:
+                raise TypeError("{}() missing value for '{}'"
+                                .format(self.__class__.__name__, key))
+            val = kwargs.pop(key)
+            if _is_nonstring_sequence(val):
+                val = _normalized_nonstring_sequence(val)
+            object.__setattr__(self, key, val)
+
+        if kwargs:
+            raise TypeError("{}() got unexpected keys {}"
+                            .format(self.__class__.__name__,
+                                    sorted(kwargs.keys())))
+
+    def keys_(self):
+        """ keys for this instance """
+        return frozenset(self.__slots__)
+
+    def __iter__(self):
+        """ used by the dict() function for conversion to dictionary """
+        for key, val in dict_(self).items():
+            yield key, val
+
+    def __eq__(self, other):
+        if not isinstance(other, (Info, Record)):
+            return NotImplemented
+        return dict_(self) == dict_(other)
+
+    def __repr__(self):
+        dct = dict_(self)
+        items = ("{}={!r}".format(k, dct[k]) for k in sorted(dct.keys()))
+        return "{}({})".format(self.__class__.__name__, ", ".join(items))
+
+
 def _normalized_nonstring_sequence(seq):
     return [
         int(val) if isinstance(val, numbers.Integral) else
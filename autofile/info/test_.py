@@ -1,5 +1,6 @@
 """ test the autofile.info module
 """
+import pytest
 import autofile.info
 
 
@@ -16,5 +17,54 @@ def test_():
         {'a': ['b', 'c', 'd', 'e'], 'x': {'y': 1, 'z': 2}})))
 
 
+def test__string():
+    """ test YAML and JSON strings
+    """
+    inf_obj = autofile.info.Info(
+        a=['b', 'c'], x=autofile.info.Info(y=1, z=2.5), n=None)
+    inf_str = autofile.info.string(inf_obj)
+    assert not inf_str.startswith('{')
+    assert autofile.info.from_string(inf_str) == inf_obj
+
+    autofile.info.set_json_encoding(True)
+    try:
+        inf_str = autofile.info.string(inf_obj)
+    finally:
+        autofile.info.set_json_encoding(False)
+    assert inf_str.startswith('{')
+    assert autofile.info.from_string(inf_str) == inf_obj
+
+
+def test__record():
+    """ test Record
+    """
+    class _Record(autofile.info.Record):
+        __slots__ = ('a', 'b')
+
+    rec = _Record(a=(1, 2), b='c')
+    assert dict(rec) == {'a': [1, 2], 'b': 'c'}
+    assert rec.keys_() == frozenset({'a', 'b'})
+    assert rec == autofile.info.Info(a=[1, 2], b='c')
+    assert autofile.info.Info(a=[1, 2], b='c') == rec
+    assert not hasattr(rec, '__dict__')
+
+    rec.b = 'd'
+    assert rec.b == 'd'
+    with pytest.raises(AttributeError):
+        rec.c = 'e'
+    with pytest.raises(TypeError):
+        _Record(a=1)
+
+    inf_str = autofile.info.string(rec)
+    assert autofile.info.from_string(inf_str) == rec
+    assert isinstance(
+        autofile.info.from_string(inf_str, record_class=_Record), _Record)
+    assert isinstance(
+        autofile.info.from_string('x: 1\n', record_class=_Record),
+        autofile.info.Info)
+
+
 if __name__ == '__main__':
     test_()
+    test__string()
+    test__record()
@@ -4,6 +4,10 @@ from autofile.system import model
 from autofile.system import map_
 from autofile.system import file_
 from autofile.system import dir_
+from autofile.system import index
+from autofile.system import journal
+from autofile.system import traj
+from autofile.system import blob
 from autofile.system.map_ import generate_new_conformer_id
 from autofile.system.map_ import generate_new_tau_id
 from autofile.system.map_ import sort_together
@@ -16,6 +20,10 @@ __all__ = [
     'map_',
     'file_',
     'dir_',
+    'index',
+    'journal',
+    'traj',
+    'blob',
     'generate_new_conformer_id',
     'generate_new_tau_id',
     'sort_together',
@@ -31,6 +31,20 @@ def short_hash(obj):
     return hsh.decode()
 
 
+def locators_key(obj):
+    """ a hashable key for locators, which keeps types apart (so that, for
+    instance, True and 1 are different keys)
+    """
+    if isinstance(obj, dict):
+        ret = (dict, tuple(sorted((key, locators_key(val))
+                                  for key, val in obj.items())))
+    elif isinstance(obj, (list, tuple)):
+        ret = (tuple, tuple(map(locators_key, obj)))
+    else:
+        ret = (type(obj), obj)
+    return ret
+
+
 def random_string_identifier():
     """ generate a "unique" (=long-ish, random) identifier
     """
@@ -0,0 +1,83 @@
+""" content-addressed store for deduplicating file contents
+
+Files with the same contents (such as the input and output logs of a run,
+which are copied into the save tree) can be stored once, in a hidden blob
+directory under the filesystem prefix (`BLOB_DIR_NAME`), where each blob is
+named by the SHA-256 hash of its contents. The files themselves are hard
+links to their blobs, so they are read like any other file, and writes,
+which always replace a file rather than modifying it, never change a blob.
+
+Blobs that no file links to any more are deleted by `collect`.
+"""
+import os
+import hashlib
+import binascii
+import autofile.file
+
+BLOB_DIR_NAME = '.blobs'
+
+
+def path(prefix, string, compression=autofile.file.Compression.NONE):
+    """ the path of the blob holding a string
+
+    :param prefix: the filesystem prefix
+    :type prefix: str
+    :param compression: the compression format of the blob (see
+        `autofile.file.Compression`)
+    :type compression: str
+    """
+    digest = hashlib.sha256(string.encode()).hexdigest()
+    return os.path.join(prefix, BLOB_DIR_NAME, digest[:2],
+                        digest[2:] + compression)
+
+
+def write(prefix, file_path, string):
+    """ write a string to a file, as a hard link to the blob holding it
+
+    The file is written as a plain copy if it can't be linked (e.g. if the
+    filesystem doesn't support hard links, or if the blob is in use by too
+    many files).
+
+    :param prefix: the filesystem prefix
+    :type prefix: str
+    :param file_path: the file path, which may have a compression suffix
+    :type file_path: str
+    """
+    blob_path = path(prefix, string, autofile.file.compression_suffix(
+        file_path))
+    if not os.path.isfile(blob_path):
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        autofile.file.write_file(blob_path, string)
+
+    dir_path, file_name = os.path.split(os.path.abspath(file_path))
+    tmp_path = os.path.join(dir_path, '.{}.{}.tmp'.format(
+        file_name, binascii.hexlify(os.urandom(4)).decode()))
+    try:
+        os.link(blob_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        autofile.file.write_file(file_path, string)
+
+
+def collect(prefix):
+    """ delete the blobs that no file links to any more
+
+    :param prefix: the filesystem prefix
+    :type prefix: str
+    :returns: the number of blobs deleted, and the number of bytes freed
+    :rtype: (int, int)
+    """
+    nblobs = 0
+    nbytes = 0
+    for dir_path, _, file_names in os.walk(
+            os.path.join(prefix, BLOB_DIR_NAME)):
+        for file_name in file_names:
+            blob_path = os.path.join(dir_path, file_name)
+            stat = os.stat(blob_path)
+            if stat.st_nlink == 1:
+                os.remove(blob_path)
+                nblobs += 1
+                nbytes += stat.st_size
+    return nblobs, nbytes
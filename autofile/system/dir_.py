@@ -4,6 +4,7 @@ try:
     from inspect import getfullargspec as function_argspec
 except ImportError:
     from inspect import getargspec as function_argspec
+import functools
 import automol
 from autofile.system import map_
 from autofile.system import file_
@@ -66,8 +67,12 @@ def conformer_trunk(prefix, root_ds=None):
                             root_ds=root_ds)
 
 
-def conformer_leaf(prefix, root_ds=None):
+def conformer_leaf(prefix, root_ds=None, packed=False):
     """ conformer leaf DataSeries
+
+    :param packed: keep the leaf files in a container (see
+        `model.PackedDataSeries`)?
+    :type packed: bool
     """
     loc_dfile = file_.locator(
         file_prefix=SPEC_FILE_PREFIX,
@@ -76,8 +81,8 @@ def conformer_leaf(prefix, root_ds=None):
 
     _map = _pack_arguments(map_.conformer_leaf)
     nlocs = _count_arguments(map_.conformer_leaf)
-    return model.DataSeries(prefix, map_=_map, nlocs=nlocs, depth=1,
-                            loc_dfile=loc_dfile, root_ds=root_ds)
+    return _data_series(packed)(prefix, map_=_map, nlocs=nlocs, depth=1,
+                                loc_dfile=loc_dfile, root_ds=root_ds)
 
 
 def single_point_trunk(prefix, root_ds=None):
@@ -133,8 +138,12 @@ def scan_branch(prefix, root_ds=None):
                             loc_dfile=loc_dfile, root_ds=root_ds)
 
 
-def scan_leaf(prefix, root_ds=None):
+def scan_leaf(prefix, root_ds=None, packed=False):
     """ scan leaf DataSeries
+
+    :param packed: keep the leaf files in a container (see
+        `model.PackedDataSeries`)?
+    :type packed: bool
     """
     loc_dfile = file_.locator(
         file_prefix=SPEC_FILE_PREFIX,
@@ -144,8 +153,8 @@ def scan_leaf(prefix, root_ds=None):
 
     _map = _pack_arguments(map_.scan_leaf)
     nlocs = _count_arguments(map_.scan_leaf)
-    return model.DataSeries(prefix, map_=_map, nlocs=nlocs, depth=1,
-                            loc_dfile=loc_dfile, root_ds=root_ds)
+    return _data_series(packed)(prefix, map_=_map, nlocs=nlocs, depth=1,
+                                loc_dfile=loc_dfile, root_ds=root_ds)
 
 
 def cscan_trunk(prefix, root_ds=None):
@@ -185,8 +194,12 @@ def cscan_branch2(prefix, root_ds=None):
                             loc_dfile=loc_dfile, root_ds=root_ds)
 
 
-def cscan_leaf(prefix, root_ds=None):
-    """ constrained scan branch 2 DataSeries
+def cscan_leaf(prefix, root_ds=None, packed=False):
+    """ constrained scan leaf DataSeries
+
+    :param packed: keep the leaf files in a container (see
+        `model.PackedDataSeries`)?
+    :type packed: bool
     """
 
     def _round_values(val_dct):
@@ -202,8 +215,8 @@ def cscan_leaf(prefix, root_ds=None):
 
     _map = _pack_arguments(map_.cscan_leaf)
     nlocs = _count_arguments(map_.cscan_leaf)
-    return model.DataSeries(prefix, map_=_map, nlocs=nlocs, depth=1,
-                            loc_dfile=loc_dfile, root_ds=root_ds)
+    return _data_series(packed)(prefix, map_=_map, nlocs=nlocs, depth=1,
+                                loc_dfile=loc_dfile, root_ds=root_ds)
 
 
 def tau_trunk(prefix, root_ds=None):
@@ -238,8 +251,12 @@ def energy_transfer_leaf(prefix, root_ds=None):
     return theory_leaf(prefix, root_ds=root_ds)
 
 
-def tau_leaf(prefix, root_ds=None):
+def tau_leaf(prefix, root_ds=None, packed=False):
     """ tau leaf DataSeries
+
+    :param packed: keep the leaf files in a container (see
+        `model.PackedDataSeries`)?
+    :type packed: bool
     """
     loc_dfile = file_.locator(
         file_prefix=SPEC_FILE_PREFIX,
@@ -248,8 +265,8 @@ def tau_leaf(prefix, root_ds=None):
 
     _map = _pack_arguments(map_.tau_leaf)
     nlocs = _count_arguments(map_.tau_leaf)
-    return model.DataSeries(prefix, map_=_map, nlocs=nlocs, depth=1,
-                            loc_dfile=loc_dfile, root_ds=root_ds)
+    return _data_series(packed)(prefix, map_=_map, nlocs=nlocs, depth=1,
+                                loc_dfile=loc_dfile, root_ds=root_ds)
 
 
 def reaction_trunk(prefix, root_ds=None):
@@ -370,10 +387,17 @@ def build_leaf(prefix, root_ds=None):
 
 
 # helpers
+def _data_series(packed):
+    """ the DataSeries class for directory or packed storage
+    """
+    return model.PackedDataSeries if packed else model.DataSeries
+
+
 def _pack_arguments(function):
     """ generate an equivalent function that takes all of its arguments packed
     into a sequence
     """
+    @functools.wraps(function)
     def _function(args=()):
         return function(*args)
     return _function
@@ -19,14 +19,18 @@ def information(file_prefix, function=None):
         inf_str = autofile.file.write.information(inf_obj)
         return inf_str
 
+    record_class = autofile.system.info.RECORD_CLASS_DCT.get(function, None)
+
     def reader_(inf_str):
-        inf_obj = autofile.file.read.information(inf_str)
+        inf_obj = autofile.file.read.information(inf_str,
+                                                 record_class=record_class)
         if function is not None:
             assert autofile.info.matches_function_signature(inf_obj, function)
         return inf_obj
 
     name = autofile.file.name.information(file_prefix)
-    return model.DataFile(name=name, writer_=writer_, reader_=reader_)
+    return model.DataFile(name=name, writer_=writer_, reader_=reader_,
+                          reader_key=('information', function))
 
 
 def locator(file_prefix, map_dct_, loc_keys):
@@ -55,7 +59,8 @@ def locator(file_prefix, map_dct_, loc_keys):
         return list(map(inf_dct.__getitem__, loc_keys))
 
     name = autofile.file.name.information(file_prefix)
-    return model.DataFile(name=name, writer_=writer_, reader_=reader_)
+    return model.DataFile(name=name, writer_=writer_, reader_=reader_,
+                          reader_key=('locator', tuple(loc_keys)))
 
 
 def input_file(file_prefix):
@@ -96,7 +101,8 @@ def gradient(file_prefix):
     name = autofile.file.name.gradient(file_prefix)
     writer_ = autofile.file.write.gradient
     reader_ = autofile.file.read.gradient
-    return model.DataFile(name=name, writer_=writer_, reader_=reader_)
+    return model.DataFile(name=name, writer_=writer_, reader_=reader_,
+                          array_sidecar=True)
 
 
 def hessian(file_prefix):
@@ -105,7 +111,8 @@ def hessian(file_prefix):
     name = autofile.file.name.hessian(file_prefix)
     writer_ = autofile.file.write.hessian
     reader_ = autofile.file.read.hessian
-    return model.DataFile(name=name, writer_=writer_, reader_=reader_)
+    return model.DataFile(name=name, writer_=writer_, reader_=reader_,
+                          array_sidecar=True)
 
 
 def harmonic_frequencies(file_prefix):
@@ -0,0 +1,504 @@
+""" optional SQLite index of a filesystem prefix
+
+Once an index has been attached to a prefix, `DataSeries.create`,
+`DataSeries.remove` and `DataFile.write` keep it up to date for everything
+underneath that prefix. It stores the leaf directories with their locators,
+the files in them, and scalar values (energies and run statuses), so that
+queries like "the lowest-energy conformer under this trunk" don't need a
+directory scan.
+
+Only writes made while the index is attached are recorded. Use `rebuild()` to
+(re)generate an index from an existing tree. The index keeps a "complete"
+flag, which is set when it is rebuilt, or attached to a prefix that doesn't
+hold anything yet, and cleared by writes below the prefix that bypass it
+(that is, writes made while no index is attached, in this process or any
+other). The lookups at the bottom of this module only answer while the flag
+is set. Bypassing writes can only find index databases at their default
+location, and each process remembers which directories have none, so rebuild
+an index once processes that were already writing to the tree without it
+have finished.
+
+The index is an optional convenience, so a write that can't be recorded (for
+instance, because another process holds the database for too long) only
+raises a warning.
+"""
+import os
+import json
+import numbers
+import sqlite3
+import warnings
+import threading
+import functools
+import yaml
+import autofile.file
+import autofile.info
+from autofile.system import journal
+
+INDEX_FILE_NAME = 'index.sqlite'
+LOCATOR_FILE_NAME = 'dir.yaml'
+MANIFEST_FILE_NAME = 'dir.manifest'
+
+# bookkeeping files, which rebuilds leave out of the index (as well as hidden
+# files and directories, such as lock files, temporary files, and blobs)
+UNINDEXED_FILE_NAMES = (INDEX_FILE_NAME, MANIFEST_FILE_NAME,
+                        journal.JOURNAL_FILE_NAME)
+
+# how long to wait for another connection to release the database, in seconds
+BUSY_TIMEOUT = 10.
+
+# locator keys, in locator order, and the depth of the directory series, for
+# the locator files that don't simply have a single key and a depth of 1
+# (these mirror the series in autofile.system.dir_)
+LOCATOR_SCHEMA = {
+    frozenset(['inchi', 'charge', 'multiplicity', 'smiles']):
+    (('inchi', 'charge', 'multiplicity'), 5),
+    frozenset(['inchis', 'charges', 'multiplicities', 'ts_multiplicity',
+               'smiles']):
+    (('inchis', 'charges', 'multiplicities', 'ts_multiplicity'), 11),
+    frozenset(['method', 'basis', 'orb_restricted']):
+    (('method', 'basis', 'orb_restricted'), 1),
+    frozenset(['macro_idx', 'micro_idx']):
+    (('macro_idx', 'micro_idx'), 1),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leaves (
+    path TEXT PRIMARY KEY,
+    prefix TEXT NOT NULL,
+    locs TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS leaves_prefix ON leaves (prefix);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value REAL,
+    status TEXT);
+CREATE INDEX IF NOT EXISTS files_dir_name ON files (dir, name);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL);
+"""
+
+_ATTACHED = {}
+
+# modification times of the index databases whose complete flags this process
+# has cleared, by database path, to avoid clearing them again on every write
+_BYPASSED = {}
+
+
+class Index():
+    """ SQLite index of the leaves and files under a prefix
+
+    Paths are stored relative to the prefix, so the index stays valid if the
+    tree is moved.
+    """
+
+    def __init__(self, prefix, db_path=None):
+        """
+        :param prefix: the filesystem prefix covered by this index
+        :type prefix: str
+        :param db_path: the database file (default: `INDEX_FILE_NAME` in the
+            prefix)
+        :type db_path: str
+        """
+        assert os.path.isdir(prefix)
+        self.prefix = os.path.abspath(prefix)
+        self.db_path = (os.path.join(self.prefix, INDEX_FILE_NAME)
+                        if db_path is None else db_path)
+        # the index can always be rebuilt, so it doesn't need to be durable
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA busy_timeout = {:d}'
+                           .format(int(BUSY_TIMEOUT * 1000)))
+        self._conn.execute('PRAGMA synchronous = OFF')
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def covers(self, pth):
+        """ is this path under the prefix?
+        """
+        pth = os.path.abspath(pth)
+        return pth == self.prefix or pth.startswith(self.prefix + os.sep)
+
+    def record_leaf(self, pth, prefix, locs):
+        """ record a leaf directory with its (relative) locators
+
+        :param pth: the leaf directory path
+        :param prefix: the directory the leaf series sits in
+        :param locs: the locators of the leaf, relative to `prefix`
+        """
+        self._execute(
+            'INSERT OR REPLACE INTO leaves (path, prefix, locs) '
+            'VALUES (?, ?, ?)',
+            (self._relpath(pth), self._relpath(prefix), json.dumps(locs)))
+
+    def record_file(self, pth, val=None):
+        """ record a file, along with its value if it is a scalar or a run
+        status
+
+        Compressed files are recorded under their plain names (e.g. `.ene`
+        for `.ene.gz`), so that they are found by name whatever their format.
+        """
+        dir_pth, name = os.path.split(pth)
+        name = _plain_name(name)
+        value, status = _scalar_values(val)
+        # the record replaces any for the file in another storage format
+        self._execute_all([
+            ('DELETE FROM files WHERE dir = ? AND name = ?',
+             (self._relpath(dir_pth), name)),
+            ('INSERT OR REPLACE INTO files (path, dir, name, kind, value, '
+             'status) VALUES (?, ?, ?, ?, ?, ?)',
+             (self._relpath(pth), self._relpath(dir_pth), name, _kind(name),
+              value, status))])
+
+    def forget(self, pth):
+        """ drop a directory and everything under it from the index
+        """
+        rel_pth = self._relpath(pth)
+        pattern = _like_prefix(rel_pth)
+        self._execute(
+            "DELETE FROM leaves WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+            (rel_pth, pattern))
+        self._execute(
+            "DELETE FROM files WHERE dir = ? OR dir LIKE ? ESCAPE '\\'",
+            (rel_pth, pattern))
+
+    def leaf_locators(self, prefix):
+        """ relative locators of the leaves in a directory series
+
+        :param prefix: the directory the leaf series sits in
+        """
+        rows = self._query(
+            'SELECT locs FROM leaves WHERE prefix = ? ORDER BY path',
+            (self._relpath(prefix),))
+        return tuple(json.loads(locs) for locs, in rows)
+
+    def sorted_leaf_values(self, prefix, file_name):
+        """ relative locators and values of the leaves in a directory series,
+        sorted by the value in one of their files
+
+        :param prefix: the directory the leaf series sits in
+        :param file_name: the name of the file holding the value
+        :returns: pairs of locators and values
+        """
+        rows = self._query(
+            'SELECT leaves.locs, files.value FROM leaves '
+            'JOIN files ON files.dir = leaves.path '
+            'WHERE leaves.prefix = ? AND files.name = ? '
+            'AND files.value IS NOT NULL '
+            'ORDER BY files.value, leaves.path',
+            (self._relpath(prefix), file_name))
+        return tuple((json.loads(locs), val) for locs, val in rows)
+
+    def min_leaf_value(self, prefix, file_name):
+        """ relative locators and value of the leaf with the lowest value in
+        one of its files, or None if there isn't one
+        """
+        vals = self.sorted_leaf_values(prefix, file_name)
+        return vals[0] if vals else None
+
+    def status(self, pth):
+        """ the run status recorded for a file, if any
+        """
+        rows = self._query('SELECT status FROM files WHERE path = ?',
+                           (self._relpath(pth),))
+        return rows[0][0] if rows else None
+
+    def is_complete(self):
+        """ does the index hold everything under its prefix?
+        """
+        rows = self._query("SELECT value FROM state WHERE key = 'complete'")
+        return bool(rows and rows[0][0])
+
+    def set_complete(self, complete):
+        """ set or clear the complete flag
+        """
+        self._execute("INSERT OR REPLACE INTO state (key, value) "
+                      "VALUES ('complete', ?)", (int(bool(complete)),))
+
+    def clear(self):
+        """ drop all records
+        """
+        self._execute_all([('DELETE FROM leaves', ()),
+                           ('DELETE FROM files', ()),
+                           ('DELETE FROM state', ())])
+
+    def close(self):
+        """ close the database connection
+        """
+        with self._lock:
+            self._conn.close()
+
+    def _relpath(self, pth):
+        return os.path.relpath(os.path.abspath(pth), self.prefix)
+
+    def _execute(self, sql, params=()):
+        self._execute_all([(sql, params)])
+
+    def _execute_all(self, sql_params_pairs):
+        """ execute statements in a single transaction
+        """
+        with self._lock:
+            with self._conn:
+                for sql, params in sql_params_pairs:
+                    self._conn.execute(sql, params)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+
+def attach(prefix, db_path=None):
+    """ attach an index to a prefix, so that writes below it are recorded
+
+    The index is marked complete if the prefix doesn't hold anything yet.
+    Otherwise, it is only complete if it was before, and nothing has been
+    written without it since.
+
+    :returns: the index
+    :rtype: Index
+    """
+    idx = Index(prefix, db_path=db_path)
+    if _is_empty(idx.prefix):
+        idx.set_complete(True)
+    detach(idx.prefix)
+    _ATTACHED[idx.prefix] = idx
+    return idx
+
+
+def detach(prefix):
+    """ detach the index from a prefix, if there is one
+    """
+    idx = _ATTACHED.pop(os.path.abspath(prefix), None)
+    if idx is not None:
+        idx.close()
+
+
+def attached():
+    """ the index databases attached to prefixes, by prefix
+
+    :rtype: dict
+    """
+    return {prefix: idx.db_path for prefix, idx in _ATTACHED.items()}
+
+
+def find(pth):
+    """ the attached index covering this path, if there is one
+    """
+    for idx in _ATTACHED.values():
+        if idx.covers(pth):
+            return idx
+    return None
+
+
+def record_leaf(pth, prefix, locs):
+    """ record a leaf directory in the attached index, if there is one
+    """
+    idx = find(pth) if _ATTACHED else None
+    if idx is not None:
+        _try(idx.record_leaf, pth, prefix, locs)
+    else:
+        _bypass(pth)
+
+
+def record_file(pth, val=None):
+    """ record a file in the attached index, if there is one
+    """
+    idx = find(pth) if _ATTACHED else None
+    if idx is not None:
+        _try(idx.record_file, pth, val)
+    else:
+        _bypass(pth)
+
+
+def forget(pth):
+    """ drop a directory from the attached index, if there is one
+    """
+    idx = find(pth) if _ATTACHED else None
+    if idx is not None:
+        _try(idx.forget, pth)
+    else:
+        _bypass(pth)
+
+
+def rebuild(prefix, db_path=None):
+    """ regenerate the index for an existing tree
+
+    Leaves are found from their locator files, and scalar values are read
+    from energy files and run information files.
+
+    :returns: the number of leaves and files indexed
+    :rtype: (int, int)
+    """
+    idx = Index(prefix, db_path=db_path)
+    idx.clear()
+    nleaves = nfiles = 0
+    for dir_pth, dir_names, file_names in os.walk(idx.prefix):
+        dir_names[:] = [name for name in dir_names
+                        if not name.startswith('.')]
+        for file_name in file_names:
+            pth = os.path.join(dir_pth, file_name)
+            if (os.path.abspath(pth) == os.path.abspath(idx.db_path)
+                    or file_name in UNINDEXED_FILE_NAMES
+                    or file_name.startswith('.')):
+                continue
+
+            val = _read_scalar(pth)
+            idx.record_file(pth, val)
+            nfiles += 1
+
+            if file_name == LOCATOR_FILE_NAME and isinstance(val, dict):
+                loc_keys, depth = _locator_schema(val)
+                leaf_prefix = dir_pth
+                for _ in range(depth):
+                    leaf_prefix = os.path.dirname(leaf_prefix)
+                locs = [val[key] for key in loc_keys]
+                idx.record_leaf(dir_pth, leaf_prefix, locs)
+                nleaves += 1
+    idx.set_complete(True)
+    idx.close()
+    return nleaves, nfiles
+
+
+def min_value_locators(ds_file, root_locs=()):
+    """ locators of the leaf with the lowest value in a DataSeries file,
+    looked up in the attached index
+
+    :param ds_file: a scalar-valued file of a leaf DataSeries, such as
+        `cnf_save_fs.leaf.file.energy`
+    :returns: the locators, or None if the series isn't (fully) indexed or
+        has no indexed values
+    """
+    locs_lst = sorted_locators(ds_file, root_locs=root_locs)
+    return locs_lst[0] if locs_lst else None
+
+
+def sorted_locators(ds_file, root_locs=()):
+    """ locators of the leaves of a DataSeries, sorted by the value in one of
+    their files and looked up in the attached index
+
+    Leaves without a value are left out.
+
+    :returns: the locators, or None if the series isn't indexed, or if the
+        index isn't complete
+    """
+    prefix = ds_file.dir.prefix_path(root_locs)
+    idx = find(prefix) if _ATTACHED else None
+    if idx is None or not idx.is_complete():
+        return None
+    vals = idx.sorted_leaf_values(prefix, ds_file.file.name)
+    return tuple(list(root_locs) + locs for locs, _ in vals)
+
+
+def _locator_schema(loc_dct):
+    keys = frozenset(loc_dct.keys())
+    if keys in LOCATOR_SCHEMA:
+        ret = LOCATOR_SCHEMA[keys]
+    else:
+        ret = (tuple(sorted(keys)), 1)
+    return ret
+
+
+def _is_empty(prefix):
+    """ does a prefix hold nothing but bookkeeping files?
+    """
+    with os.scandir(prefix) as entries:
+        return all(entry.name.startswith('.')
+                   or entry.name.startswith(INDEX_FILE_NAME)
+                   or entry.name in UNINDEXED_FILE_NAMES
+                   for entry in entries)
+
+
+def _bypass(pth):
+    """ clear the complete flag of the index a write bypasses, if it has one
+    """
+    db_path = _index_file(os.path.dirname(os.path.abspath(pth)))
+    if db_path is None:
+        return
+    try:
+        mtime = os.stat(db_path).st_mtime_ns
+    except FileNotFoundError:
+        return
+    if _BYPASSED.get(db_path) == mtime:
+        return
+
+    try:
+        idx = Index(os.path.dirname(db_path))
+        try:
+            idx.set_complete(False)
+        finally:
+            idx.close()
+        _BYPASSED[db_path] = os.stat(db_path).st_mtime_ns
+    except (sqlite3.DatabaseError, FileNotFoundError) as err:
+        warnings.warn("Couldn't mark the index at {} incomplete: {}"
+                      .format(db_path, err))
+
+
+@functools.lru_cache(maxsize=4096)
+def _index_file(dir_pth):
+    """ the index database at its default location in this directory or the
+    closest one above it, if there is one
+    """
+    db_path = os.path.join(dir_pth, INDEX_FILE_NAME)
+    if os.path.isfile(db_path):
+        return db_path
+    parent_pth = os.path.dirname(dir_pth)
+    return None if parent_pth == dir_pth else _index_file(parent_pth)
+
+
+def _try(function, *args):
+    """ update an index, warning rather than failing if it can't be written
+    """
+    try:
+        function(*args)
+    except sqlite3.OperationalError as err:
+        warnings.warn("Couldn't update the index: {}".format(err))
+
+
+def _read_scalar(pth):
+    """ read the indexed value from a file, if it has one
+    """
+    kind = _kind(_plain_name(os.path.basename(pth)))
+    val = None
+    try:
+        if kind == autofile.file.name.Extension.ENERGY:
+            val = autofile.file.read.energy(autofile.file.read_file(pth))
+        elif kind == autofile.file.name.Extension.INFORMATION:
+            val = yaml.safe_load(autofile.file.read_file(pth))
+    except (AssertionError, ValueError, yaml.YAMLError):
+        val = None
+    return val
+
+
+def _scalar_values(val):
+    """ the (value, status) columns for a written value
+    """
+    value = status = None
+    if isinstance(val, numbers.Real) and not isinstance(val, bool):
+        value = float(val)
+    elif isinstance(val, (autofile.info.Info, autofile.info.Record)):
+        status = getattr(val, 'status', None)
+    elif isinstance(val, dict):
+        status = val.get('status', None)
+    return value, (status if isinstance(status, str) else None)
+
+
+def _plain_name(file_name):
+    """ the name of a file without its compression suffix, if it has one
+    """
+    suffix = autofile.file.compression_suffix(file_name)
+    return file_name[:-len(suffix)] if suffix else file_name
+
+
+def _kind(file_name):
+    """ file kind, given by its (full) extension
+    """
+    _, sep, ext = file_name.partition('.')
+    return sep + ext
+
+
+def _like_prefix(pth):
+    """ SQL LIKE pattern matching everything under a directory
+    """
+    pth = pth.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return pth + os.sep + '%'
@@ -108,11 +108,17 @@ class RunStatus():
     FAILURE = "failed"
 
 
+class RunRecord(autofile.info.Record):
+    """ run information record (see `run`) """
+    __slots__ = ('job', 'prog', 'version', 'method', 'basis', 'status',
+                 'utc_start_time', 'utc_end_time')
+
+
 def run(job, prog, version, method, basis, status, utc_start_time=None,
         utc_end_time=None):
     """ run information
     """
-    inf_obj = autofile.info.Info(
+    inf_obj = RunRecord(
         job=job,
         prog=prog,
         version=version,
@@ -126,6 +132,12 @@ def run(job, prog, version, method, basis, status, utc_start_time=None,
     return inf_obj
 
 
+# information functions whose objects are read back as lightweight records
+RECORD_CLASS_DCT = {
+    run: RunRecord,
+}
+
+
 def utc_time():
     """ current run time
     """
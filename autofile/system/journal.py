@@ -0,0 +1,267 @@
+""" optional change journal of a filesystem prefix
+
+Once a journal has been attached to a prefix, `DataSeries.create`,
+`DataSeries.remove` and `DataFile.write` append an event to it for
+everything they do underneath that prefix. The journal is a JSON-lines file
+in the prefix (`JOURNAL_FILE_NAME`), with one event per line:
+
+    {"event": "file written", "path": "SPC/.../geom.xyz", "time": ...}
+
+Paths are relative to the prefix. Leaf events also carry the (relative)
+locators of the leaf, and status events carry the new run status; they are
+only recorded when a write changes the status of a run information file.
+
+Appends are made under an fcntl lock on the journal, since appends from
+several processes can otherwise interleave, or overwrite each other on
+network filesystems. (Where fcntl isn't available, only threads are kept
+apart.) Lines that can't be parsed, such as one cut short by a crash, are
+skipped when reading.
+
+Consumers keep the byte offset they have read up to, and pick up from there
+with `read()` or `follow()`, so that they only see what has changed since.
+"""
+import os
+import json
+import time
+import threading
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+import autofile.info
+
+JOURNAL_FILE_NAME = 'journal.jsonl'
+
+_ATTACHED = {}
+
+
+class Event():
+    """ kinds of journal events """
+    LEAF_CREATED = 'leaf created'
+    LEAF_REMOVED = 'leaf removed'
+    FILE_WRITTEN = 'file written'
+    STATUS_CHANGED = 'status changed'
+
+
+class Journal():
+    """ JSON-lines journal of the changes under a prefix
+    """
+
+    def __init__(self, prefix, journal_path=None):
+        """
+        :param prefix: the filesystem prefix covered by this journal
+        :type prefix: str
+        :param journal_path: the journal file (default: `JOURNAL_FILE_NAME`
+            in the prefix)
+        :type journal_path: str
+        """
+        assert os.path.isdir(prefix)
+        self.prefix = os.path.abspath(prefix)
+        self.path = (os.path.join(self.prefix, JOURNAL_FILE_NAME)
+                     if journal_path is None else journal_path)
+        self._lock = threading.Lock()
+
+    def covers(self, pth):
+        """ is this path under the prefix?
+        """
+        pth = os.path.abspath(pth)
+        return pth == self.prefix or pth.startswith(self.prefix + os.sep)
+
+    def record_leaf(self, pth, locs):
+        """ record the creation of a leaf directory with its (relative)
+        locators
+        """
+        self._append(Event.LEAF_CREATED, pth, locs=locs)
+
+    def record_file(self, pth, val=None, prev_val=None):
+        """ record a file write, and the change of status if it is a run
+        information file whose status differs from that of the value it
+        replaced
+
+        :param prev_val: the value the write replaced, if any
+        """
+        self._append(Event.FILE_WRITTEN, pth)
+        status = _status(val)
+        if status is not None and status != _status(prev_val):
+            self._append(Event.STATUS_CHANGED, pth, status=status)
+
+    def forget(self, pth):
+        """ record the removal of a directory
+        """
+        self._append(Event.LEAF_REMOVED, pth)
+
+    def read(self, offset=0):
+        """ read the events appended since an offset
+
+        :param offset: the byte offset to read from (0 for the start of the
+            journal)
+        :type offset: int
+        :returns: the events, and the offset to read from next time
+        :rtype: (tuple[dict], int)
+        """
+        evt_offsets = self.read_with_offsets(offset)
+        evts = tuple(evt for evt, _ in evt_offsets)
+        return evts, (evt_offsets[-1][1] if evt_offsets else offset)
+
+    def read_with_offsets(self, offset=0):
+        """ read the events appended since an offset, each with the offset
+        just past it, for consumers that checkpoint after every event
+
+        :rtype: tuple[(dict, int)]
+        """
+        try:
+            with open(self.path, 'rb') as file_obj:
+                file_obj.seek(offset)
+                data = file_obj.read()
+        except FileNotFoundError:
+            return ()
+
+        evt_offsets = []
+        # a partly written last line has no newline yet, and is left for
+        # next time
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            evt = _parse(line)
+            if evt is not None:
+                evt_offsets.append((evt, offset))
+        return tuple(evt_offsets)
+
+    def _append(self, event, pth, **kwargs):
+        evt = {'event': event, 'path': self._relpath(pth),
+               'time': time.time()}
+        evt.update(kwargs)
+        line = json.dumps(evt, default=str) + '\n'
+        with self._lock:
+            with open(self.path, 'a') as file_obj:
+                # the lock is released when the file is closed, after the
+                # line has been flushed
+                if fcntl is not None:
+                    fcntl.lockf(file_obj.fileno(), fcntl.LOCK_EX)
+                file_obj.write(line)
+
+    def _relpath(self, pth):
+        return os.path.relpath(os.path.abspath(pth), self.prefix)
+
+
+def attach(prefix, journal_path=None):
+    """ attach a journal to a prefix, so that changes below it are recorded
+
+    :returns: the journal
+    :rtype: Journal
+    """
+    jrn = Journal(prefix, journal_path=journal_path)
+    _ATTACHED[jrn.prefix] = jrn
+    return jrn
+
+
+def detach(prefix):
+    """ detach the journal from a prefix, if there is one
+    """
+    _ATTACHED.pop(os.path.abspath(prefix), None)
+
+
+def attached():
+    """ the journal files attached to prefixes, by prefix
+
+    :rtype: dict
+    """
+    return {prefix: jrn.path for prefix, jrn in _ATTACHED.items()}
+
+
+def find(pth):
+    """ the attached journal covering this path, if there is one
+    """
+    for jrn in _ATTACHED.values():
+        if jrn.covers(pth):
+            return jrn
+    return None
+
+
+def record_leaf(pth, locs):
+    """ record a leaf directory in the attached journal, if there is one
+    """
+    jrn = find(pth) if _ATTACHED else None
+    if jrn is not None:
+        jrn.record_leaf(pth, locs)
+
+
+def record_file(pth, val=None, prev_val=None):
+    """ record a file in the attached journal, if there is one
+    """
+    jrn = find(pth) if _ATTACHED else None
+    if jrn is not None:
+        jrn.record_file(pth, val, prev_val=prev_val)
+
+
+def needs_previous(pth, val):
+    """ does recording a write of this value need the value it replaces (to
+    tell whether it changes a run status)?
+    """
+    return (bool(_ATTACHED) and _status(val) is not None
+            and find(pth) is not None)
+
+
+def forget(pth):
+    """ record a removal in the attached journal, if there is one
+    """
+    jrn = find(pth) if _ATTACHED else None
+    if jrn is not None:
+        jrn.forget(pth)
+
+
+def read(prefix, offset=0, journal_path=None):
+    """ read the events in the journal of a prefix since an offset
+
+    :returns: the events, and the offset to read from next time
+    :rtype: (tuple[dict], int)
+    """
+    return Journal(prefix, journal_path=journal_path).read(offset)
+
+
+def follow(prefix, offset=0, interval=1., timeout=None, journal_path=None):
+    """ tail the journal of a prefix, yielding events as they are appended
+
+    :param offset: the byte offset to start from
+    :type offset: int
+    :param interval: how often (in seconds) to check for new events
+    :type interval: float
+    :param timeout: stop after this long (in seconds) without new events
+        (default: never stop)
+    :type timeout: float
+    :returns: the events, with the offset to resume from after each one
+    :rtype: iterator of (dict, int)
+    """
+    jrn = Journal(prefix, journal_path=journal_path)
+    idle = 0.
+    while timeout is None or idle <= timeout:
+        evt_offsets = jrn.read_with_offsets(offset)
+        if evt_offsets:
+            idle = 0.
+            for evt, offset in evt_offsets:
+                yield evt, offset
+        else:
+            time.sleep(interval)
+            idle += interval
+
+
+def _parse(line):
+    """ the event on a journal line, or None if it is blank or malformed
+    """
+    try:
+        evt = json.loads(line)
+    except ValueError:
+        return None
+    return evt if isinstance(evt, dict) and 'event' in evt else None
+
+
+def _status(val):
+    """ the run status recorded in a written value, if there is one
+    """
+    status = None
+    if isinstance(val, (autofile.info.Info, autofile.info.Record)):
+        status = getattr(val, 'status', None)
+    elif isinstance(val, dict):
+        status = val.get('status', None)
+    return status if isinstance(status, str) else None
@@ -1,18 +1,89 @@
 """ directory naming functions
 """
 import os
+import types
 import string
+import inspect
 import numbers
+import functools
+import threading
+import collections
 import elstruct
 import automol
 from autofile.system._util import (is_valid_inchi_multiplicity as
                                    _is_valid_inchi_multiplicity)
 from autofile.system._util import short_hash as _short_hash
+from autofile.system._util import locators_key as _frozen
 from autofile.system._util import (random_string_identifier as
                                    _random_string_identifier)
 from autofile.system._util import (is_random_string_identifier as
                                    _is_random_string_identifier)
 
+# the number of paths to remember for each memoized map function
+MEMO_SIZE = 4096
+
+_SETTINGS = types.SimpleNamespace(trusted_locators=False)
+_VALIDATED = set()
+
+
+def set_trusted_locators(trusted):
+    """ turn on (or off) trusted locators mode
+
+    In this mode, the (expensive) validity checks on InChIs, multiplicities
+    and theory levels are only run the first time a given value is seen.
+    """
+    _SETTINGS.trusted_locators = trusted
+    _VALIDATED.clear()
+
+
+def trusted_locators():
+    """ is trusted locators mode on? (see `set_trusted_locators`)
+    """
+    return _SETTINGS.trusted_locators
+
+
+def _memoized(function):
+    """ decorate a map function with a bounded (LRU) memo, keyed on its
+    locators
+
+    The wrapper keeps the signature of the map function, since the number of
+    locators is read off of it.
+    """
+    memo = collections.OrderedDict()
+    lock = threading.Lock()
+
+    @functools.wraps(function)
+    def _function(*args):
+        key = _frozen(args)
+        with lock:
+            if key in memo:
+                memo.move_to_end(key)
+                return memo[key]
+
+        ret = function(*args)
+        with lock:
+            memo[key] = ret
+            if len(memo) > MEMO_SIZE:
+                memo.popitem(last=False)
+        return ret
+
+    _function.__signature__ = inspect.signature(function)
+    _function.cache_clear = memo.clear
+    return _function
+
+
+def _is_validated(key):
+    """ has this value been validated already (in trusted locators mode)?
+    """
+    return _SETTINGS.trusted_locators and key in _VALIDATED
+
+
+def _set_validated(key):
+    """ remember that this value is valid (in trusted locators mode)
+    """
+    if _SETTINGS.trusted_locators:
+        _VALIDATED.add(key)
+
 
 # species
 def species_trunk():
@@ -21,14 +92,17 @@ def species_trunk():
     return 'SPC'
 
 
+@_memoized
 def species_leaf(ich, chg, mul):
     """ species leaf directory name
     """
-    assert automol.inchi.is_standard_form(ich)
-    assert automol.inchi.is_complete(ich)
     assert isinstance(chg, numbers.Integral)
     assert isinstance(mul, numbers.Integral)
-    assert _is_valid_inchi_multiplicity(ich, mul)
+    if not _is_validated(('species', ich, mul)):
+        assert automol.inchi.is_standard_form(ich)
+        assert automol.inchi.is_complete(ich)
+        assert _is_valid_inchi_multiplicity(ich, mul)
+        _set_validated(('species', ich, mul))
 
     ick = automol.inchi.inchi_key(ich)
     chg_str = str(chg)
@@ -43,15 +117,18 @@ def species_leaf(ich, chg, mul):
 
 
 # theory
+@_memoized
 def theory_leaf(method, basis, orb_restricted):
     """ theory leaf directory name
 
     This need not be tied to elstruct -- just take out the name checks.
     Note that we are (no longer) checking the orbital restriction.
     """
-    assert elstruct.Method.contains(method)
-    assert elstruct.Basis.contains(basis)
     assert isinstance(orb_restricted, bool)
+    if not _is_validated(('theory', method, basis)):
+        assert elstruct.Method.contains(method)
+        assert elstruct.Basis.contains(basis)
+        _set_validated(('theory', method, basis))
 
     ref_char = 'R' if orb_restricted else 'U'
     dir_name = ''.join([_short_hash(method.lower()),
@@ -133,6 +210,7 @@ def cscan_branch2(coo_vals):
     return '_'.join(map('{:.2f}'.format, coo_vals))
 
 
+@_memoized
 def cscan_leaf(cons_coo_val_dct):
     """ constrained scan leaf directory name
 
@@ -181,6 +259,7 @@ def reaction_trunk():
     return 'RXN'
 
 
+@_memoized
 def reaction_leaf(rxn_ichs, rxn_chgs, rxn_muls, ts_mul):
     """ reaction leaf directory name
     """
@@ -252,14 +331,16 @@ def _sortable_representation(ichs, chgs, muls):
 def _reactant_leaf(ichs, chgs, muls):
     """ reactant leaf directory name
     """
-    assert all(map(automol.inchi.is_standard_form, ichs))
-    assert all(map(automol.inchi.is_complete, ichs))
-    assert tuple(ichs) == automol.inchi.sorted_(ichs)
     assert len(ichs) == len(chgs) == len(muls)
     assert all(isinstance(chg, numbers.Integral) for chg in chgs)
     assert all(isinstance(mul, numbers.Integral) for mul in muls)
-    assert all(_is_valid_inchi_multiplicity(ich, mul)
-               for ich, mul in zip(ichs, muls))
+    if not _is_validated(('reactants', tuple(ichs), tuple(muls))):
+        assert all(map(automol.inchi.is_standard_form, ichs))
+        assert all(map(automol.inchi.is_complete, ichs))
+        assert tuple(ichs) == automol.inchi.sorted_(ichs)
+        assert all(_is_valid_inchi_multiplicity(ich, mul)
+                   for ich, mul in zip(ichs, muls))
+        _set_validated(('reactants', tuple(ichs), tuple(muls)))
 
     ich = automol.inchi.standard_form(automol.inchi.join(ichs))
     ick = automol.inchi.inchi_key(ich)
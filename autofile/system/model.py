@@ -1,16 +1,89 @@
 """ defines the filesystem model
 """
+import io
 import os
-import glob
+import copy
+import json
+import asyncio
+import time
 import types
 import shutil
+import socket
+import numbers
+import sqlite3
+import threading
+import weakref
+import collections
+import concurrent.futures
+import numpy
+import yaml
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 import autofile.file
+import autofile.info
+from autofile.system import map_
+from autofile.system import blob
+from autofile.system import index
+from autofile.system import journal
+from autofile.system._util import locators_key as _locators_key
+
+# directories modified more recently than this (in nanoseconds) are too fresh
+# for their mtime to be trusted, since a second change within the timestamp
+# resolution of the filesystem would go unnoticed
+LISTING_CACHE_RACY_WINDOW = 2 * 10**9
+
+PACK_FILE_NAME = 'pack.sqlite'
+
+MANIFEST_FILE_NAME = index.MANIFEST_FILE_NAME
+
+READ_MANY_MAX_WORKERS = 16
+
+# the default number of threads behind the asyncio interface (aread, ...)
+ASYNC_MAX_WORKERS = 16
+_ASYNC_EXECUTOR = {'executor': None}
+_ASYNC_EXECUTOR_LOCK = threading.Lock()
+
+# a lock held for longer than this (in seconds) is assumed to belong to a
+# dead or hung process, and may be broken by another process
+LOCK_LEASE = 600.
+LOCK_POLL_INTERVAL = 0.05
+
+# the number of resolved root prefixes to remember for each DataSeries
+PREFIX_CACHE_SIZE = 4096
+
+# global switches for optional storage features
+SETTINGS = types.SimpleNamespace(
+    # write binary .npy sidecars next to array-valued files
+    array_sidecars=False,
+    # check that every path segment is relative and has the right depth
+    debug_paths=False,
+    # compression format (autofile.file.Compression) to write files with,
+    # by file extension
+    compression={},
+    # threads for listing deep directory series, one per top directory
+    listing_workers=None,
+    # threads behind the asyncio interface
+    async_workers=ASYNC_MAX_WORKERS,
+    # file extensions to deduplicate through a blob store, by prefix
+    blob_stores={},
+)
+
+# the file types that are deduplicated by default
+BLOB_EXTENSIONS = (autofile.file.name.Extension.INPUT_LOG,
+                   autofile.file.name.Extension.OUTPUT_LOG)
+
+# the suffixes a file may be stored with: none, or a compression suffix
+_STORAGE_SUFFIXES = ((autofile.file.Compression.NONE,)
+                     + autofile.file.COMPRESSION_SUFFIXES)
 
 
 class DataFile():
     """ file manager for a given datatype """
 
-    def __init__(self, name, writer_=(lambda _: _), reader_=(lambda _: _)):
+    def __init__(self, name, writer_=(lambda _: _), reader_=(lambda _: _),
+                 array_sidecar=False, reader_key=None):
         """
         :param name: the file name
         :type name: str
@@ -18,61 +91,211 @@ class DataFile():
         :type writer_: callable[object->str]
         :param reader_: reads data from a string
         :type reader_: callable[str->object]
+        :param array_sidecar: is this an array-valued file, which may have a
+            binary .npy sidecar? if so, reads return numpy arrays while
+            sidecars are turned on (see `set_array_sidecars`)
+        :type array_sidecar: bool
+        :param reader_key: a hashable identity for the reader, under which
+            its values are cached, so that DataFiles built with equivalent
+            readers share their cached values (default: the reader itself)
         """
         self.name = name
         self.writer_ = writer_
         self.reader_ = reader_
+        self.array_sidecar = array_sidecar
+        self.reader_key = reader_ if reader_key is None else reader_key
 
     def path(self, dir_pth):
         """ file path
         """
         return os.path.join(dir_pth, self.name)
 
+    def array_path(self, dir_pth):
+        """ binary .npy sidecar path
+        """
+        return autofile.file.name.numpy_array(self.path(dir_pth))
+
+    def stored_path(self, dir_pth):
+        """ the path this file is stored at -- either the plain path or the
+        path with a compression suffix -- or None if it doesn't exist
+        """
+        pth = self.path(dir_pth)
+        for suffix in _STORAGE_SUFFIXES:
+            if os.path.isfile(pth + suffix):
+                return pth + suffix
+        return None
+
     def exists(self, dir_pth):
         """ does this file exist?
         """
-        pth = self.path(dir_pth)
-        return os.path.isfile(pth)
+        return self.stored_path(dir_pth) is not None
 
     def write(self, val, dir_pth):
-        """ write data to this file
+        """ write data to this file, compressed if that is turned on for its
+        file type (see `set_compression`)
         """
         assert os.path.exists(dir_pth)
-        pth = self.path(dir_pth)
+        plain_pth = self.path(dir_pth)
+        pth = plain_pth + _compression(self.name)
         val_str = self.writer_(val)
-        autofile.file.write_file(pth, val_str)
+        prev_val = (self._read_previous(dir_pth)
+                    if journal.needs_previous(plain_pth, val) else None)
+        blob_prefix = _blob_prefix(self.name, dir_pth)
+        if blob_prefix is None:
+            autofile.file.write_file(pth, val_str)
+        else:
+            blob.write(blob_prefix, pth, val_str)
+        # drop any copy stored in another format, which would now be stale
+        for suffix in _STORAGE_SUFFIXES:
+            if plain_pth + suffix != pth:
+                if os.path.isfile(plain_pth + suffix):
+                    os.remove(plain_pth + suffix)
+                READ_CACHE.invalidate(plain_pth + suffix)
+        READ_CACHE.invalidate(pth)
+        index.record_file(pth, val)
+        journal.record_file(pth, val, prev_val=prev_val)
+
+        # the sidecar is written second, so that it is only ever used if it
+        # is at least as new as the text file; if sidecars are off, an old
+        # one is removed, so that it can't be mistaken for this value later
+        if self.array_sidecar and SETTINGS.array_sidecars:
+            autofile.file.write_array(self.array_path(dir_pth), val)
+        elif self.array_sidecar:
+            _remove_if_exists(self.array_path(dir_pth))
 
     def read(self, dir_pth):
         """ read data from this file
         """
         assert self.exists(dir_pth)
-        pth = self.path(dir_pth)
-        val_str = autofile.file.read_file(pth)
-        val = self.reader_(val_str)
+        pth = self.stored_path(dir_pth)
+        if self.array_sidecar and SETTINGS.array_sidecars:
+            arr_pth = self.array_path(dir_pth)
+            if _is_as_new_as(arr_pth, pth):
+                return autofile.file.read_array(arr_pth)
+            return numpy.array(self._read_value(pth))
+        return self._read_value(pth)
+
+    def open(self, dir_pth):
+        """ open this file for reading as text, without reading it into
+        memory (compressed files are decompressed as they are read)
+        """
+        assert self.exists(dir_pth)
+        return autofile.file.open_file(self.stored_path(dir_pth))
+
+    def lock(self, dir_pth, lease=LOCK_LEASE, timeout=None):
+        """ an advisory lock on this file (see `FileLock`)
+        """
+        return FileLock(self.lock_path(dir_pth), lease=lease, timeout=timeout)
+
+    def lock_path(self, dir_pth):
+        """ path of the (hidden) lock file for this file
+        """
+        return os.path.join(dir_pth, '.{}.lock'.format(self.name))
+
+    def update(self, function, dir_pth, default=None):
+        """ atomically read, modify and write this file
+
+        :param function: maps the current value (or `default`, if the file
+            doesn't exist) to the new value
+        :type function: callable
+        :returns: the new value
+        """
+        with self.lock(dir_pth):
+            # another process may have rewritten the file within the
+            # timestamp resolution, so don't trust the read cache here
+            self.invalidate(dir_pth)
+            val = self.read(dir_pth) if self.exists(dir_pth) else default
+            val = function(val)
+            self.write(val, dir_pth)
         return val
 
+    def invalidate(self, dir_pth):
+        """ drop this file from the read cache, so that the next read comes
+        from disk
+        """
+        for suffix in _STORAGE_SUFFIXES:
+            READ_CACHE.invalidate(self.path(dir_pth) + suffix)
+
+    def _read_previous(self, dir_pth):
+        """ the value this file holds before it is overwritten, or None if it
+        doesn't exist or can't be read
+        """
+        try:
+            return self.read(dir_pth) if self.exists(dir_pth) else None
+        except (AssertionError, ValueError, TypeError, OSError,
+                yaml.YAMLError):
+            return None
+
+    def _read_value(self, pth):
+        """ read and parse the text file, going through the read cache
+        """
+        if not READ_CACHE.max_size:
+            val_str = autofile.file.read_file(pth)
+            return self.reader_(val_str)
+
+        key = (os.path.abspath(pth), self.reader_key)
+        stat = os.stat(pth)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        val = READ_CACHE.get(key, stamp)
+        if val is None:
+            val_str = autofile.file.read_file(pth)
+            val = self.reader_(val_str)
+            READ_CACHE.put(key, stamp, val, size=stat.st_size)
+        return copy.deepcopy(val)
+
 
 class DataSeries():
     """ directory manager mapping locator values to a directory series
     """
 
     def __init__(self, prefix, map_, nlocs, depth, loc_dfile=None,
-                 root_ds=None, removable=False):
+                 root_ds=None, removable=False, name=None):
         """
+        :param prefix: the filesystem prefix
+        :type prefix: str
         :param map_: maps `nlocs` locators to a segment path consisting of
             `depth` directories
-        :param info_map_: maps `nlocs` locators to an information object, to
-            be written in the data directory
+        :param nlocs: the number of locators of this series
+        :type nlocs: int
+        :param depth: the number of directories in a segment path
+        :type depth: int
+        :param loc_dfile: the locator DataFile, written in each directory of
+            the series so that `existing()` can recover its locators
+        :type loc_dfile: DataFile
+        :param root_ds: the series this one is nested in, if any
+        :type root_ds: DataSeries
+        :param removable: can directories of the series be removed?
+        :type removable: bool
+        :param name: the name of this series in the manifest at its prefix
+            (`MANIFEST_FILE_NAME`), which records the locators of each
+            directory as it is created, so that listings don't have to read
+            every locator file; other series at the same prefix share the
+            manifest under their own names (default: the name of `map_`)
+        :type name: str
+
+        The paths of the root series at given locators are remembered, up to
+        `PREFIX_CACHE_SIZE` of them, so that resolving a path doesn't walk
+        down from the top of the filesystem every time.
         """
         assert os.path.isdir(prefix)
         self.prefix = os.path.abspath(prefix)
         self.map_ = map_
+        self.name = map_.__name__ if name is None else name
         self.nlocs = nlocs
         self.depth = depth
         self.loc_dfile = loc_dfile
         self.root = root_ds
         self.removable = removable
         self.file = types.SimpleNamespace()
+        self._listing_cache = {}
+        # the (map function, number of locators, depth) of each series from
+        # the top of the filesystem down to this one
+        self._chain = ((() if root_ds is None else root_ds._chain)
+                       + ((map_, nlocs, depth),))
+        self._top_prefix = (self.prefix if root_ds is None else
+                            root_ds._top_prefix)
+        self._prefix_cache = collections.OrderedDict()
+        self._prefix_cache_lock = threading.Lock()
 
     def add_data_files(self, dfile_dct):
         """ add DataFiles to the DataSeries
@@ -93,12 +316,13 @@ class DataSeries():
         else:
             root_locs = self._root_locators(locs)
             locs = self._self_locators(locs)
-            prefix = self.root.path(root_locs)
+            prefix = self._root_path(root_locs)
         assert len(locs) == self.nlocs
 
         pth = self.map_(locs)
-        assert _path_is_relative(pth)
-        assert _path_has_depth(pth, self.depth)
+        if SETTINGS.debug_paths:
+            assert _path_is_relative(pth)
+            assert _path_has_depth(pth, self.depth)
         return os.path.join(prefix, pth)
 
     def exists(self, locs=()):
@@ -114,6 +338,9 @@ class DataSeries():
             pth = self.path(locs)
             if self.exists(locs):
                 shutil.rmtree(pth)
+                self._listing_cache.clear()
+                index.forget(pth)
+                journal.forget(pth)
         else:
             raise ValueError("This data series is not removable")
 
@@ -129,10 +356,81 @@ class DataSeries():
         if not self.exists(locs):
             pth = self.path(locs)
             os.makedirs(pth)
+            self._listing_cache.clear()
 
             if self.loc_dfile is not None:
+                root_locs = self._root_locators(locs)
                 locs = self._self_locators(locs)
                 self.loc_dfile.write(locs, pth)
+                prefix = self.prefix_path(root_locs)
+                index.record_leaf(pth, prefix, locs)
+                journal.record_leaf(pth, locs)
+                _append_manifest(prefix, self.name, [
+                    (pth, self.loc_dfile.reader_(self.loc_dfile.writer_(locs)))
+                ])
+
+    def prefix_path(self, root_locs=()):
+        """ absolute path of the directory this series sits in
+        """
+        if self.root is None:
+            prefix = self.prefix
+        else:
+            prefix = self._root_path(root_locs)
+        return prefix
+
+    def file_exists(self, dfile, locs=()):
+        """ does this DataFile exist in the directory at these locators?
+        """
+        return dfile.exists(self.path(locs))
+
+    def write_file(self, dfile, val, locs=()):
+        """ write a DataFile to the directory at these locators
+        """
+        dfile.write(val, self.path(locs))
+
+    def read_file(self, dfile, locs=()):
+        """ read a DataFile from the directory at these locators
+        """
+        return dfile.read(self.path(locs))
+
+    def open_file(self, dfile, locs=()):
+        """ open a DataFile in the directory at these locators for reading
+        """
+        return dfile.open(self.path(locs))
+
+    def lock_file(self, dfile, locs=(), lease=LOCK_LEASE, timeout=None):
+        """ an advisory lock on a DataFile in the directory at these locators
+        """
+        return dfile.lock(self.path(locs), lease=lease, timeout=timeout)
+
+    def update_file(self, dfile, function, locs=(), default=None):
+        """ atomically read, modify and write a DataFile in the directory at
+        these locators (see `DataFile.update`)
+        """
+        return dfile.update(function, self.path(locs), default=default)
+
+    async def aexists(self, locs=()):
+        """ does this directory exist? (asyncio version of `exists`)
+        """
+        return await _in_executor(self.exists, locs)
+
+    async def acreate(self, locs=()):
+        """ create a directory at this prefix (asyncio version of `create`)
+        """
+        await _in_executor(self.create, locs)
+
+    async def aexisting(self, root_locs=(), relative=False):
+        """ iterate over the locators for existing paths (asyncio version of
+        `existing`)
+
+        The listing is done in the executor, without blocking the event loop:
+
+            async for locs in fs.leaf.aexisting():
+                ...
+        """
+        locs_lst = await _in_executor(self.existing, root_locs, relative)
+        for locs in locs_lst:
+            yield locs
 
     def existing(self, root_locs=(), relative=False):
         """ return the list of locators for existing paths
@@ -141,9 +439,10 @@ class DataSeries():
             raise ValueError("This function does not work "
                              "without a locator DataFile")
 
-        pths = self.existing_paths(root_locs)
-        locs_lst = tuple(self.loc_dfile.read(pth) for pth in pths)
-        if not relative:
+        _, locs_lst = self._listing(root_locs, read_locs=True)
+        if relative:
+            locs_lst = tuple(map(list, locs_lst))
+        else:
             locs_lst = tuple(map(list(root_locs).__add__, locs_lst))
 
         return locs_lst
@@ -151,17 +450,82 @@ class DataSeries():
     def existing_paths(self, root_locs=()):
         """ existing paths at this prefix/root directory
         """
-        if self.root is None:
-            prefix = self.prefix
-        else:
-            prefix = self.root.path(root_locs)
-
-        pth_pattern = os.path.join(prefix, *('*' * self.depth))
-        pths = filter(os.path.isdir, glob.glob(pth_pattern))
-        pths = tuple(sorted(os.path.join(prefix, pth) for pth in pths))
+        pths, _ = self._listing(root_locs, read_locs=False)
         return pths
 
     # helpers
+    def _listing(self, root_locs, read_locs):
+        """ (cached) existing paths and their relative locators
+
+        The listing for each prefix is cached along with the modification
+        times of the directories it was built from, so that repeated calls on
+        an unchanged trunk only cost a `stat` per directory. Locators are
+        only read when they are requested, and then from the trunk manifest.
+        """
+        prefix = self.prefix_path(root_locs)
+        stamp = _listing_stamp(prefix, self.depth)
+        pths, locs_lst = None, None
+        if prefix in self._listing_cache:
+            cached_stamp, pths, locs_lst = self._listing_cache[prefix]
+            if cached_stamp != stamp:
+                pths, locs_lst = None, None
+
+        if pths is None:
+            pths = _scan_directories(prefix, self.depth,
+                                     nworkers=SETTINGS.listing_workers)
+
+        if read_locs and locs_lst is None:
+            locs_lst = self._manifest_locators(prefix, pths)
+
+        if _stamp_is_settled(stamp):
+            self._listing_cache[prefix] = (stamp, pths, locs_lst)
+
+        return pths, locs_lst
+
+    def _manifest_locators(self, prefix, pths):
+        """ locators of these leaves, from the manifest at their prefix
+
+        Leaves missing from the manifest (because they were created before
+        there was one, or by something other than `create`) have their
+        locator files read, and are added to it.
+        """
+        locs_dct = _read_manifest(prefix, self.name)
+        missing = [pth for pth in pths
+                   if os.path.relpath(pth, prefix) not in locs_dct]
+        missing_locs_lst = [self.loc_dfile.read(pth) for pth in missing]
+        if missing:
+            _append_manifest(prefix, self.name,
+                             zip(missing, missing_locs_lst))
+
+        locs_dct.update((os.path.relpath(pth, prefix), locs)
+                        for pth, locs in zip(missing, missing_locs_lst))
+        return tuple(locs_dct[os.path.relpath(pth, prefix)] for pth in pths)
+
+    def _root_path(self, root_locs):
+        """ the path of the root DataSeries at these locators, remembered
+        from previous calls if possible
+        """
+        try:
+            key = _locators_key(root_locs)
+            hash(key)
+        except TypeError:
+            key = None
+
+        if key is not None:
+            with self._prefix_cache_lock:
+                if key in self._prefix_cache:
+                    self._prefix_cache.move_to_end(key)
+                    return self._prefix_cache[key]
+
+        pth = _resolve_path(self._top_prefix, self._chain[:-1], root_locs)
+
+        if key is not None:
+            with self._prefix_cache_lock:
+                self._prefix_cache[key] = pth
+                if len(self._prefix_cache) > PREFIX_CACHE_SIZE:
+                    self._prefix_cache.popitem(last=False)
+        return pth
+
     def _self_locators(self, locs):
         """ locators for this DataSeriesDir
         """
@@ -179,6 +543,135 @@ class DataSeries():
         return locs[:root_nlocs]
 
 
+class PackedDataSeries(DataSeries):
+    """ directory manager keeping the files of its leaves in a container
+
+    All files of the leaves at a given prefix, including their locator files,
+    are stored in a single SQLite container (`PACK_FILE_NAME`) in the prefix
+    directory, instead of as separate files. The leaf directories themselves
+    are still created, so that other filesystems can be nested in them.
+    """
+
+    def __init__(self, prefix, map_, nlocs, depth, loc_dfile=None,
+                 root_ds=None, removable=False, name=None):
+        assert loc_dfile is not None
+        super(PackedDataSeries, self).__init__(
+            prefix, map_=map_, nlocs=nlocs, depth=depth, loc_dfile=loc_dfile,
+            root_ds=root_ds, removable=removable, name=name)
+        self._packs = {}
+
+    def exists(self, locs=()):
+        """ does this leaf exist?
+        """
+        return self.file_exists(self.loc_dfile, locs)
+
+    def remove(self, locs=()):
+        """ remove this leaf
+        """
+        if not self.removable:
+            raise ValueError("This data series is not removable")
+
+        pth = self.path(locs)
+        self._pack(locs).remove(self._leaf_name(locs))
+        if os.path.isdir(pth):
+            shutil.rmtree(pth)
+        index.forget(pth)
+        journal.forget(pth)
+
+    def create(self, locs=()):
+        """ create a leaf at this prefix
+        """
+        if self.root is not None:
+            root_locs = self._root_locators(locs)
+            self.root.create(root_locs)
+
+        if not self.exists(locs):
+            pth = self.path(locs)
+            os.makedirs(pth, exist_ok=True)
+            self.write_file(self.loc_dfile, self._self_locators(locs), locs)
+            index.record_leaf(pth, self.prefix_path(self._root_locators(locs)),
+                              self._self_locators(locs))
+            journal.record_leaf(pth, self._self_locators(locs))
+
+    def file_exists(self, dfile, locs=()):
+        """ does this DataFile exist in the leaf at these locators?
+        """
+        return self._pack(locs).exists(self._leaf_name(locs), dfile.name)
+
+    def write_file(self, dfile, val, locs=()):
+        """ write a DataFile to the leaf at these locators
+        """
+        val_str = dfile.writer_(val)
+        pth = dfile.path(self.path(locs))
+        prev_val = None
+        if journal.needs_previous(pth, val) and self.file_exists(dfile, locs):
+            try:
+                prev_val = self.read_file(dfile, locs)
+            except (AssertionError, ValueError, TypeError, yaml.YAMLError):
+                prev_val = None
+        self._pack(locs).write(self._leaf_name(locs), dfile.name, val_str)
+        index.record_file(pth, val)
+        journal.record_file(pth, val, prev_val=prev_val)
+
+    def read_file(self, dfile, locs=()):
+        """ read a DataFile from the leaf at these locators
+        """
+        assert self.file_exists(dfile, locs)
+        val_str = self._pack(locs).read(self._leaf_name(locs), dfile.name)
+        val = dfile.reader_(val_str)
+        return (numpy.array(val)
+                if dfile.array_sidecar and SETTINGS.array_sidecars else val)
+
+    def open_file(self, dfile, locs=()):
+        """ open a DataFile in the leaf at these locators for reading
+        """
+        assert self.file_exists(dfile, locs)
+        return io.StringIO(
+            self._pack(locs).read(self._leaf_name(locs), dfile.name))
+
+    def update_file(self, dfile, function, locs=(), default=None):
+        """ atomically read, modify and write a DataFile in the leaf at these
+        locators
+        """
+        with self.lock_file(dfile, locs):
+            val = (self.read_file(dfile, locs)
+                   if self.file_exists(dfile, locs) else default)
+            val = function(val)
+            self.write_file(dfile, val, locs)
+        return val
+
+    def existing(self, root_locs=(), relative=False):
+        """ return the list of locators for existing leaves
+        """
+        prefix = self.prefix_path(root_locs)
+        val_strs = self._pack_at(prefix).read_all(self.loc_dfile.name)
+        locs_lst = tuple(list(self.loc_dfile.reader_(val_str))
+                         for _, val_str in val_strs)
+        if not relative:
+            locs_lst = tuple(map(list(root_locs).__add__, locs_lst))
+        return locs_lst
+
+    def existing_paths(self, root_locs=()):
+        """ existing leaf paths at this prefix/root directory
+        """
+        prefix = self.prefix_path(root_locs)
+        val_strs = self._pack_at(prefix).read_all(self.loc_dfile.name)
+        return tuple(os.path.join(prefix, leaf) for leaf, _ in val_strs)
+
+    # helpers
+    def _leaf_name(self, locs):
+        return self.map_(self._self_locators(locs))
+
+    def _pack(self, locs):
+        return self._pack_at(self.prefix_path(self._root_locators(locs)))
+
+    def _pack_at(self, prefix):
+        if prefix not in self._packs:
+            self._packs[prefix] = _PackFile(
+                os.path.join(prefix, PACK_FILE_NAME))
+        return self._packs[prefix]
+
+
 class FileSystem(types.SimpleNamespace):
     """ a collection of DataSeries
     """
@@ -199,6 +692,222 @@ class FileSystem(types.SimpleNamespace):
             setattr(self, name, obj)
 
 
+class ReadCache():
+    """ bounded LRU cache of parsed DataFile values
+
+    Entries are keyed on the absolute file path and the reader's identity
+    (see `DataFile`), and are only
+    returned while the file's modification time and size are unchanged. The
+    memory footprint is bounded by the total size of the files behind the
+    cached values, as a proxy for the size of the parsed objects.
+    """
+
+    def __init__(self, max_size=0):
+        """
+        :param max_size: the memory cap, in bytes of file contents (0 disables
+            the cache)
+        :type max_size: int
+        """
+        self.max_size = max_size
+        self.size = 0
+        self._entries = collections.OrderedDict()
+        self._keys_by_path = collections.defaultdict(set)
+        self._lock = threading.Lock()
+
+    def get(self, key, stamp):
+        """ the cached value for this key, if it is still current
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != stamp:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, stamp, val, size):
+        """ cache a value, evicting the least recently used ones as needed
+        """
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            if size > self.max_size:
+                return
+            self._entries[key] = (stamp, val, size)
+            self._keys_by_path[key[0]].add(key)
+            self.size += size
+            while self.size > self.max_size:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self, pth):
+        """ drop all cached values for a file path
+        """
+        with self._lock:
+            for key in tuple(self._keys_by_path.get(os.path.abspath(pth), ())):
+                self._pop(key)
+
+    def resize(self, max_size):
+        """ change the memory cap, evicting values as needed
+        """
+        with self._lock:
+            self.max_size = max_size
+            while self.size > self.max_size:
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, key):
+        _, _, size = self._entries.pop(key)
+        self.size -= size
+        keys = self._keys_by_path[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_path[key[0]]
+
+
+READ_CACHE = ReadCache()
+
+
+class FileLock():
+    """ advisory lock on a file, shared between threads, processes and nodes
+
+    The lock is an fcntl lock on a lock file. Its holder records a lease
+    (host, process and expiry time) in the lock file; once the lease has
+    run out, waiters assume the holder is dead or hung, and break the lock by
+    replacing the lock file. Holders should therefore finish well within the
+    lease. A held lock without a readable lease (its holder hasn't written
+    one yet, or hung before it could) is only broken once it has stayed that
+    way for a whole lease. Where fcntl isn't available, only threads are kept
+    apart.
+
+    Use it as a context manager:
+
+        with FileLock(pth):
+            ...
+    """
+    # thread locks by lock path, kept only as long as a FileLock uses them
+    _THREAD_LOCKS = weakref.WeakValueDictionary()
+    _THREAD_LOCKS_LOCK = threading.Lock()
+
+    def __init__(self, lock_path, lease=LOCK_LEASE, timeout=None):
+        """
+        :param lock_path: the lock file path
+        :type lock_path: str
+        :param lease: how long (in seconds) the lock may be held before it
+            can be broken
+        :type lease: float
+        :param timeout: how long (in seconds) to wait for the lock before
+            raising a TimeoutError (default: wait indefinitely)
+        :type timeout: float
+        """
+        self.path = os.path.abspath(lock_path)
+        self.lease = lease
+        self.timeout = timeout
+        with self._THREAD_LOCKS_LOCK:
+            self._thread_lock = self._THREAD_LOCKS.get(self.path)
+            if self._thread_lock is None:
+                self._thread_lock = threading.Lock()
+                self._THREAD_LOCKS[self.path] = self._thread_lock
+        self._fdesc = None
+        # the lock file inode and the time it was first seen held without a
+        # readable lease
+        self._blank_lease = None
+
+    def acquire(self):
+        """ acquire the lock, waiting for it if necessary
+        """
+        deadline = (None if self.timeout is None else
+                    time.time() + self.timeout)
+        if not self._thread_lock.acquire(
+                timeout=(-1 if deadline is None else self.timeout)):
+            raise TimeoutError("Timed out waiting for {}".format(self.path))
+
+        try:
+            while fcntl is not None and not self._try_acquire():
+                if deadline is not None and time.time() > deadline:
+                    raise TimeoutError("Timed out waiting for {}"
+                                       .format(self.path))
+                time.sleep(LOCK_POLL_INTERVAL)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        """ release the lock
+        """
+        if self._fdesc is not None:
+            os.ftruncate(self._fdesc, 0)
+            os.close(self._fdesc)
+            self._fdesc = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *_):
+        self.release()
+
+    def _try_acquire(self):
+        """ try once to take the fcntl lock, breaking it if its lease has run
+        out
+        """
+        fdesc = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.lockf(fdesc, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fdesc)
+            if self._lease_has_expired():
+                _remove_if_exists(self.path)
+            return False
+
+        # if the lock file was broken (replaced) before the lock was taken,
+        # it no longer guards anything
+        try:
+            is_current = (os.stat(self.path).st_ino ==
+                          os.fstat(fdesc).st_ino)
+        except FileNotFoundError:
+            is_current = False
+        if not is_current:
+            os.close(fdesc)
+            return False
+
+        lease_str = json.dumps({'host': socket.gethostname(),
+                                'pid': os.getpid(),
+                                'expires': time.time() + self.lease})
+        os.ftruncate(fdesc, 0)
+        os.pwrite(fdesc, lease_str.encode(), 0)
+        self._fdesc = fdesc
+        return True
+
+    def _lease_has_expired(self):
+        """ has the lease on the lock file run out?
+        """
+        try:
+            with open(self.path, 'r') as file_obj:
+                ino = os.fstat(file_obj.fileno()).st_ino
+                expires = float(json.loads(file_obj.read())['expires'])
+        except FileNotFoundError:
+            return False
+        except (ValueError, KeyError, TypeError):
+            # no lease recorded (yet), so the holder gets a whole lease from
+            # when that was first seen
+            now = time.time()
+            if self._blank_lease is None or self._blank_lease[0] != ino:
+                self._blank_lease = (ino, now)
+            return now > self._blank_lease[1] + self.lease
+
+        self._blank_lease = None
+        return time.time() > expires
+
+
+def set_read_cache_size(max_size):
+    """ turn on the DataFile read cache with a memory cap (in bytes of file
+    contents), or turn it off with a cap of 0
+    """
+    READ_CACHE.resize(max_size)
+
+
 # helpers:
 class _DataSeriesFile():
     """ file manager mapping locator values to files in a directory series
@@ -216,17 +925,484 @@ class _DataSeriesFile():
     def exists(self, locs=()):
         """ does this file exist?
         """
-        return self.file.exists(self.dir.path(locs))
+        return self.dir.file_exists(self.file, locs)
 
     def write(self, val, locs=()):
         """ write data to this file
         """
-        self.file.write(val, self.dir.path(locs))
+        self.dir.write_file(self.file, val, locs)
 
     def read(self, locs=()):
         """ read data from this file
         """
-        return self.file.read(self.dir.path(locs))
+        return self.dir.read_file(self.file, locs)
+
+    def open(self, locs=()):
+        """ open this file for reading as text, without reading it into
+        memory
+        """
+        return self.dir.open_file(self.file, locs)
+
+    def lock(self, locs=(), lease=LOCK_LEASE, timeout=None):
+        """ an advisory lock on this file (see `FileLock`)
+        """
+        return self.dir.lock_file(self.file, locs, lease=lease,
+                                  timeout=timeout)
+
+    def update(self, function, locs=(), default=None):
+        """ atomically read, modify and write this file
+
+        :param function: maps the current value (or `default`, if the file
+            doesn't exist) to the new value
+        :type function: callable
+        :returns: the new value
+        """
+        return self.dir.update_file(self.file, function, locs,
+                                    default=default)
+
+    def invalidate(self, locs=()):
+        """ drop this file from the read cache (see `DataFile.invalidate`)
+        """
+        self.file.invalidate(self.dir.path(locs))
+
+    async def aexists(self, locs=()):
+        """ does this file exist? (asyncio version of `exists`)
+        """
+        return await _in_executor(self.exists, locs)
+
+    async def awrite(self, val, locs=()):
+        """ write data to this file (asyncio version of `write`)
+        """
+        await _in_executor(self.write, val, locs)
+
+    async def aread(self, locs=()):
+        """ read data from this file (asyncio version of `read`)
+
+        Many reads can be overlapped by gathering them:
+
+            enes = await asyncio.gather(
+                *(fs.leaf.file.energy.aread(locs) for locs in locs_lst))
+        """
+        return await _in_executor(self.read, locs)
+
+    def read_many(self, locs_lst, transform_=None, nworkers=None):
+        """ read data from this file for a list of locators
+
+        The files are read in a thread pool, to overlap I/O latency. If all
+        values are scalars, or numpy arrays of the same shape, they are
+        stacked into a single array -- for example, an (N,) energy vector.
+
+        :param locs_lst: the locators to read at
+        :param transform_: optionally applied to each value before stacking,
+            e.g. `automol.geom.coordinates` for an (N, natom, 3) block
+        :type transform_: callable
+        :param nworkers: the number of threads (default: one per file, up to
+            `READ_MANY_MAX_WORKERS`)
+        :type nworkers: int
+        :returns: a numpy array, or a tuple of values if they can't be stacked
+        """
+        locs_lst = tuple(locs_lst)
+        if not locs_lst:
+            return ()
+
+        def _read(locs):
+            val = self.read(locs)
+            if transform_ is not None:
+                val = transform_(val)
+            elif self.file.array_sidecar:
+                val = numpy.array(val)
+            return val
+
+        nworkers = (min(len(locs_lst), READ_MANY_MAX_WORKERS)
+                    if nworkers is None else nworkers)
+        with concurrent.futures.ThreadPoolExecutor(nworkers) as executor:
+            vals = tuple(executor.map(_read, locs_lst))
+
+        return _stacked(vals)
+
+
+class _PackFile():
+    """ SQLite container of the files of a series of leaves
+
+    Files are keyed by leaf (the leaf path relative to the prefix) and file
+    name. The database is only created once something is written to it.
+    """
+
+    def __init__(self, pth):
+        self.pth = pth
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def exists(self, leaf, name):
+        """ does this file exist?
+        """
+        rows = self._query('SELECT 1 FROM files WHERE leaf = ? AND name = ?',
+                           (leaf, name))
+        return bool(rows)
+
+    def write(self, leaf, name, val_str):
+        """ write a file
+        """
+        self._execute('INSERT OR REPLACE INTO files (leaf, name, data) '
+                      'VALUES (?, ?, ?)', (leaf, name, val_str), create=True)
+
+    def read(self, leaf, name):
+        """ read a file
+        """
+        rows = self._query(
+            'SELECT data FROM files WHERE leaf = ? AND name = ?', (leaf, name))
+        assert rows
+        return rows[0][0]
+
+    def read_all(self, name):
+        """ read a given file from every leaf that has one
+
+        :returns: pairs of leaves and file contents, sorted by leaf
+        """
+        return tuple(self._query(
+            'SELECT leaf, data FROM files WHERE name = ? ORDER BY leaf',
+            (name,)))
+
+    def remove(self, leaf):
+        """ remove all files of a leaf
+        """
+        self._execute('DELETE FROM files WHERE leaf = ?', (leaf,))
+
+    def _connect(self, create):
+        if self._conn is None and (create or os.path.exists(self.pth)):
+            self._conn = sqlite3.connect(self.pth, check_same_thread=False)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS files (leaf TEXT NOT NULL, '
+                'name TEXT NOT NULL, data TEXT NOT NULL, '
+                'PRIMARY KEY (leaf, name))')
+        return self._conn
+
+    def _execute(self, sql, params, create=False):
+        with self._lock:
+            conn = self._connect(create)
+            if conn is not None:
+                with conn:
+                    conn.execute(sql, params)
+
+    def _query(self, sql, params):
+        with self._lock:
+            conn = self._connect(create=False)
+            if conn is None:
+                return []
+            return conn.execute(sql, params).fetchall()
+
+
+def _stacked(vals):
+    """ stack scalars or equally-shaped arrays into an array, if possible
+    """
+    if all(isinstance(val, numbers.Real) and not isinstance(val, bool)
+           for val in vals):
+        ret = numpy.array(vals)
+    elif (all(isinstance(val, numpy.ndarray) for val in vals)
+          and len(set(val.shape for val in vals)) == 1):
+        ret = numpy.stack(vals)
+    else:
+        ret = vals
+    return ret
+
+
+def set_array_sidecars(write):
+    """ turn on (or off) writing of binary .npy sidecars for array-valued
+    files
+
+    The text files are always written and stay the source of truth; a
+    sidecar is only read while it is at least as new as its text file.
+    While sidecars are on, array-valued files are read as numpy arrays;
+    while they are off, they are read as they always were, and writes remove
+    their old sidecars.
+    """
+    SETTINGS.array_sidecars = write
+
+
+def set_compression(extension, compression):
+    """ set the compression format for files of a given type
+
+    Files that were stored in another format are replaced when they are next
+    written; reads work whatever format a file is stored in.
+
+    :param extension: the file extension, e.g.
+        `autofile.file.name.Extension.OUTPUT_LOG`
+    :type extension: str
+    :param compression: the compression format (see
+        `autofile.file.Compression`)
+    :type compression: str
+    """
+    assert compression in _STORAGE_SUFFIXES
+    SETTINGS.compression[extension] = compression
+
+
+def set_listing_workers(nworkers):
+    """ set the number of threads for listing directory series that are more
+    than one level deep (None, the default, lists them serially)
+    """
+    SETTINGS.listing_workers = nworkers
+
+
+def set_async_workers(nworkers):
+    """ set the number of threads behind the asyncio interface, which bounds
+    the number of reads and writes in flight at once
+    """
+    with _ASYNC_EXECUTOR_LOCK:
+        SETTINGS.async_workers = nworkers
+        executor = _ASYNC_EXECUTOR['executor']
+        _ASYNC_EXECUTOR['executor'] = None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def set_blob_store(prefix, extensions=BLOB_EXTENSIONS):
+    """ deduplicate files of these types under a filesystem prefix
+
+    Files of these types written anywhere under the prefix are stored as
+    hard links into a content-addressed blob store in the prefix (see
+    `autofile.system.blob`), so that identical contents are only stored
+    once. Pass no extensions to turn this off again.
+
+    :param prefix: the filesystem prefix
+    :type prefix: str
+    :param extensions: the file extensions, e.g.
+        `autofile.file.name.Extension.OUTPUT_LOG`
+    :type extensions: tuple[str]
+    """
+    prefix = os.path.abspath(prefix)
+    if extensions:
+        SETTINGS.blob_stores[prefix] = tuple(extensions)
+    else:
+        SETTINGS.blob_stores.pop(prefix, None)
+
+
+def set_debug_paths(debug):
+    """ turn on (or off) checking the shape of every path segment that is
+    resolved from locators
+    """
+    SETTINGS.debug_paths = debug
+
+
+def settings():
+    """ a (picklable) snapshot of the global settings
+
+    This covers the switches of the `set_*` functions of autofile, and the
+    indices and journals attached to prefixes. Processes that aren't forked
+    from this one start out with the defaults, so pass them the snapshot to
+    apply with `apply_settings`.
+
+    :rtype: dict
+    """
+    return {
+        'model': copy.deepcopy(vars(SETTINGS)),
+        'read_cache_size': READ_CACHE.max_size,
+        'durability': autofile.file.durability(),
+        'json_encoding': autofile.info.json_encoding(),
+        'trusted_locators': map_.trusted_locators(),
+        'indices': index.attached(),
+        'journals': journal.attached(),
+    }
+
+
+def apply_settings(settings_):
+    """ apply a snapshot of the global settings, from `settings`
+
+    Indices and journals are attached and detached as needed, so applying
+    the same snapshot again costs nothing.
+    """
+    vars(SETTINGS).update(copy.deepcopy(settings_['model']))
+    if READ_CACHE.max_size != settings_['read_cache_size']:
+        set_read_cache_size(settings_['read_cache_size'])
+    if autofile.file.durability() != tuple(settings_['durability']):
+        autofile.file.set_durability(*settings_['durability'])
+    autofile.info.set_json_encoding(settings_['json_encoding'])
+    if map_.trusted_locators() != settings_['trusted_locators']:
+        map_.set_trusted_locators(settings_['trusted_locators'])
+
+    for module, pth_key in ((index, 'indices'), (journal, 'journals')):
+        pth_dct = settings_[pth_key]
+        for prefix, pth in module.attached().items():
+            if pth_dct.get(prefix) != pth:
+                module.detach(prefix)
+        attached = module.attached()
+        for prefix, pth in pth_dct.items():
+            if prefix not in attached:
+                module.attach(prefix, pth)
+
+
+async def _in_executor(function, *args):
+    """ run a blocking function in the (shared) asyncio executor
+    """
+    with _ASYNC_EXECUTOR_LOCK:
+        executor = _ASYNC_EXECUTOR['executor']
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(
+                SETTINGS.async_workers, thread_name_prefix='autofile')
+            _ASYNC_EXECUTOR['executor'] = executor
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, function, *args)
+
+
+def _remove_if_exists(pth):
+    """ remove a file, if it is (still) there
+    """
+    try:
+        os.remove(pth)
+    except FileNotFoundError:
+        pass
+
+
+def _compression(file_name):
+    """ the compression suffix to write a file with, by its extension
+    """
+    for ext, compression in SETTINGS.compression.items():
+        if file_name.endswith(ext):
+            return compression
+    return autofile.file.Compression.NONE
+
+
+def _blob_prefix(file_name, dir_pth):
+    """ the prefix of the blob store to write a file through, if any
+    """
+    if SETTINGS.blob_stores:
+        dir_pth = os.path.abspath(dir_pth)
+        for prefix, extensions in SETTINGS.blob_stores.items():
+            if (file_name.endswith(extensions)
+                    and dir_pth.startswith(prefix + os.sep)):
+                return prefix
+    return None
+
+
+def _is_as_new_as(pth, ref_pth):
+    """ does this file exist and is it at least as new as the reference file?
+    """
+    try:
+        return os.stat(pth).st_mtime_ns >= os.stat(ref_pth).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def _read_manifest(prefix, name):
+    """ the locators recorded for a series in the manifest at a prefix, by
+    relative leaf path
+
+    Later entries for a leaf replace earlier ones, and lines that can't be
+    parsed (such as one cut short by a crash, or one from before entries were
+    named by series) are ignored.
+    """
+    locs_dct = {}
+    try:
+        with open(os.path.join(prefix, MANIFEST_FILE_NAME), 'r') as file_obj:
+            for line in file_obj:
+                try:
+                    ds_name, rel_pth, locs = json.loads(line)
+                except ValueError:
+                    continue
+                if ds_name == name:
+                    locs_dct[rel_pth] = locs
+    except FileNotFoundError:
+        pass
+    return locs_dct
+
+
+def _append_manifest(prefix, name, pth_locs_pairs):
+    """ record leaf locators for a series in the manifest at a prefix
+
+    Each batch of entries is appended with a single write, under a file lock,
+    so concurrent writers don't interleave their lines. Locators that can't
+    be stored as JSON are left out; their leaves are picked up from their
+    locator files instead.
+    """
+    lines = []
+    for pth, locs in pth_locs_pairs:
+        try:
+            lines.append(
+                json.dumps([name, os.path.relpath(pth, prefix), locs]))
+        except TypeError:
+            continue
+
+    if lines:
+        lock_pth = os.path.join(prefix, '.{}.lock'.format(MANIFEST_FILE_NAME))
+        with FileLock(lock_pth):
+            with open(os.path.join(prefix, MANIFEST_FILE_NAME), 'a') as fobj:
+                fobj.write(''.join(line + '\n' for line in lines))
+
+
+def _scan_directories(prefix, depth, nworkers=None):
+    """ the directories `depth` levels below a prefix, in sorted order
+
+    Hidden directories are skipped, as they would be by a glob. Entry types
+    come from `os.scandir`, so no directory is stat-ed twice.
+
+    :param nworkers: if set, the directories below each top directory are
+        scanned in a pool of this many threads
+    """
+    def _scan(pths, depth):
+        for _ in range(depth):
+            pths = [ent.path for pth in pths for ent in _scandir(pth)
+                    if not ent.name.startswith('.') and ent.is_dir()]
+        return pths
+
+    if nworkers and depth > 1:
+        top_pths = _scan([prefix], 1)
+        with concurrent.futures.ThreadPoolExecutor(nworkers) as executor:
+            pths_lst = executor.map(lambda pth: _scan([pth], depth-1),
+                                    top_pths)
+            pths = [pth for pths in pths_lst for pth in pths]
+    else:
+        pths = _scan([prefix], depth)
+    return tuple(sorted(pths))
+
+
+def _scandir(pth):
+    """ the entries of a directory, or none if it has gone away
+    """
+    try:
+        with os.scandir(pth) as ents:
+            return list(ents)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def _listing_stamp(prefix, depth):
+    """ modification times of the directories making up a listing
+
+    These are the prefix and every intermediate directory above the leaves;
+    adding or removing a leaf changes the mtime of one of them.
+    """
+    if not os.path.isdir(prefix):
+        return ()
+
+    stamp = [(prefix, os.stat(prefix).st_mtime_ns)]
+    dir_pths = [prefix]
+    for _ in range(depth - 1):
+        dir_pths = sorted(ent.path for pth in dir_pths
+                          for ent in os.scandir(pth) if ent.is_dir())
+        stamp.extend((pth, os.stat(pth).st_mtime_ns) for pth in dir_pths)
+    return tuple(stamp)
+
+
+def _stamp_is_settled(stamp):
+    """ are the modification times in this stamp old enough to be trusted?
+    """
+    now = time.time_ns()
+    return all(now - mtime > LISTING_CACHE_RACY_WINDOW for _, mtime in stamp)
+
+
+def _resolve_path(prefix, chain, locs):
+    """ resolve locators through a chain of map functions, in one pass
+    """
+    assert len(locs) == sum(nlocs for _, nlocs, _ in chain)
+    pth = prefix
+    start = 0
+    for map_, nlocs, depth in chain:
+        seg = map_(locs[start:start+nlocs])
+        if SETTINGS.debug_paths:
+            assert _path_is_relative(seg)
+            assert _path_has_depth(seg, depth)
+        pth = os.path.join(pth, seg)
+        start += nlocs
+    return pth
 
 
 def _path_is_relative(pth):
@@ -1,11 +1,19 @@
 """ test autofile.system
 """
 import os
+import asyncio
+import shutil
+import pickle
 import numbers
 import tempfile
+import time
+import fcntl
+import threading
+import multiprocessing
 import numpy
 import pytest
 import automol
+import autofile.file
 import autofile.info
 import autofile.system
 
@@ -67,6 +75,37 @@ def test__file__output_file():
     print(out_str)
 
 
+def test__file__output_file_compression():
+    """ test compression of autofile.system.file_.output_file
+    """
+    prefix = os.path.join(PREFIX, 'output_compression')
+    os.mkdir(prefix)
+
+    ref_out_str = '<output file contents>\n' * 100
+    out_dfile = autofile.system.file_.output_file('test')
+    out_ext = autofile.file.name.Extension.OUTPUT_LOG
+
+    out_dfile.write(ref_out_str, prefix)
+    autofile.system.model.set_compression(out_ext,
+                                          autofile.file.Compression.GZIP)
+    try:
+        out_dfile.write(ref_out_str, prefix)
+    finally:
+        autofile.system.model.set_compression(out_ext,
+                                              autofile.file.Compression.NONE)
+
+    # the compressed file replaces the plain one, and reads the same
+    assert out_dfile.stored_path(prefix) == out_dfile.path(prefix) + '.gz'
+    assert not os.path.exists(out_dfile.path(prefix))
+    assert out_dfile.exists(prefix)
+    assert out_dfile.read(prefix) == ref_out_str
+    with out_dfile.open(prefix) as file_obj:
+        assert sum(1 for _ in file_obj) == 100
+
+    out_dfile.write(ref_out_str, prefix)
+    assert out_dfile.stored_path(prefix) == out_dfile.path(prefix)
+
+
 def test__file__information():
     """ test autofile.system.file_.information
     """
@@ -93,6 +132,31 @@ def test__file__information():
     print(inf_obj)
 
 
+def test__file__run_information():
+    """ test autofile.system.file_.information for run information
+    """
+    ref_inf_obj = autofile.system.info.run(
+        job='energy', prog='psi4', version='', method='hf', basis='sto-3g',
+        status=autofile.system.RunStatus.RUNNING)
+    assert isinstance(ref_inf_obj, autofile.system.info.RunRecord)
+
+    inf_dfile = autofile.system.file_.information(
+        'run_test', function=autofile.system.info.run)
+    inf_dfile.write(ref_inf_obj, PREFIX)
+    inf_obj = inf_dfile.read(PREFIX)
+    assert isinstance(inf_obj, autofile.system.info.RunRecord)
+    assert inf_obj == ref_inf_obj
+
+    autofile.info.set_json_encoding(True)
+    try:
+        inf_obj.status = autofile.system.RunStatus.SUCCESS
+        inf_dfile.write(inf_obj, PREFIX)
+    finally:
+        autofile.info.set_json_encoding(False)
+    assert autofile.file.read_file(inf_dfile.path(PREFIX)).startswith('{')
+    assert inf_dfile.read(PREFIX).status == autofile.system.RunStatus.SUCCESS
+
+
 def test__file__energy():
     """ test autofile.system.file_.energy
     """
@@ -182,6 +246,43 @@ def test__file__hessian():
     print(hess)
 
 
+def test__file__hessian_sidecar():
+    """ test the binary .npy sidecar of autofile.system.file_.hessian
+    """
+    prefix = os.path.join(PREFIX, 'hessian_sidecar')
+    os.mkdir(prefix)
+
+    ref_hess = numpy.eye(6)
+    hess_dfile = autofile.system.file_.hessian('test')
+
+    autofile.system.model.set_array_sidecars(True)
+    try:
+        hess_dfile.write(ref_hess, prefix)
+        assert os.path.isfile(hess_dfile.array_path(prefix))
+
+        hess = hess_dfile.read(prefix)
+        assert isinstance(hess, numpy.memmap)
+        assert numpy.allclose(hess, ref_hess)
+
+        # a text file edited after the sidecar takes precedence
+        pth = hess_dfile.path(prefix)
+        autofile.file.write_file(pth, hess_dfile.writer_(2 * ref_hess))
+        stat = os.stat(pth)
+        os.utime(pth, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        hess = hess_dfile.read(prefix)
+        assert not isinstance(hess, numpy.memmap)
+        assert numpy.allclose(hess, 2 * ref_hess)
+    finally:
+        autofile.system.model.set_array_sidecars(False)
+
+    # with sidecars off, reads return what they always did, and writes
+    # remove the old sidecar
+    assert isinstance(hess_dfile.read(prefix), tuple)
+    hess_dfile.write(3 * ref_hess, prefix)
+    assert not os.path.exists(hess_dfile.array_path(prefix))
+    assert numpy.allclose(hess_dfile.read(prefix), 3 * ref_hess)
+
+
 def test__file__zmatrix():
     """ test autofile.system.file_.zmatrix
     """
@@ -266,6 +367,108 @@ def test__file__trajectory():
     # are for human use only -- we aren't going to use this for data storage
 
 
+def test__traj():
+    """ test autofile.system.traj.TrajectoryStore
+    """
+    prefix = os.path.join(PREFIX, 'traj')
+    os.mkdir(prefix)
+
+    geo = (('O', (0.0, 0.0, 0.0)),
+           ('H', (0.0, 0.0, 1.8)),
+           ('H', (0.0, 1.8, 0.0)))
+    traj_dfile = autofile.system.file_.trajectory('test')
+    traj_store = autofile.system.traj.TrajectoryStore(
+        traj_dfile.path(prefix))
+
+    enes = [-1.5, -3.5, -2.5]
+    locs_lst = [['a'], ['b'], ['c']]
+    assert traj_store.missing(locs_lst) == tuple(locs_lst)
+    traj_store.append(
+        (ene, locs, ('energy: {}'.format(ene), geo))
+        for ene, locs in zip(enes[:2], locs_lst[:2]))
+    assert traj_store.missing(locs_lst) == (['c'],)
+    traj_store.append([(enes[2], ['c'], ('energy: -2.5', geo))])
+
+    # the sorted view leaves out locators that aren't asked for
+    assert traj_store.write_sorted(locs_lst[1:]) == 2
+    traj_str = autofile.file.read_file(traj_dfile.path(prefix))
+    assert traj_str.index('energy: -3.5') < traj_str.index('energy: -2.5')
+    assert 'energy: -1.5' not in traj_str
+
+    # appending replaces the entry for the same locators
+    traj_store.append([(-4.5, ['a'], ('energy: -4.5', geo))])
+    assert traj_store.write_sorted() == 3
+    traj_str = autofile.file.read_file(traj_dfile.path(prefix))
+    assert traj_str.startswith(autofile.file.write.trajectory(
+        [('energy: -4.5', geo)]).rstrip('\n'))
+    assert 'energy: -1.5' not in traj_str
+
+    # updates only append what is new or has changed
+    assert traj_store.update(
+        [(-4.5, ['a'], ('energy: -4.5', geo)),
+         (-3.5, ['b'], ('energy: -3.5', geo))]) == 0
+    assert traj_store.update(
+        [(-0.5, ['b'], ('energy: -0.5', geo)),
+         (-5.5, ['d'], ('energy: -5.5', geo))]) == 2
+    assert traj_store.write_sorted() == 4
+    traj_str = autofile.file.read_file(traj_dfile.path(prefix))
+    assert traj_str.index('energy: -5.5') < traj_str.index('energy: -0.5')
+    assert 'energy: -3.5' not in traj_str
+
+    assert traj_store.changed([['a'], ['b'], ['e']], [-4.5, -1.0, 0.0]) == (
+        ['b'], ['e'])
+
+    # the trajectory file only goes stale when the store or the locators
+    # asked for change
+    assert not traj_store.is_stale()
+    assert traj_store.is_stale(locs_lst)
+    traj_store.update([(-0.5, ['b'], ('energy: -0.5', geo))])
+    assert not traj_store.is_stale()
+
+    # replaced records are compacted away, into the next generation
+    for _ in range(4):
+        traj_store.append([(-6.5, ['d'], ('energy: -6.5', geo))])
+    with open(traj_store.index_path) as file_obj:
+        assert len(file_obj.readlines()) <= 2 * 4 + 1
+    assert traj_store.is_stale()
+    assert traj_store.write_sorted() == 4
+    assert not traj_store.is_stale()
+    traj_str = autofile.file.read_file(traj_dfile.path(prefix))
+    assert traj_str.startswith(autofile.file.write.trajectory(
+        [('energy: -6.5', geo)]).rstrip('\n'))
+    data_names = [name for name in os.listdir(prefix)
+                  if name.startswith(os.path.basename(traj_store.data_path))]
+    assert data_names == [os.path.basename(traj_store.data_path) + '.1']
+
+    # a compaction interrupted before its index is replaced changes nothing
+    autofile.file.write_file(traj_store.data_path + '.2', 'partial')
+    assert traj_store.write_sorted() == 4
+    assert autofile.file.read_file(traj_dfile.path(prefix)) == traj_str
+    traj_store.compact()
+    assert traj_store.write_sorted() == 4
+    assert autofile.file.read_file(traj_dfile.path(prefix)) == traj_str
+    data_names = [name for name in os.listdir(prefix)
+                  if name.startswith(os.path.basename(traj_store.data_path))]
+    assert data_names == [os.path.basename(traj_store.data_path) + '.2']
+
+    # appends from several processes don't interleave
+    def _append(name):
+        for idx in range(20):
+            traj_store.append([(-float(idx), [name, idx],
+                                ('energy: {}'.format(-idx), geo))])
+
+    ctx = multiprocessing.get_context('fork')
+    procs = [ctx.Process(target=_append, args=(name,))
+             for name in ('x', 'y', 'z')]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    assert traj_store.write_sorted() == 4 + 60
+    traj_str = autofile.file.read_file(traj_dfile.path(prefix))
+    assert traj_str.count('energy:') == 64
+
+
 def test__file__lennard_jones_epsilon():
     """ test autofile.system.file_.lennard_jones_epsilon
     """
@@ -944,6 +1147,563 @@ def test__dir__build_trunk():
                 sorted(rlocs_lst))
 
 
+def test__map__memo():
+    """ test the memoized map functions
+    """
+    # the memo keeps the number of locators and keeps types apart
+    assert autofile.system.dir_.theory_leaf(PREFIX).nlocs == 3
+    assert autofile.system.dir_.cscan_leaf(PREFIX).nlocs == 1
+    with pytest.raises(AssertionError):
+        autofile.system.map_.theory_leaf('b3lyp', '6-31g*', 1)
+
+    ref_dir_name = autofile.system.map_.theory_leaf('b3lyp', '6-31g*', True)
+    assert ref_dir_name[-1] == 'R'
+
+    autofile.system.map_.set_trusted_locators(True)
+    autofile.system.map_.theory_leaf.cache_clear()
+    for _ in range(2):
+        assert (autofile.system.map_.theory_leaf('b3lyp', '6-31g*', True) ==
+                ref_dir_name)
+    autofile.system.map_.set_trusted_locators(False)
+
+
+def test__index():
+    """ test autofile.system.index
+    """
+    prefix = os.path.join(PREFIX, 'index')
+    os.mkdir(prefix)
+
+    autofile.system.index.attach(prefix)
+    trunk_ds = autofile.system.dir_.conformer_trunk(prefix)
+    leaf_ds = autofile.system.dir_.conformer_leaf(prefix, root_ds=trunk_ds)
+    leaf_ds.add_data_files({'energy': autofile.system.file_.energy('geom')})
+
+    cids = [autofile.system.generate_new_conformer_id() for _ in range(3)]
+    enes = [-1.5, -3.5, -2.5]
+    for cid, ene in zip(cids, enes):
+        leaf_ds.create([cid])
+        leaf_ds.file.energy.write(ene, [cid])
+
+    ref_locs_lst = ([cids[1]], [cids[2]], [cids[0]])
+    assert (autofile.system.index.sorted_locators(leaf_ds.file.energy) ==
+            ref_locs_lst)
+    assert (autofile.system.index.min_value_locators(leaf_ds.file.energy) ==
+            [cids[1]])
+
+    autofile.system.index.detach(prefix)
+    assert autofile.system.index.sorted_locators(leaf_ds.file.energy) is None
+
+    nleaves, nfiles = autofile.system.index.rebuild(prefix)
+    assert nleaves == 3
+    autofile.system.index.attach(prefix)
+    assert (autofile.system.index.sorted_locators(leaf_ds.file.energy) ==
+            ref_locs_lst)
+
+    # bookkeeping files aren't indexed
+    autofile.file.write_file(
+        os.path.join(prefix, autofile.system.journal.JOURNAL_FILE_NAME), '')
+    autofile.file.write_file(os.path.join(prefix, '.test.lock'), '')
+    assert autofile.system.index.rebuild(prefix) == (nleaves, nfiles)
+
+    # a leaf written while the index was detached isn't trusted to be in it
+    autofile.system.index.detach(prefix)
+    cid = autofile.system.generate_new_conformer_id()
+    leaf_ds.create([cid])
+    leaf_ds.file.energy.write(-5.5, [cid])
+    autofile.system.index.attach(prefix)
+    assert autofile.system.index.sorted_locators(leaf_ds.file.energy) is None
+    autofile.system.index.detach(prefix)
+    autofile.system.index.rebuild(prefix)
+    autofile.system.index.attach(prefix)
+
+    # compressed values are found under their plain names
+    ene_ext = autofile.file.name.Extension.ENERGY
+    autofile.system.model.set_compression(ene_ext,
+                                          autofile.file.Compression.GZIP)
+    try:
+        leaf_ds.file.energy.write(-5.5, [cid])
+    finally:
+        autofile.system.model.set_compression(ene_ext,
+                                              autofile.file.Compression.NONE)
+    assert (autofile.system.index.min_value_locators(leaf_ds.file.energy) ==
+            [cid])
+    autofile.system.index.detach(prefix)
+
+    # a new index attached to an existing tree isn't complete until rebuilt
+    db_path = os.path.join(PREFIX, 'index.other.sqlite')
+    autofile.system.index.attach(prefix, db_path=db_path)
+    assert autofile.system.index.sorted_locators(leaf_ds.file.energy) is None
+    autofile.system.index.detach(prefix)
+
+
+def test__journal():
+    """ test autofile.system.journal
+    """
+    prefix = os.path.join(PREFIX, 'journal')
+    os.mkdir(prefix)
+
+    ds_ = root_data_series_directory(prefix)
+    ds_.add_data_files({
+        'info': autofile.system.file_.information(
+            'run', function=autofile.system.info.run),
+        'energy': autofile.system.file_.energy('test')})
+
+    autofile.system.journal.attach(prefix)
+    try:
+        ds_.create([1, 'a'])
+        inf_obj = autofile.system.info.run(
+            job='energy', prog='psi4', version='1.0', method='hf',
+            basis='sto-3g', status=autofile.system.RunStatus.RUNNING)
+        ds_.file.info.write(inf_obj, [1, 'a'])
+        # rewriting the same status doesn't change it
+        ds_.file.info.write(inf_obj, [1, 'a'])
+    finally:
+        autofile.system.journal.detach(prefix)
+    ds_.file.energy.write(-1., [1, 'a'])
+
+    evts, offset = autofile.system.journal.read(prefix)
+    assert [evt['event'] for evt in evts] == [
+        'file written', 'leaf created', 'file written', 'status changed',
+        'file written']
+    assert evts[1]['path'] == os.path.join('1', 'a')
+    assert evts[1]['locs'] == [1, 'a']
+    assert evts[3]['status'] == autofile.system.RunStatus.RUNNING
+
+    # tailing picks up from the offset, and skips partly written lines
+    assert autofile.system.journal.read(prefix, offset) == ((), offset)
+    jrn_pth = os.path.join(prefix, autofile.system.journal.JOURNAL_FILE_NAME)
+    with open(jrn_pth, 'a') as file_obj:
+        file_obj.write('{"event": "file wri')
+    assert autofile.system.journal.read(prefix, offset) == ((), offset)
+    evt_offsets = tuple(autofile.system.journal.follow(
+        prefix, interval=0.01, timeout=0.02))
+    assert [evt for evt, _ in evt_offsets] == list(evts)
+    assert evt_offsets[-1][1] == offset
+
+    # malformed lines are skipped
+    with open(jrn_pth, 'a') as file_obj:
+        file_obj.write('\n[]\n')
+    autofile.system.journal.attach(prefix)
+    try:
+        inf_obj.status = autofile.system.RunStatus.SUCCESS
+        ds_.file.info.write(inf_obj, [1, 'a'])
+    finally:
+        autofile.system.journal.detach(prefix)
+    evts, _ = autofile.system.journal.read(prefix, offset)
+    assert [evt['event'] for evt in evts] == [
+        'file written', 'status changed']
+    assert evts[1]['status'] == autofile.system.RunStatus.SUCCESS
+
+
+def test__model__read_cache():
+    """ test the DataFile read cache
+    """
+    prefix = os.path.join(PREFIX, 'read_cache')
+    os.mkdir(prefix)
+
+    autofile.system.model.set_read_cache_size(1000)
+    ene_dfile = autofile.system.file_.energy('test')
+
+    ene_dfile.write(-1.5, prefix)
+    assert ene_dfile.read(prefix) == -1.5
+    ene_dfile.write(-2.5, prefix)
+    assert ene_dfile.read(prefix) == -2.5
+
+    # an unchanged file is served from the cache
+    pth = ene_dfile.path(prefix)
+    stat = os.stat(pth)
+    autofile.file.write_file(pth, '-3.5')
+    os.utime(pth, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert ene_dfile.read(prefix) == -2.5
+
+    # unless it has been invalidated
+    ene_dfile.invalidate(prefix)
+    assert ene_dfile.read(prefix) == -3.5
+
+    # information files built separately with the same reader share entries
+    inf_dfile = autofile.system.file_.information(
+        'test', function=autofile.system.info.run)
+    inf_dfile.write(autofile.system.info.run(
+        job='energy', prog='psi4', version='1.0', method='hf',
+        basis='sto-3g', status=autofile.system.RunStatus.SUCCESS), prefix)
+    inf_dfile.read(prefix)
+    size = autofile.system.model.READ_CACHE.size
+    other_inf_dfile = autofile.system.file_.information(
+        'test', function=autofile.system.info.run)
+    assert other_inf_dfile.reader_ is not inf_dfile.reader_
+    assert other_inf_dfile.read(prefix).status == (
+        autofile.system.RunStatus.SUCCESS)
+    assert autofile.system.model.READ_CACHE.size == size
+
+    autofile.system.model.set_read_cache_size(0)
+    assert ene_dfile.read(prefix) == -3.5
+
+
+def test__model__settings():
+    """ test autofile.system.model.settings and apply_settings
+    """
+    prefix = os.path.join(PREFIX, 'settings')
+    os.mkdir(prefix)
+
+    default_settings = autofile.system.model.settings()
+    autofile.system.model.set_array_sidecars(True)
+    autofile.system.model.set_read_cache_size(1000)
+    autofile.system.index.attach(prefix)
+    autofile.system.journal.attach(prefix)
+    settings = pickle.loads(pickle.dumps(autofile.system.model.settings()))
+
+    autofile.system.model.apply_settings(default_settings)
+    assert not autofile.system.model.SETTINGS.array_sidecars
+    assert autofile.system.model.READ_CACHE.max_size == 0
+    assert not autofile.system.index.attached()
+    assert not autofile.system.journal.attached()
+
+    autofile.system.model.apply_settings(settings)
+    assert autofile.system.model.SETTINGS.array_sidecars
+    assert autofile.system.model.READ_CACHE.max_size == 1000
+    idx = autofile.system.index.find(prefix)
+    assert idx is not None and idx.prefix == os.path.abspath(prefix)
+    assert autofile.system.journal.find(prefix) is not None
+
+    # applying them again leaves the attached index alone
+    autofile.system.model.apply_settings(settings)
+    assert autofile.system.index.find(prefix) is idx
+
+    autofile.system.model.apply_settings(default_settings)
+
+
+def test__model__read_many():
+    """ test _DataSeriesFile.read_many
+    """
+    prefix = os.path.join(PREFIX, 'read_many')
+    os.mkdir(prefix)
+
+    ds_ = root_data_series_directory(prefix)
+    ds_.add_data_files({
+        'energy': autofile.system.file_.energy('test'),
+        'hessian': autofile.system.file_.hessian('test'),
+        'input': autofile.system.file_.input_file('test')})
+
+    locs_lst = [[1, 'a'], [1, 'b'], [2, 'a']]
+    ref_enes = [-1.5, -3.5, -2.5]
+    for locs, ref_ene in zip(locs_lst, ref_enes):
+        ds_.create(locs)
+        ds_.file.energy.write(ref_ene, locs)
+        ds_.file.hessian.write(ref_ene * numpy.eye(3), locs)
+        ds_.file.input.write(str(ref_ene), locs)
+
+    enes = ds_.file.energy.read_many(locs_lst)
+    assert isinstance(enes, numpy.ndarray) and enes.shape == (3,)
+    assert numpy.allclose(enes, ref_enes)
+
+    hesss = ds_.file.hessian.read_many(locs_lst, nworkers=2)
+    assert hesss.shape == (3, 3, 3)
+    assert numpy.allclose(hesss[:, 0, 0], ref_enes)
+
+    assert ds_.file.input.read_many(locs_lst) == tuple(map(str, ref_enes))
+    assert numpy.allclose(
+        ds_.file.input.read_many(locs_lst, transform_=float), ref_enes)
+
+
+def test__model__existing_cache():
+    """ test the DataSeries listing cache
+    """
+    prefix = os.path.join(PREFIX, 'existing_cache')
+    os.mkdir(prefix)
+
+    ds_ = root_data_series_directory(prefix)
+    for locs in [[1, 'a'], [1, 'b'], [2, 'a']]:
+        ds_.create(locs)
+    _backdate(prefix)
+
+    ref_locs_lst = ([1, 'a'], [1, 'b'], [2, 'a'])
+    assert ds_.existing() == ref_locs_lst
+
+    # a leaf created by another DataSeries object must still show up
+    other_ds = root_data_series_directory(prefix)
+    other_ds.create([1, 'c'])
+    _backdate(prefix)
+
+    ref_locs_lst = ([1, 'a'], [1, 'b'], [1, 'c'], [2, 'a'])
+    assert ds_.existing() == ref_locs_lst
+
+    # the locator files aren't re-read for an unchanged listing
+    os.remove(ROOT_SPEC_DFILE.path(ds_.path([1, 'a'])))
+    assert ds_.existing() == ref_locs_lst
+
+
+def test__model__manifest():
+    """ test the DataSeries locator manifest
+    """
+    prefix = os.path.join(PREFIX, 'manifest')
+    os.mkdir(prefix)
+    man_pth = os.path.join(prefix, autofile.system.model.MANIFEST_FILE_NAME)
+
+    ds_ = root_data_series_directory(prefix)
+    for locs in [[1, 'a'], [2, 'a']]:
+        ds_.create(locs)
+    assert os.path.isfile(man_pth)
+
+    # the locators come from the manifest, not the locator files
+    ref_locs_lst = ([1, 'a'], [2, 'a'])
+    os.remove(ROOT_SPEC_DFILE.path(ds_.path([1, 'a'])))
+    assert root_data_series_directory(prefix).existing() == ref_locs_lst
+
+    # leaves missing from the manifest are read and added to it
+    os.makedirs(ds_.path([1, 'b']))
+    ROOT_SPEC_DFILE.write([1, 'b'], ds_.path([1, 'b']))
+    os.remove(ROOT_SPEC_DFILE.path(ds_.path([2, 'a'])))
+    ref_locs_lst = ([1, 'a'], [1, 'b'], [2, 'a'])
+    assert root_data_series_directory(prefix).existing() == ref_locs_lst
+    with open(man_pth) as file_obj:
+        assert len(file_obj.readlines()) == 3
+
+    # a missing manifest is rebuilt from the locator files
+    os.remove(man_pth)
+    ROOT_SPEC_DFILE.write([1, 'a'], ds_.path([1, 'a']))
+    ROOT_SPEC_DFILE.write([2, 'a'], ds_.path([2, 'a']))
+    assert root_data_series_directory(prefix).existing() == ref_locs_lst
+    assert os.path.isfile(man_pth)
+
+    # series sharing a prefix keep their own entries
+    alt_dfile = autofile.system.file_.locator(
+        file_prefix='alt',
+        map_dct_={'loc1': lambda locs: locs[0],
+                  'loc2': lambda locs: locs[1]},
+        loc_keys=['loc1', 'loc2'])
+    alt_ds = autofile.system.model.DataSeries(
+        prefix, map_=lambda x: os.path.join(*map(str, x)), nlocs=2, depth=2,
+        loc_dfile=alt_dfile, name='alt')
+    alt_locs_lst = tuple([-locs[0], locs[1]] for locs in ref_locs_lst)
+    for locs, alt_locs in zip(ref_locs_lst, alt_locs_lst):
+        alt_dfile.write(alt_locs, ds_.path(locs))
+    assert alt_ds.existing() == alt_locs_lst
+    assert root_data_series_directory(prefix).existing() == ref_locs_lst
+    assert alt_ds.existing() == alt_locs_lst
+
+
+def test__model__existing_paths():
+    """ test DataSeries.existing_paths, serially and in parallel
+    """
+    prefix = os.path.join(PREFIX, 'existing_paths')
+    os.mkdir(prefix)
+
+    ds_ = root_data_series_directory(prefix)
+    locs_lst = [[1, 'a'], [1, 'b'], [2, 'a'], [3, 'c']]
+    for locs in locs_lst:
+        ds_.create(locs)
+    # hidden directories and files at the leaf level aren't leaves
+    os.makedirs(os.path.join(prefix, '1', '.hidden'))
+    autofile.file.write_file(os.path.join(prefix, '2', 'file'), '')
+
+    ref_pths = tuple(sorted(ds_.path(locs) for locs in locs_lst))
+    assert ds_.existing_paths() == ref_pths
+
+    autofile.system.model.set_listing_workers(2)
+    try:
+        assert root_data_series_directory(prefix).existing_paths() == ref_pths
+    finally:
+        autofile.system.model.set_listing_workers(None)
+
+
+def test__model__path():
+    """ test DataSeries.path resolution through root DataSeries
+    """
+    prefix = os.path.join(PREFIX, 'path')
+    os.mkdir(prefix)
+
+    root_ds = root_data_series_directory(prefix)
+    ds_ = autofile.system.dir_.build_trunk(prefix, root_ds=root_ds)
+    leaf_ds = autofile.system.model.DataSeries(
+        prefix, map_=lambda x: 'leaf_{}'.format(*x), nlocs=1, depth=1,
+        root_ds=ds_)
+
+    ref_pth = os.path.join(prefix, '1', 'a', 'MESS', 'leaf_0')
+    assert leaf_ds.path([1, 'a', 'MESS', 0]) == ref_pth
+    # the second call is answered from the root prefix cache
+    assert leaf_ds.path([1, 'a', 'MESS', 0]) == ref_pth
+    assert leaf_ds.path([1, 'a', 'MESS', 1]) == ref_pth[:-1] + '1'
+    assert leaf_ds.path([2, 'a', 'MESS', 0]) == os.path.join(
+        prefix, '2', 'a', 'MESS', 'leaf_0')
+    assert leaf_ds.prefix_path([1, 'a', 'MESS']) == os.path.dirname(ref_pth)
+
+    # path segments are only checked in debug mode
+    bad_ds = autofile.system.model.DataSeries(
+        prefix, map_=lambda x: os.path.join(*x), nlocs=2, depth=1,
+        root_ds=root_ds)
+    assert bad_ds.path([1, 'a', 'b', 'c']) == os.path.join(
+        prefix, '1', 'a', 'b', 'c')
+    autofile.system.model.set_debug_paths(True)
+    try:
+        with pytest.raises(AssertionError):
+            bad_ds.path([1, 'a', 'b', 'c'])
+    finally:
+        autofile.system.model.set_debug_paths(False)
+
+
+def test__model__update():
+    """ test atomic DataFile updates and FileLock leases
+    """
+    prefix = os.path.join(PREFIX, 'update')
+    os.mkdir(prefix)
+
+    ene_dfile = autofile.system.file_.energy('count')
+
+    def _increment(nupdates):
+        for _ in range(nupdates):
+            ene_dfile.update(lambda val: val + 1., prefix, default=0.)
+
+    # concurrent updates from threads and processes don't get lost
+    ctx = multiprocessing.get_context('fork')
+    procs = [ctx.Process(target=_increment, args=(10,)) for _ in range(2)]
+    threads = [threading.Thread(target=_increment, args=(10,))
+               for _ in range(2)]
+    for worker in procs + threads:
+        worker.start()
+    for worker in procs + threads:
+        worker.join()
+    assert ene_dfile.read(prefix) == 40.
+
+    # a lock held past its lease is broken
+    lock_pth = ene_dfile.lock_path(prefix)
+    locked = ctx.Event()
+    proc = ctx.Process(target=_hold_lock, args=(lock_pth, 0.5, locked))
+    proc.start()
+    try:
+        assert locked.wait(10)
+        with pytest.raises(TimeoutError):
+            with autofile.system.model.FileLock(lock_pth, timeout=0.1):
+                pass
+        assert ene_dfile.update(lambda val: val + 1., prefix) == 41.
+    finally:
+        proc.terminate()
+        proc.join()
+
+    # a held lock without a lease gets a whole lease before it is broken,
+    # however old its lock file is
+    proc = ctx.Process(target=_hold_lock, args=(lock_pth, None, locked))
+    locked.clear()
+    proc.start()
+    try:
+        assert locked.wait(10)
+        os.utime(lock_pth, (time.time() - 3600., time.time() - 3600.))
+        with pytest.raises(TimeoutError):
+            with autofile.system.model.FileLock(lock_pth, lease=0.5,
+                                                timeout=0.2):
+                pass
+        with autofile.system.model.FileLock(lock_pth, lease=0.5, timeout=5):
+            pass
+    finally:
+        proc.terminate()
+        proc.join()
+
+    # thread locks are dropped once no FileLock uses them
+    assert lock_pth not in autofile.system.model.FileLock._THREAD_LOCKS
+
+    # DataSeries files are updated through the data series
+    ds_ = root_data_series_directory(prefix)
+    ds_.create([1, 'a'])
+    ds_.add_data_files({'count': ene_dfile})
+    assert ds_.file.count.update(lambda val: val * 2., [1, 'a'],
+                                 default=1.) == 2.
+    assert ds_.file.count.read([1, 'a']) == 2.
+
+
+def test__model__async():
+    """ test the asyncio interface
+    """
+    prefix = os.path.join(PREFIX, 'async')
+    os.mkdir(prefix)
+
+    ds_ = root_data_series_directory(prefix)
+    ds_.add_data_files({'energy': autofile.system.file_.energy('test')})
+    ref_locs_lst = tuple([num, 'a'] for num in range(10))
+
+    async def _write_and_read():
+        await asyncio.gather(*(ds_.acreate(locs) for locs in ref_locs_lst))
+        await asyncio.gather(*(ds_.file.energy.awrite(float(locs[0]), locs)
+                               for locs in ref_locs_lst))
+        locs_lst = [locs async for locs in ds_.aexisting()]
+        enes = await asyncio.gather(*(ds_.file.energy.aread(locs)
+                                      for locs in locs_lst))
+        exists = await ds_.file.energy.aexists([10, 'a'])
+        return locs_lst, enes, exists
+
+    autofile.system.model.set_async_workers(4)
+    locs_lst, enes, exists = asyncio.run(_write_and_read())
+    assert tuple(locs_lst) == ref_locs_lst
+    assert enes == [float(num) for num in range(10)]
+    assert not exists
+
+
+def test__model__blob_store():
+    """ test deduplication of file contents through a blob store
+    """
+    prefix = os.path.join(PREFIX, 'blob')
+    os.mkdir(prefix)
+    out_dfile = autofile.system.file_.output_file('test')
+    ene_dfile = autofile.system.file_.energy('test')
+
+    ds_ = root_data_series_directory(prefix)
+    ds_.add_data_files({'output': out_dfile, 'energy': ene_dfile})
+    locs_lst = ([1, 'a'], [2, 'a'], [3, 'a'])
+    for locs in locs_lst:
+        ds_.create(locs)
+
+    autofile.system.model.set_blob_store(prefix)
+    try:
+        for locs in locs_lst:
+            ds_.file.output.write('<output string>', locs)
+            ds_.file.energy.write(-1., locs)
+        ds_.file.output.write('<other output string>', [3, 'a'])
+    finally:
+        autofile.system.model.set_blob_store(prefix, extensions=())
+
+    # identical outputs share a blob; other file types are left alone
+    out_pth1 = ds_.file.output.path([1, 'a'])
+    out_pth2 = ds_.file.output.path([2, 'a'])
+    assert os.path.samefile(out_pth1, out_pth2)
+    assert os.path.samefile(out_pth1, autofile.system.blob.path(
+        prefix, '<output string>'))
+    assert os.stat(ds_.file.energy.path([1, 'a'])).st_nlink == 1
+    assert ds_.file.output.read([3, 'a']) == '<other output string>'
+
+    # a write replaces the link, rather than changing the shared blob
+    ds_.file.output.write('<new output string>', [1, 'a'])
+    assert ds_.file.output.read([2, 'a']) == '<output string>'
+    assert os.stat(out_pth1).st_nlink == 1
+
+    # unused blobs are collected
+    shutil.rmtree(ds_.path([2, 'a']))
+    assert autofile.system.blob.collect(prefix)[0] == 1
+    assert autofile.system.blob.collect(prefix)[0] == 0
+    assert ds_.file.output.read([3, 'a']) == '<other output string>'
+
+
+def _hold_lock(lock_pth, lease, locked):
+    """ take a lock and hang on to it (without a lease, if it is None)
+    """
+    if lease is None:
+        fdesc = os.open(lock_pth, os.O_RDWR | os.O_CREAT)
+        os.ftruncate(fdesc, 0)
+        fcntl.lockf(fdesc, fcntl.LOCK_EX)
+        locked.set()
+        threading.Event().wait(60)
+    else:
+        with autofile.system.model.FileLock(lock_pth, lease=lease):
+            locked.set()
+            threading.Event().wait(60)
+
+
+def _backdate(prefix, secs=60):
+    """ push back the modification times under a prefix, so that the listing
+    cache will trust them
+    """
+    for pth, _, _ in os.walk(prefix):
+        mtime = os.stat(pth).st_mtime - secs
+        os.utime(pth, (mtime, mtime))
+
+
 if __name__ == '__main__':
     # test__file__input_file()
     # test__file__information()
@@ -0,0 +1,313 @@
+""" append-only store behind trajectory files
+
+A trajectory file (such as the conformer trunk's `.t.xyz`) lists the
+geometries of a directory series sorted by energy. Regenerating it from
+scratch means reading every energy and geometry file in the series. Instead,
+each geometry is formatted once and appended to a data file next to the
+trajectory file (`<trajectory file>.dat`), and its energy, locators and byte
+range are appended to an index (`<trajectory file>.idx`, one JSON record per
+line). The sorted trajectory file is then assembled from the stored blocks,
+without parsing any geometries, whenever it is asked for.
+
+Entries are keyed by their locators; appending an entry for locators that
+are already stored replaces it. Appends are made under a file lock, so that
+processes sharing the store don't interleave their writes, and the store is
+compacted once most of its records have been replaced.
+
+Compaction writes the live blocks to a new data file, named for the next
+generation of the store (`<trajectory file>.dat.<generation>`), and then
+replaces the index with one whose first line names that generation. That
+single rename commits the compaction: if it is interrupted before then, the
+old index still points into the old data file, and if it is interrupted
+after, the old data file is simply left over until the next compaction.
+
+Writing the trajectory file also writes a stamp (`<trajectory file>.stamp`)
+recording the state of the store it was written from, so that it only needs
+to be rewritten once it has gone stale.
+"""
+import os
+import json
+import hashlib
+import binascii
+import autofile.file
+from autofile.system.model import FileLock
+
+DATA_SUFFIX = '.dat'
+INDEX_SUFFIX = '.idx'
+STAMP_SUFFIX = '.stamp'
+
+# compact the store once it holds this many times as many records as live
+# entries
+COMPACT_RATIO = 2
+
+
+class TrajectoryStore():
+    """ append-only store of the geometries in a trajectory file
+    """
+
+    def __init__(self, traj_path):
+        """
+        :param traj_path: the path of the (sorted) trajectory file
+        :type traj_path: str
+        """
+        self.path = traj_path
+        self.data_path = traj_path + DATA_SUFFIX
+        self.index_path = traj_path + INDEX_SUFFIX
+        self.stamp_path = traj_path + STAMP_SUFFIX
+        dir_pth, name = os.path.split(traj_path)
+        self.lock_path = os.path.join(dir_pth, '.{}.lock'.format(name))
+
+    def lock(self):
+        """ a lock on the store, for the duration of a `with` block
+        """
+        return FileLock(self.lock_path)
+
+    def entries(self):
+        """ the stored entries, by locator key
+
+        :returns: (energy, locators, offset, size) records, in the order they
+            were appended
+        :rtype: dict
+        """
+        return self._read_index()[0]
+
+    def missing(self, locs_lst):
+        """ the locators in this list that aren't stored yet
+        """
+        ent_dct = self.entries()
+        return tuple(locs for locs in locs_lst if _key(locs) not in ent_dct)
+
+    def changed(self, locs_lst, enes):
+        """ the locators in this list that aren't stored yet, or whose stored
+        energy differs from the one given for them
+        """
+        ent_dct = self.entries()
+        return tuple(locs for locs, ene in zip(locs_lst, enes)
+                     if _key(locs) not in ent_dct
+                     or ent_dct[_key(locs)][0] != float(ene))
+
+    def append(self, ene_locs_traj_lst):
+        """ append geometries to the store
+
+        :param ene_locs_traj_lst: energy, locators, and trajectory entry
+            (comment line, geometry) for each geometry
+        """
+        recs = [(float(ene), locs, _block(traj_ent))
+                for ene, locs, traj_ent in ene_locs_traj_lst]
+        if recs:
+            with self.lock():
+                self._append(recs)
+
+    def update(self, ene_locs_traj_lst):
+        """ append the geometries that aren't stored yet, or whose energy or
+        trajectory entry has changed, leaving the others alone
+
+        :param ene_locs_traj_lst: energy, locators, and trajectory entry
+            (comment line, geometry) for each geometry
+        :returns: the number of geometries appended
+        :rtype: int
+        """
+        recs = [(float(ene), locs, _block(traj_ent))
+                for ene, locs, traj_ent in ene_locs_traj_lst]
+        with self.lock():
+            ent_dct, _, gen = self._read_index()
+            recs = [(ene, locs, block) for ene, locs, block in recs
+                    if _key(locs) not in ent_dct
+                    or ent_dct[_key(locs)][0] != ene
+                    or self._read_block(ent_dct[_key(locs)], gen) != block]
+            if recs:
+                self._append(recs)
+        return len(recs)
+
+    def compact(self):
+        """ rewrite the store without the records that have been replaced
+        """
+        with self.lock():
+            self._compact()
+
+    def write_sorted(self, locs_lst=None, by_energy=True):
+        """ write the trajectory file from the stored geometries
+
+        :param locs_lst: the locators to include (default: all stored ones),
+            so that entries for removed leaves can be left out
+        :param by_energy: sort the geometries by energy? otherwise, they are
+            written in the order of `locs_lst`
+        :returns: the number of geometries written
+        """
+        with self.lock():
+            ent_dct, _, gen = self._read_index()
+            if locs_lst is None:
+                ents = list(ent_dct.values())
+            else:
+                ents = [ent_dct[_key(locs)] for locs in locs_lst
+                        if _key(locs) in ent_dct]
+
+            if by_energy:
+                ents = sorted(ents, key=lambda ent: ent[0])
+
+            if ents:
+                blocks = self._read_blocks(ents, gen)
+                autofile.file.write_file(self.path,
+                                         b''.join(blocks).decode())
+                autofile.file.write_file(
+                    self.stamp_path, self._stamp(locs_lst, by_energy))
+
+        return len(ents)
+
+    def is_stale(self, locs_lst=None, by_energy=True):
+        """ does the trajectory file need to be (re)written?
+
+        It is stale if it is missing, or if it wasn't written by
+        `write_sorted` with these arguments from the store as it is now.
+        """
+        with self.lock():
+            try:
+                stamp = autofile.file.read_file(self.stamp_path)
+            except FileNotFoundError:
+                stamp = None
+            return (stamp != self._stamp(locs_lst, by_energy)
+                    or not os.path.exists(self.path))
+
+    def _stamp(self, locs_lst, by_energy):
+        """ a stamp of the store's state and the trajectory file's arguments
+        (with the lock held)
+
+        Records are only ever appended to an index, until compaction replaces
+        it with the next generation, so its generation and size identify its
+        contents.
+        """
+        try:
+            size = os.path.getsize(self.index_path)
+        except FileNotFoundError:
+            size = 0
+        keys = None if locs_lst is None else [_key(locs) for locs in locs_lst]
+        stamp_str = json.dumps({'generation': self._generation(),
+                                'size': size, 'locs': keys,
+                                'by_energy': bool(by_energy)})
+        return hashlib.sha1(stamp_str.encode()).hexdigest()
+
+    def _generation(self):
+        """ the generation of the store, from the first line of its index
+        """
+        try:
+            with open(self.index_path, 'r') as file_obj:
+                ent = json.loads(file_obj.readline())
+        except (FileNotFoundError, ValueError):
+            ent = {}
+        return ent.get('generation', 0) if isinstance(ent, dict) else 0
+
+    def _data_path(self, gen):
+        """ the data file of a generation of the store
+        """
+        return (self.data_path if not gen else
+                '{}.{:d}'.format(self.data_path, gen))
+
+    def _read_index(self):
+        """ the stored entries, by locator key, the number of records, and
+        the generation of the store
+        """
+        ent_dct = {}
+        nrecs = 0
+        gen = 0
+        try:
+            with open(self.index_path, 'r') as file_obj:
+                for line in file_obj:
+                    try:
+                        ent = json.loads(line)
+                    except ValueError:
+                        continue
+                    if 'generation' in ent:
+                        gen = ent['generation']
+                        continue
+                    nrecs += 1
+                    ent_dct.pop(_key(ent['locs']), None)
+                    ent_dct[_key(ent['locs'])] = (
+                        ent['energy'], ent['locs'], ent['offset'],
+                        ent['size'])
+        except FileNotFoundError:
+            pass
+        return ent_dct, nrecs, gen
+
+    def _read_block(self, ent, gen):
+        try:
+            return self._read_blocks([ent], gen)[0]
+        except FileNotFoundError:
+            return None
+
+    def _read_blocks(self, ents, gen):
+        with open(self._data_path(gen), 'rb') as file_obj:
+            blocks = []
+            for _, _, offset, size in ents:
+                file_obj.seek(offset)
+                blocks.append(file_obj.read(size))
+        return blocks
+
+    def _append(self, recs):
+        """ append (energy, locators, block) records (with the lock held)
+        """
+        gen = self._read_index()[2]
+        # the data goes first, so that the index never points past it
+        with open(self._data_path(gen), 'ab') as file_obj:
+            offset = file_obj.seek(0, os.SEEK_END)
+            file_obj.write(b''.join(block for _, _, block in recs))
+
+        lines = []
+        for ene, locs, block in recs:
+            lines.append(json.dumps({'energy': ene, 'locs': locs,
+                                     'offset': offset, 'size': len(block)}))
+            offset += len(block)
+
+        with open(self.index_path, 'a') as file_obj:
+            file_obj.write(''.join(line + '\n' for line in lines))
+
+        ent_dct, nrecs, _ = self._read_index()
+        if nrecs > COMPACT_RATIO * len(ent_dct):
+            self._compact()
+
+    def _compact(self):
+        """ rewrite the store with only its live entries (with the lock held)
+        """
+        ent_dct, _, gen = self._read_index()
+        ents = list(ent_dct.values())
+        blocks = self._read_blocks(ents, gen) if ents else []
+
+        lines = [json.dumps({'generation': gen + 1})]
+        offset = 0
+        for (ene, locs, _, _), block in zip(ents, blocks):
+            lines.append(json.dumps({'energy': ene, 'locs': locs,
+                                     'offset': offset, 'size': len(block)}))
+            offset += len(block)
+
+        # nothing points into the new data file until the index is replaced
+        with open(self._data_path(gen + 1), 'wb') as file_obj:
+            file_obj.write(b''.join(blocks))
+        suffix = '.{}.tmp'.format(binascii.hexlify(os.urandom(4)).decode())
+        with open(self.index_path + suffix, 'w') as file_obj:
+            file_obj.write(''.join(line + '\n' for line in lines))
+        os.replace(self.index_path + suffix, self.index_path)
+
+        # clear out the data files of earlier (or interrupted) compactions
+        dir_pth, data_name = os.path.split(self._data_path(gen + 1))
+        base_name = os.path.basename(self.data_path)
+        for name in os.listdir(dir_pth or os.curdir):
+            if name != data_name and (
+                    name == base_name or
+                    (name.startswith(base_name + '.') and
+                     name[len(base_name) + 1:].isdigit())):
+                try:
+                    os.remove(os.path.join(dir_pth, name))
+                except FileNotFoundError:
+                    pass
+
+
+def _block(traj_ent):
+    """ the stored block for a trajectory entry (comment line, geometry)
+    """
+    block = autofile.file.write.trajectory([traj_ent])
+    return (block.rstrip('\n') + '\n').encode()
+
+
+def _key(locs):
+    """ a hashable key for a list of locators
+    """
+    return json.dumps(locs)
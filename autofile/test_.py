@@ -1,7 +1,13 @@
 """ test autofile.fs
 """
+import io
 import os
+import json
+import time
+import tarfile
 import tempfile
+import pytest
+import elstruct
 import autofile.fs
 
 PREFIX = tempfile.mkdtemp()
@@ -106,6 +112,41 @@ def test__conformer():
     assert cnf_fs.leaf.exists(locs)
 
 
+def test__conformer__packed():
+    """ test autofile.fs.conformer with packed leaves
+    """
+    prefix = os.path.join(PREFIX, 'conformer_packed')
+    os.mkdir(prefix)
+
+    cnf_fs = autofile.fs.conformer(prefix, packed=True)
+    locs_lst = sorted(
+        [autofile.system.generate_new_conformer_id()] for _ in range(3))
+    ref_enes = [-1.5, -3.5, -2.5]
+    for locs, ref_ene in zip(locs_lst, ref_enes):
+        assert not cnf_fs.leaf.exists(locs)
+        cnf_fs.leaf.create(locs)
+        assert cnf_fs.leaf.exists(locs)
+        assert not cnf_fs.leaf.file.energy.exists(locs)
+        cnf_fs.leaf.file.energy.write(ref_ene, locs)
+        assert cnf_fs.leaf.file.energy.exists(locs)
+
+    # the files are all in one container, not in the leaf directories
+    assert not os.listdir(cnf_fs.leaf.path(locs_lst[0]))
+    assert sorted(cnf_fs.leaf.existing()) == locs_lst
+    assert [cnf_fs.leaf.file.energy.read(locs)
+            for locs in locs_lst] == ref_enes
+
+    # listings have the same shape as those of unpacked leaves
+    unpacked_prefix = os.path.join(prefix, 'unpacked')
+    os.mkdir(unpacked_prefix)
+    unpacked_cnf_fs = autofile.fs.conformer(unpacked_prefix)
+    for locs in locs_lst:
+        unpacked_cnf_fs.leaf.create(locs)
+    for relative in (False, True):
+        assert (cnf_fs.leaf.existing(relative=relative) ==
+                unpacked_cnf_fs.leaf.existing(relative=relative))
+
+
 def test__tau():
     """ test autofile.fs.tau
     """
@@ -228,6 +269,155 @@ def test__run():
     assert run_fs.leaf.file.input.read(['gradient']) == ref_inp_str
 
 
+def test__check():
+    """ test autofile.check
+    """
+    prefix = os.path.join(PREFIX, 'check')
+    run_prefix = os.path.join(prefix, 'run')
+    save_prefix = os.path.join(prefix, 'save')
+    os.makedirs(os.path.join(run_prefix, 'SPC'))
+    os.makedirs(os.path.join(save_prefix, 'SPC'))
+    os.makedirs(os.path.join(save_prefix, 'OTHER'))
+
+    opt_job = elstruct.Job.OPTIMIZATION
+    hess_job = elstruct.Job.HESSIAN
+    grad_job = elstruct.Job.GRADIENT
+    run_fs = autofile.fs.run(os.path.join(run_prefix, 'SPC'))
+    for job, status in [(opt_job, autofile.system.RunStatus.SUCCESS),
+                        (hess_job, autofile.system.RunStatus.RUNNING),
+                        (grad_job, autofile.system.RunStatus.RUNNING)]:
+        run_fs.leaf.create([job])
+        run_fs.leaf.file.info.write(
+            autofile.system.info.run(job=job, prog='psi4', version='',
+                                     method='hf', basis='sto-3g',
+                                     status=status), [job])
+    subrun_fs = autofile.fs.subrun(run_fs.leaf.path([opt_job]))
+    subrun_fs.leaf.create([0, 0])
+
+    # the hessian job died a day ago
+    hess_pth = run_fs.leaf.path([hess_job])
+    for pth, _, names in os.walk(hess_pth):
+        for pth_ in [pth] + [os.path.join(pth, name) for name in names]:
+            mtime = time.time() - 2 * 86400.
+            os.utime(pth_, (mtime, mtime))
+
+    # the optimization was saved; the conformer geometry is missing its
+    # energy, which is fine for the other (theory-level) geometry
+    geo_name = autofile.file.name.geometry(autofile.fs.FilePrefix.GEOM)
+    ene_name = autofile.file.name.energy(autofile.fs.FilePrefix.GEOM)
+    cnf_pth = os.path.join(save_prefix, 'OTHER', 'CONFS',
+                           autofile.system.generate_new_conformer_id())
+    os.makedirs(cnf_pth)
+    autofile.file.write_file(os.path.join(save_prefix, 'SPC', geo_name), '')
+    autofile.file.write_file(os.path.join(save_prefix, 'SPC', ene_name), '')
+    autofile.file.write_file(os.path.join(save_prefix, 'OTHER', geo_name), '')
+    autofile.file.write_file(os.path.join(cnf_pth, geo_name), '')
+
+    # checks don't write to the trees
+    manifest_pths = [
+        os.path.join(pth, autofile.system.model.MANIFEST_FILE_NAME)
+        for pth, _, names in os.walk(prefix)
+        if autofile.system.model.MANIFEST_FILE_NAME in names]
+    assert manifest_pths
+    for pth in manifest_pths:
+        os.remove(pth)
+
+    problems = autofile.check.check(run_prefix=run_prefix,
+                                    save_prefix=save_prefix)
+    assert not any(os.path.exists(pth) for pth in manifest_pths)
+    assert problems == tuple(sorted([
+        (autofile.check.Problem.STALE_RUN, hess_pth),
+        (autofile.check.Problem.SUBRUN_DEBRIS,
+         subrun_fs.leaf.path([0, 0])),
+        (autofile.check.Problem.SAVED_RUN, run_fs.leaf.path([opt_job])),
+        (autofile.check.Problem.MISSING_ENERGY, cnf_pth)]))
+
+    # trunks are checked in parallel, with the same results
+    assert autofile.check.check(run_prefix=run_prefix,
+                                save_prefix=save_prefix,
+                                nworkers=1) == problems
+
+    assert len(autofile.check.repair(problems)) == 1
+    assert (run_fs.leaf.file.info.read([hess_job]).status ==
+            autofile.system.RunStatus.FAILURE)
+    assert autofile.check.prune(problems)
+    assert not os.path.exists(run_fs.leaf.path([opt_job]))
+
+    assert autofile.check.check(run_prefix=run_prefix) == ()
+
+
+def test__bundle():
+    """ test autofile.bundle
+    """
+    prefix = os.path.join(PREFIX, 'bundle')
+    os.makedirs(os.path.join(prefix, 'SPC'))
+
+    run_fs = autofile.fs.run(os.path.join(prefix, 'SPC'))
+    for job in ['energy', 'gradient']:
+        run_fs.leaf.create([job])
+        run_fs.leaf.file.input.write('<{} input>'.format(job), [job])
+        run_fs.leaf.file.output.write('<{} output>'.format(job), [job])
+
+    # two locator files, the locator manifest, two inputs and two outputs
+    archive = os.path.join(PREFIX, 'bundle.tgz')
+    assert autofile.bundle.export(prefix, 'SPC', archive) == 7
+    idx_dct = autofile.bundle.contents(archive)
+    assert idx_dct['root'] == 'SPC'
+    assert len(idx_dct['files']) == 7
+
+    # a full import recreates the tree
+    new_prefix = os.path.join(PREFIX, 'bundle_full')
+    os.mkdir(new_prefix)
+    assert autofile.bundle.import_(archive, new_prefix) == 7
+    new_run_fs = autofile.fs.run(os.path.join(new_prefix, 'SPC'))
+    assert new_run_fs.leaf.existing() == (['energy'], ['gradient'])
+    assert (new_run_fs.leaf.file.output.read(['gradient']) ==
+            '<gradient output>')
+
+    # a selective import, streamed through a file object, leaves out the
+    # outputs
+    stream = io.BytesIO()
+    autofile.bundle.export(prefix, 'SPC', stream,
+                           compression=autofile.bundle.Compression.XZ)
+    stream.seek(0)
+    new_prefix = os.path.join(PREFIX, 'bundle_inputs')
+    os.mkdir(new_prefix)
+    assert autofile.bundle.import_(
+        stream, new_prefix,
+        kinds=(autofile.file.name.Extension.INPUT_LOG,)) == 5
+    new_run_fs = autofile.fs.run(os.path.join(new_prefix, 'SPC'))
+    assert new_run_fs.leaf.existing() == (['energy'], ['gradient'])
+    assert new_run_fs.leaf.file.input.exists(['energy'])
+    assert not new_run_fs.leaf.file.output.exists(['energy'])
+
+    # importing over a file replaces it, rather than writing through hard
+    # links to it
+    out_pth = new_run_fs.leaf.file.input.path(['energy'])
+    link_pth = os.path.join(PREFIX, 'bundle_link.inp')
+    os.link(out_pth, link_pth)
+    autofile.file.write_file(out_pth, '<changed input>')
+    os.remove(link_pth)
+    os.link(out_pth, link_pth)
+    assert autofile.bundle.import_(archive, new_prefix) == 7
+    assert new_run_fs.leaf.file.input.read(['energy']) == '<energy input>'
+    assert autofile.file.read_file(link_pth) == '<changed input>'
+
+    # paths outside of the prefix are refused
+    with pytest.raises(ValueError):
+        autofile.bundle.export(os.path.join(prefix, 'SPC'), prefix, archive)
+    evil_archive = os.path.join(PREFIX, 'bundle_evil.tar')
+    idx_bytes = json.dumps({'version': 1, 'root': '.', 'files': [
+        {'path': '../evil', 'size': 0, 'kind': ''}]}).encode()
+    with tarfile.open(evil_archive, 'w') as tar_obj:
+        for name, data in ((autofile.bundle.BUNDLE_INDEX_NAME, idx_bytes),
+                           ('../evil', b'')):
+            member = tarfile.TarInfo(name)
+            member.size = len(data)
+            tar_obj.addfile(member, io.BytesIO(data))
+    with pytest.raises(ValueError):
+        autofile.bundle.import_(evil_archive, new_prefix)
+
+
 def test__build():
     """ test autofile.fs.build
     """
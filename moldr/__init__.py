@@ -1,6 +1,9 @@
 """ moldr modules
 """
 from moldr import driver
+from moldr import engine
+from moldr import jobcache
+from moldr import monitor
 from moldr import conformer
 from moldr import geom
 from moldr import pf
@@ -10,10 +13,14 @@ from moldr import tau
 from moldr import ts
 from moldr import vrctst
 from moldr import runner
+from moldr import submit
 from moldr import util
 
 __all__ = [
     'driver',
+    'engine',
+    'jobcache',
+    'monitor',
     'pf',
     'conformer',
     'geom',
@@ -24,5 +31,6 @@ __all__ = [
     'ts',
     'vrctst',
     'runner',
+    'submit',
     'util',
 ]
@@ -108,22 +108,16 @@ def run_conformers(
     idx = 0
     nsamp0 = nsamp
     inf_obj = autofile.system.info.conformer_trunk(0, tors_range_dct)
-    if cnf_save_fs.trunk.file.info.exists():
-        inf_obj_s = cnf_save_fs.trunk.file.info.read()
-        nsampd = inf_obj_s.nsamp
-    elif cnf_run_fs.trunk.file.info.exists():
-        inf_obj_r = cnf_run_fs.trunk.file.info.read()
-        nsampd = inf_obj_r.nsamp
-    else:
-        nsampd = 0
 
     while True:
-        nsamp = nsamp0 - nsampd
-        if nsamp <= 0:
+        nsampd = moldr.util.claim_sample(
+            cnf_save_fs, cnf_run_fs, nsamp0, inf_obj)
+        if nsampd is None:
             print('Reached requested number of samples. '
                   'Conformer search complete.')
             break
         else:
+            nsamp = nsamp0 - nsampd
             print("    New nsamp requested is {:d}.".format(nsamp))
 
             if nsampd > 0:
@@ -196,17 +190,6 @@ def run_conformers(
             #    **kwargs
             #)
 
-            if cnf_save_fs.trunk.file.info.exists():
-                inf_obj_s = cnf_save_fs.trunk.file.info.read()
-                nsampd = inf_obj_s.nsamp
-            elif cnf_run_fs.trunk.file.info.exists():
-                inf_obj_r = cnf_run_fs.trunk.file.info.read()
-                nsampd = inf_obj_r.nsamp
-            nsampd += 1
-            inf_obj.nsamp = nsampd
-            cnf_save_fs.trunk.file.info.write(inf_obj)
-            cnf_run_fs.trunk.file.info.write(inf_obj)
-
 
 def save_conformers(cnf_run_fs, cnf_save_fs, saddle=False, dist_info=[], rxn_class=''):
     """ save the conformers that have been found so far
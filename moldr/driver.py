@@ -1,8 +1,13 @@
 """ Centralized job runners and readers for electronic structure calcualtions
 """
 import functools
+import concurrent.futures
 import elstruct
 import autofile
+import moldr.engine
+import moldr.jobcache
+import moldr.optsmat
+import moldr.submit
 from moldr import runner
 
 JOB_ERROR_DCT = {
@@ -47,6 +52,106 @@ def run_job(
         **kwargs):
     """ run an elstruct job by name
     """
+    inf_obj = _start_job(job, run_fs, thy_level, overwrite, retry_failed)
+
+    if inf_obj is not None:
+        runner_ = _job_runner(
+            job, feedback=feedback, frozen_coordinates=frozen_coordinates,
+            freeze_dummy_atoms=freeze_dummy_atoms,
+            irc_direction=irc_direction)
+
+        inp_str, out_str = runner_(
+            script_str, run_fs.leaf.path([job]), geom=geom, chg=spc_info[1],
+            mul=spc_info[2], method=thy_level[1], basis=thy_level[2],
+            orb_restricted=thy_level[3], prog=thy_level[0],
+            errors=errors, options_mat=options_mat, **kwargs
+        )
+
+        _finish_job(job, run_fs, inf_obj, inp_str, out_str)
+        print('finished run_job')
+
+
+def submit_job(
+        job, script_str, run_fs,
+        geom, spc_info, thy_level,
+        errors=(), options_mat=(), retry_failed=True, feedback=False,
+        frozen_coordinates=(), freeze_dummy_atoms=True, overwrite=False,
+        irc_direction=None, engine=None, submitter=None, job_cache=None,
+        options_stats=None, **kwargs):
+    """ submit an elstruct job by name, without waiting for it to finish
+
+    The job goes to a job engine (by default, the one from
+    `moldr.engine.engine()`), which starts it once the cores and memory it
+    asks for (see `moldr.engine.job_resources`) are free. As with
+    `run_job`, the run information is written when the job starts, and the
+    outputs and final status when it finishes -- before the returned future
+    completes.
+
+    The job runs through a submitter (by default, the current one from
+    `moldr.submit.submitter()`). With a batch scheduler, the engine only
+    limits the number of jobs in flight, so give it as many cores as jobs
+    should be queued at once. If there is a job cache (see
+    `moldr.jobcache`), outputs are taken from it instead of running jobs
+    whose inputs have been run before. Likewise, if there is an options
+    statistics store (see `moldr.optsmat`), it orders the retry options.
+
+    :returns: a future for the run status, or for None if the job wasn't run
+        (because it has already been run)
+    :rtype: concurrent.futures.Future
+    """
+    future = concurrent.futures.Future()
+    future.set_running_or_notify_cancel()
+
+    inf_obj = _start_job(job, run_fs, thy_level, overwrite, retry_failed)
+    if inf_obj is None:
+        future.set_result(None)
+        return future
+
+    runner_ = _job_runner(
+        job, feedback=feedback, frozen_coordinates=frozen_coordinates,
+        freeze_dummy_atoms=freeze_dummy_atoms, irc_direction=irc_direction)
+    engine = moldr.engine.engine() if engine is None else engine
+    submitter = moldr.submit.submitter() if submitter is None else submitter
+    ncores, memory = moldr.engine.job_resources(
+        script_str, kwargs, submitter=submitter, prog=thy_level[0])
+    job_cache = moldr.jobcache.job_cache() if job_cache is None else job_cache
+    options_stats = (moldr.optsmat.options_stats() if options_stats is None
+                     else options_stats)
+    job_future = engine.submit(
+        functools.partial(
+            runner_, script_str, run_fs.leaf.path([job]), geom=geom,
+            chg=spc_info[1], mul=spc_info[2], method=thy_level[1],
+            basis=thy_level[2], orb_restricted=thy_level[3],
+            prog=thy_level[0], errors=errors, options_mat=options_mat,
+            submitter=submitter, job_cache=job_cache,
+            options_stats=options_stats, **kwargs),
+        ncores=ncores, memory=memory)
+
+    def _finish(job_future):
+        try:
+            inp_str, out_str = job_future.result()
+            status = _finish_job(job, run_fs, inf_obj, inp_str, out_str)
+        except BaseException as exc:
+            # the future is resolved even if the status can't be written, so
+            # that nothing waits on it forever
+            try:
+                inf_obj.utc_end_time = autofile.system.info.utc_time()
+                inf_obj.status = autofile.system.RunStatus.FAILURE
+                run_fs.leaf.file.info.write(inf_obj, [job])
+            finally:
+                future.set_exception(exc)
+        else:
+            future.set_result(status)
+
+    job_future.add_done_callback(_finish)
+    return future
+
+
+def _start_job(job, run_fs, thy_level, overwrite, retry_failed):
+    """ check whether a job needs to be run and, if so, record it as running
+
+    :returns: the run information object, or None if the job shouldn't be run
+    """
     assert job in JOB_RUNNER_DCT
     assert job in JOB_ERROR_DCT
     assert job in JOB_SUCCESS_DCT
@@ -79,6 +184,7 @@ def run_job(
                           .format(job, run_path))
                     print(" - Skipping...")
 
+    inf_obj = None
     if do_run:
         # create the run directory
         status = autofile.system.RunStatus.RUNNING
@@ -90,40 +196,47 @@ def run_job(
         inf_obj.utc_start_time = autofile.system.info.utc_time()
         run_fs.leaf.file.info.write(inf_obj, [job])
 
-        # Set the job runner based on requested by user; set special options as needed
-        runner = JOB_RUNNER_DCT[job]
+    return inf_obj
 
-        if job == elstruct.Job.OPTIMIZATION:
-            runner = functools.partial(
-                runner, feedback=feedback,
-                frozen_coordinates=frozen_coordinates,
-                freeze_dummy_atoms=freeze_dummy_atoms)
-        if job == elstruct.Job.IRC:
-            runner = functools.partial(
-                runner, irc_direction=irc_direction)
 
-        inp_str, out_str = runner(
-            script_str, run_path, geom=geom, chg=spc_info[1],
-            mul=spc_info[2], method=thy_level[1], basis=thy_level[2],
-            orb_restricted=thy_level[3], prog=thy_level[0],
-            errors=errors, options_mat=options_mat, **kwargs
-        )
+def _job_runner(job, feedback, frozen_coordinates, freeze_dummy_atoms,
+                irc_direction):
+    """ the job runner, with special options set as needed
+    """
+    runner_ = JOB_RUNNER_DCT[job]
 
-        inf_obj.utc_end_time = autofile.system.info.utc_time()
-        prog = inf_obj.prog
-        if is_successful_output(out_str, job, prog):
-            run_fs.leaf.file.output.write(out_str, [job])
-            print(" - Run succeeded.")
-            status = autofile.system.RunStatus.SUCCESS
-        else:
-            print(" - Run failed.")
-            status = autofile.system.RunStatus.FAILURE
-        version = elstruct.reader.program_version(prog, out_str)
-        inf_obj.version = version
-        inf_obj.status = status
-        run_fs.leaf.file.info.write(inf_obj, [job])
-        run_fs.leaf.file.input.write(inp_str, [job])
-        print('finished run_job')
+    if job == elstruct.Job.OPTIMIZATION:
+        runner_ = functools.partial(
+            runner_, feedback=feedback,
+            frozen_coordinates=frozen_coordinates,
+            freeze_dummy_atoms=freeze_dummy_atoms)
+    if job == elstruct.Job.IRC:
+        runner_ = functools.partial(
+            runner_, irc_direction=irc_direction)
+
+    return runner_
+
+
+def _finish_job(job, run_fs, inf_obj, inp_str, out_str):
+    """ record the outputs and final status of a job
+
+    :returns: the run status
+    """
+    inf_obj.utc_end_time = autofile.system.info.utc_time()
+    prog = inf_obj.prog
+    if is_successful_output(out_str, job, prog):
+        run_fs.leaf.file.output.write(out_str, [job])
+        print(" - Run succeeded.")
+        status = autofile.system.RunStatus.SUCCESS
+    else:
+        print(" - Run failed.")
+        status = autofile.system.RunStatus.FAILURE
+    version = elstruct.reader.program_version(prog, out_str)
+    inf_obj.version = version
+    inf_obj.status = status
+    run_fs.leaf.file.info.write(inf_obj, [job])
+    run_fs.leaf.file.input.write(inp_str, [job])
+    return status
 
 
 def read_job(job, run_fs):
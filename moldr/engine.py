@@ -0,0 +1,223 @@
+""" job engines, which run electronic structure jobs concurrently
+
+An engine takes jobs along with the cores and memory they need, and returns a
+future for each of them. The local engine runs as many jobs at once as fit in
+the cores and memory of this node, in the order they were submitted.
+
+Engines are used through `moldr.driver.submit_job`, which does the run
+information bookkeeping of `moldr.driver.run_job` when each job finishes.
+"""
+import os
+import re
+import threading
+import functools
+import collections
+import multiprocessing
+import concurrent.futures
+import autofile
+import moldr.monitor
+
+_ENGINE = {'engine': None}
+_ENGINE_LOCK = threading.Lock()
+
+NPROC_PATTERN = re.compile(r'%nprocshared\s*=\s*(\d+)', re.IGNORECASE)
+SCRIPT_NPROC_PATTERN = re.compile(r'\s-n\s+(\d+)\b')
+
+# programs whose memory option is per process, rather than for the job
+PER_PROCESS_MEMORY_PROGS = ('molpro2015',)
+
+
+class LocalEngine():
+    """ runs jobs on this node, within its cores and memory
+
+    Each job runs in a worker process, which submits it, waits for it, and
+    reads its output, so that jobs don't hold up each other or the caller.
+    Jobs are started in the order they were submitted, each as soon as the
+    cores and memory it asks for are free; a job that asks for more than the
+    node has is given the whole node.
+
+    The workers are spawned rather than forked, so that they don't inherit
+    the open index connections of this process, or locks held by its other
+    threads. Instead, the global settings (see `job_settings`) are taken
+    when each job is submitted, and applied in the worker before it runs.
+    """
+
+    def __init__(self, ncores=None, memory=None):
+        """
+        :param ncores: the number of cores to use (default: all of them)
+        :type ncores: int
+        :param memory: the memory to use, in GB (default: all of it)
+        :type memory: float
+        """
+        self.ncores = os.cpu_count() if ncores is None else ncores
+        self.memory = total_memory() if memory is None else memory
+        self._free = [self.ncores, self.memory]
+        self._queue = collections.deque()
+        self._futures = set()
+        self._lock = threading.Lock()
+        # every job takes at least one core, so this many workers is enough
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            self.ncores, mp_context=multiprocessing.get_context('spawn'))
+
+    def submit(self, function, ncores=1, memory=0.):
+        """ submit a job
+
+        :param function: a function of no arguments that runs the job (it is
+            run in another process, so it must be picklable -- use
+            `functools.partial` of a module-level function to pass arguments)
+        :type function: callable
+        :param ncores: the number of cores the job needs
+        :type ncores: int
+        :param memory: the memory the job needs, in GB
+        :type memory: float
+        :returns: a future for the return value of the function
+        :rtype: concurrent.futures.Future
+        """
+        future = concurrent.futures.Future()
+        function = functools.partial(_run_job, job_settings(), function)
+        request = (min(ncores, self.ncores), min(memory, self.memory))
+        with self._lock:
+            self._queue.append((future, request, function))
+            self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        self._dispatch()
+        return future
+
+    def wait(self):
+        """ wait for all of the submitted jobs to finish
+        """
+        while True:
+            with self._lock:
+                futures = tuple(self._futures)
+            if not futures:
+                break
+            concurrent.futures.wait(futures)
+
+    def shutdown(self):
+        """ wait for all of the submitted jobs to finish, and stop the worker
+        processes
+        """
+        self.wait()
+        self._pool.shutdown()
+
+    def _dispatch(self):
+        """ start the jobs at the head of the queue that fit in the free
+        cores and memory
+        """
+        with self._lock:
+            while self._queue:
+                future, (ncores, memory), function = self._queue[0]
+                if ncores > self._free[0] or memory > self._free[1]:
+                    break
+                self._queue.popleft()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    proc_future = self._pool.submit(function)
+                except RuntimeError as exc:
+                    # the pool has been shut down, or a worker has died
+                    future.set_exception(exc)
+                    continue
+                self._free[0] -= ncores
+                self._free[1] -= memory
+                proc_future.add_done_callback(functools.partial(
+                    self._finish, future, (ncores, memory)))
+
+    def _finish(self, future, request, proc_future):
+        """ free the cores and memory of a finished job for the next ones,
+        and pass on its result
+        """
+        ncores, memory = request
+        with self._lock:
+            self._free[0] += ncores
+            self._free[1] += memory
+        self._dispatch()
+
+        exc = proc_future.exception()
+        if exc is None:
+            future.set_result(proc_future.result())
+        else:
+            future.set_exception(exc)
+
+
+def engine():
+    """ the current job engine (by default, a `LocalEngine` for this node)
+    """
+    with _ENGINE_LOCK:
+        if _ENGINE['engine'] is None:
+            _ENGINE['engine'] = LocalEngine()
+        return _ENGINE['engine']
+
+
+def set_engine(engine_):
+    """ set the job engine that jobs are submitted to
+    """
+    with _ENGINE_LOCK:
+        _ENGINE['engine'] = engine_
+
+
+def job_settings():
+    """ the global settings that jobs run with: those of autofile (see
+    `autofile.system.model.settings`) and output monitoring
+
+    :rtype: dict
+    """
+    return {'autofile': autofile.system.model.settings(),
+            'monitoring': moldr.monitor.monitoring()}
+
+
+def apply_job_settings(settings):
+    """ apply the global settings from `job_settings`
+    """
+    autofile.system.model.apply_settings(settings['autofile'])
+    moldr.monitor.set_monitoring(settings['monitoring'])
+
+
+def job_resources(script_str, kwargs, submitter=None, prog=None):
+    """ the cores and memory (in GB) that a job asks for
+
+    The memory comes from the `memory` keyword argument, and the cores from
+    a `%NProcShared` machine option (Gaussian) or the `-n` option in the run
+    script (Molpro), as set up by `moldr.util.run_qchem_par`. For programs
+    that take the memory per process (`PER_PROCESS_MEMORY_PROGS`), it is
+    multiplied by the number of cores. A job that a submitter runs on
+    another node (see `moldr.submit`) only asks for the core that waits for
+    it.
+
+    :rtype: (int, float)
+    """
+    if submitter is not None and not submitter.runs_locally:
+        return 1, 0.
+
+    ncores = 1
+    for option in kwargs.get('machine_options', ()):
+        match = NPROC_PATTERN.search(option)
+        if match:
+            ncores = int(match.group(1))
+            break
+    else:
+        match = SCRIPT_NPROC_PATTERN.search(script_str)
+        if match:
+            ncores = int(match.group(1))
+    memory = float(kwargs.get('memory', 0.))
+    if prog in PER_PROCESS_MEMORY_PROGS:
+        memory *= ncores
+    return ncores, memory
+
+
+def _run_job(settings, function):
+    """ run a job in a worker process, with the settings it was submitted
+    with
+    """
+    apply_job_settings(settings)
+    return function()
+
+
+def total_memory():
+    """ the physical memory of this node, in GB
+    """
+    try:
+        nbytes = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return float('inf')
+    return nbytes / 1024.**3
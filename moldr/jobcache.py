@@ -0,0 +1,286 @@
+""" content-addressed cache of electronic structure job outputs
+
+Jobs are keyed on a hash of their program, its version, their input string
+and the script that runs them, normalized so that jobs which only differ in
+the resources they ask for (memory, cores) or in whitespace give the same
+key. When a job is about to be run, its output is looked up in the cache
+first (see `moldr.submit.run_direct`), and the program is only run if it
+isn't there.
+
+Unless it is given, the program version is the one read from the last output
+stored for the same program and script. So, if the program behind a script
+is upgraded, outputs of the old version are still used until a job that
+isn't cached has been run with the new one; pass the version explicitly if
+that matters.
+
+The cache is a directory of outputs named by their keys, which can be shared
+by any number of filesystem prefixes and processes. It keeps a running total
+of the size of its outputs, and once that grows past its size limit, the
+outputs that were least recently used are evicted.
+"""
+import os
+import re
+import json
+import hashlib
+import binascii
+import elstruct
+import autofile
+import moldr.engine
+
+# lines that only set resources, which don't change the results
+RESOURCE_LINE_PATTERN = re.compile(
+    r'^\s*(%nprocshared\b|%nproc\b|%mem\b|%chk\b|memory\b)', re.IGNORECASE)
+
+# the default size limit, in bytes
+MAX_SIZE = 10 * 1024**3
+
+# the running total of the size of the outputs, and the lock guarding it
+SIZE_FILE_NAME = '.size'
+LOCK_FILE_NAME = '.size.lock'
+
+# the directory of the program versions last seen for each program and script
+VERSIONS_DIR_NAME = 'versions'
+
+_JOB_CACHE = {'cache': None}
+
+
+class JobCache():
+    """ directory of job outputs, keyed on their inputs
+    """
+
+    def __init__(self, path, max_size=MAX_SIZE):
+        """
+        :param path: the cache directory
+        :type path: str
+        :param max_size: the size limit, in bytes
+        :type max_size: int
+        """
+        self.path = os.path.abspath(path)
+        self.max_size = max_size
+        os.makedirs(self.path, exist_ok=True)
+
+    def get(self, inp_str, prog, script_str='', version=None):
+        """ the cached output for an input, if there is one
+
+        :param script_str: the script the job would be run with
+        :type script_str: str
+        :param version: the program version (default: the one last stored
+            for this program and script)
+        :type version: str
+        :rtype: str
+        """
+        if version is None:
+            version = self.program_version(prog, script_str)
+            if version is None:
+                return None
+
+        out_pth = self._output_path(
+            input_key(inp_str, prog, script_str=script_str, version=version))
+        try:
+            with open(out_pth, 'r') as file_obj:
+                out_str = file_obj.read()
+        except FileNotFoundError:
+            return None
+
+        # mark the output as recently used
+        try:
+            os.utime(out_pth)
+        except FileNotFoundError:
+            pass
+        return out_str
+
+    def put(self, inp_str, prog, out_str, script_str='', version=None):
+        """ store the output for an input, evicting old outputs once the
+        cache has grown past its size limit
+
+        :param script_str: the script the job was run with
+        :type script_str: str
+        :param version: the program version (default: the one read from the
+            output)
+        :type version: str
+        """
+        if version is None:
+            version = output_version(prog, out_str)
+        self._write_version(prog, script_str, version)
+
+        out_pth = self._output_path(
+            input_key(inp_str, prog, script_str=script_str, version=version))
+        os.makedirs(os.path.dirname(out_pth), exist_ok=True)
+        tmp_pth = '{}.{}.tmp'.format(
+            out_pth, binascii.hexlify(os.urandom(4)).decode())
+        with open(tmp_pth, 'w') as file_obj:
+            file_obj.write(out_str)
+        out_size = os.path.getsize(tmp_pth)
+
+        with self._lock():
+            try:
+                old_size = os.path.getsize(out_pth)
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(tmp_pth, out_pth)
+            if self._add_size(out_size - old_size) > self.max_size:
+                self._evict(self.max_size)
+
+    def program_version(self, prog, script_str=''):
+        """ the program version last stored for a program and script, or None
+        if nothing has been stored for them
+        """
+        try:
+            with open(self._version_path(prog, script_str), 'r') as file_obj:
+                return file_obj.read()
+        except FileNotFoundError:
+            return None
+
+    def size(self):
+        """ the total size of the cached outputs, in bytes (from a scan of
+        the cache)
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_size=None):
+        """ evict the least recently used outputs until the cache fits in its
+        size limit
+
+        :param max_size: the size to shrink to (default: the size limit)
+        :type max_size: int
+        :returns: the number of outputs evicted
+        :rtype: int
+        """
+        max_size = self.max_size if max_size is None else max_size
+        with self._lock():
+            return self._evict(max_size)
+
+    def _evict(self, max_size):
+        """ evict outputs down to a size, and reset the running total to the
+        size that is left (with the lock held)
+        """
+        ents = sorted(self._entries())
+        size = sum(size for _, size, _ in ents)
+        nevicted = 0
+        for _, ent_size, pth in ents:
+            if size <= max_size:
+                break
+            try:
+                os.remove(pth)
+            except FileNotFoundError:
+                pass
+            size -= ent_size
+            nevicted += 1
+        self._write_size(size)
+        return nevicted
+
+    def _lock(self):
+        return autofile.system.model.FileLock(
+            os.path.join(self.path, LOCK_FILE_NAME))
+
+    def _add_size(self, delta):
+        """ add to the running total of the size of the outputs, counting it
+        up from a scan if there isn't one yet (with the lock held)
+
+        :returns: the new total
+        """
+        try:
+            with open(os.path.join(self.path, SIZE_FILE_NAME), 'r') as fobj:
+                size = int(fobj.read()) + delta
+        except (FileNotFoundError, ValueError):
+            # (a scan already includes the output just stored)
+            size = self.size()
+        self._write_size(size)
+        return size
+
+    def _write_size(self, size):
+        with open(os.path.join(self.path, SIZE_FILE_NAME), 'w') as file_obj:
+            file_obj.write(str(size))
+
+    def _write_version(self, prog, script_str, version):
+        ver_pth = self._version_path(prog, script_str)
+        os.makedirs(os.path.dirname(ver_pth), exist_ok=True)
+        tmp_pth = '{}.{}.tmp'.format(
+            ver_pth, binascii.hexlify(os.urandom(4)).decode())
+        with open(tmp_pth, 'w') as file_obj:
+            file_obj.write(version)
+        os.replace(tmp_pth, ver_pth)
+
+    def _output_path(self, key):
+        return os.path.join(self.path, key[:2], key[2:] + '.out')
+
+    def _version_path(self, prog, script_str):
+        key = _hash([prog, normalized_script_lines(script_str)])
+        return os.path.join(self.path, VERSIONS_DIR_NAME, key + '.txt')
+
+    def _entries(self):
+        """ (last use, size, path) for each cached output
+        """
+        ents = []
+        for dir_ent in os.scandir(self.path):
+            if not dir_ent.is_dir():
+                continue
+            for ent in os.scandir(dir_ent.path):
+                if ent.name.endswith('.out'):
+                    try:
+                        stat = ent.stat()
+                    except FileNotFoundError:
+                        continue
+                    ents.append((stat.st_mtime, stat.st_size, ent.path))
+        return ents
+
+
+def job_cache():
+    """ the current job cache, or None if jobs aren't cached (the default)
+    """
+    return _JOB_CACHE['cache']
+
+
+def set_job_cache(cache):
+    """ set the job cache that jobs are looked up in (None turns caching off)
+    """
+    _JOB_CACHE['cache'] = cache
+
+
+def input_key(inp_str, prog, script_str='', version=''):
+    """ the cache key for a program, its version, an input string, and the
+    script that runs it
+    """
+    return _hash([prog, version, normalized_input_lines(inp_str),
+                  normalized_script_lines(script_str)])
+
+
+def output_version(prog, out_str):
+    """ the program version read from an output, or '' if it can't be read
+    """
+    try:
+        version = elstruct.reader.program_version(prog, out_str)
+    except (AssertionError, ValueError, TypeError, AttributeError):
+        version = None
+    return version if isinstance(version, str) else ''
+
+
+def normalized_input_lines(inp_str):
+    """ the lines of an input string that determine its results, without
+    resource requests, trailing whitespace, or blank lines at the ends
+    """
+    return _strip_blank_ends(
+        [line.rstrip() for line in inp_str.splitlines()
+         if not RESOURCE_LINE_PATTERN.match(line)])
+
+
+def normalized_script_lines(script_str):
+    """ the lines of a run script, without the number of cores it asks for
+    (see `moldr.engine.job_resources`), trailing whitespace, or blank lines at
+    the ends
+    """
+    return _strip_blank_ends(
+        [moldr.engine.SCRIPT_NPROC_PATTERN.sub('', line).rstrip()
+         for line in script_str.splitlines()])
+
+
+def _strip_blank_ends(lines):
+    while lines and not lines[0]:
+        lines.pop(0)
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _hash(obj):
+    return hashlib.sha256(json.dumps(obj).encode()).hexdigest()
@@ -0,0 +1,191 @@
+""" monitoring of job outputs while the jobs run
+
+An output monitor tails the output file of a running job, and decides that
+the job is hopeless as soon as its output shows it, so that it can be killed
+instead of being left to run to completion:
+ - when a fatal pattern has been matched a given number of times (e.g. once
+   for a Molpro MCSCF failure, or a few times for SCF non-convergence)
+ - when the energy has risen for a given number of optimization cycles in a
+   row
+
+Monitors are passed to `moldr.submit.run_direct` by the runners, which start
+the next set of options right away when a job is killed. Monitoring is off
+unless a monitor is passed to the runners, or it is turned on for every
+program with `set_monitoring`.
+"""
+import os
+import re
+import time
+
+OUTPUT_NAME = 'run.out'
+
+# fatal patterns, with the number of matches that make a job hopeless, by
+# program
+FATAL_PATTERNS_DCT = {
+    'molpro2015': (
+        (r'The problem occurs in Multi', 1),
+        (r'The problem occurs in cipro', 1),
+        (r'No convergence in max\. number of iterations', 3),
+    ),
+    'gaussian09': (
+        (r'Convergence failure -- run terminated', 1),
+        (r'Convergence criterion not met', 3),
+    ),
+    'gaussian16': (
+        (r'Convergence failure -- run terminated', 1),
+        (r'Convergence criterion not met', 3),
+    ),
+}
+
+# patterns capturing the energy of each optimization cycle, by program
+ENERGY_PATTERN_DCT = {
+    'molpro2015': r'^\s*!\S*\s+.*?energy\s+(-?\d+\.\d+)',
+    'gaussian09': r'SCF Done:\s+E\(\S+\)\s+=\s+(-?\d+\.\d+)',
+    'gaussian16': r'SCF Done:\s+E\(\S+\)\s+=\s+(-?\d+\.\d+)',
+}
+
+# the number of optimization cycles in a row that the energy may rise for
+MAX_RISING_CYCLES = 10
+
+# how often to read the output, in seconds
+CHECK_INTERVAL = 5.
+
+_MONITORING = {'on': False}
+
+
+class OutputMonitor():
+    """ tails the output file of a running job, looking for signs that it is
+    hopeless
+    """
+
+    def __init__(self, fatal_patterns=(), energy_pattern=None,
+                 max_rising_cycles=MAX_RISING_CYCLES,
+                 interval=CHECK_INTERVAL, output_name=OUTPUT_NAME):
+        """
+        :param fatal_patterns: regular expressions, with the number of
+            matches that make a job hopeless
+        :type fatal_patterns: tuple[(str, int)]
+        :param energy_pattern: a regular expression capturing the energy of
+            each optimization cycle (None turns energy checks off)
+        :type energy_pattern: str
+        :param max_rising_cycles: the number of cycles in a row that the
+            energy may rise for
+        :type max_rising_cycles: int
+        :param interval: how often to read the output, in seconds
+        :type interval: float
+        :param output_name: the name of the output file in the run directory
+        :type output_name: str
+        """
+        self.fatal_patterns = tuple(
+            (re.compile(pattern, re.IGNORECASE), count)
+            for pattern, count in fatal_patterns)
+        self.energy_pattern = (None if energy_pattern is None else
+                               re.compile(energy_pattern, re.IGNORECASE))
+        self.max_rising_cycles = max_rising_cycles
+        self.interval = interval
+        self.output_name = output_name
+        self.reason = None
+        self._path = None
+        self._offset = 0
+        self._partial = ''
+        self._counts = []
+        self._energy = None
+        self._nrising = 0
+        self._last_check = 0.
+
+    def start(self, run_dir):
+        """ start monitoring the output of a job in a run directory
+        """
+        self.reason = None
+        self._path = os.path.join(run_dir, self.output_name)
+        self._offset = 0
+        self._partial = ''
+        self._counts = [0] * len(self.fatal_patterns)
+        self._energy = None
+        self._nrising = 0
+        self._last_check = 0.
+
+    def check(self):
+        """ read what the job has written since the last check (at most every
+        `interval` seconds), and look for signs that it is hopeless
+
+        :returns: the reason the job is hopeless, or None if it isn't (yet)
+        :rtype: str
+        """
+        now = time.time()
+        if self.reason is None and now - self._last_check >= self.interval:
+            self._last_check = now
+            for line in self._new_lines():
+                self.reason = self._check_line(line)
+                if self.reason is not None:
+                    break
+        return self.reason
+
+    def _new_lines(self):
+        """ the complete lines written since the last check
+        """
+        try:
+            with open(self._path, 'r') as file_obj:
+                file_obj.seek(self._offset)
+                text = file_obj.read()
+                self._offset = file_obj.tell()
+        except FileNotFoundError:
+            return []
+
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()
+        return lines
+
+    def _check_line(self, line):
+        for idx, (pattern, count) in enumerate(self.fatal_patterns):
+            if pattern.search(line):
+                self._counts[idx] += 1
+                if self._counts[idx] >= count:
+                    return "'{}' in the output".format(pattern.pattern)
+
+        if self.energy_pattern is not None:
+            match = self.energy_pattern.search(line)
+            if match:
+                energy = float(match.group(1))
+                if self._energy is not None and energy > self._energy:
+                    self._nrising += 1
+                else:
+                    self._nrising = 0
+                self._energy = energy
+                if self._nrising >= self.max_rising_cycles:
+                    return ("energy rose for {} cycles in a row"
+                            .format(self._nrising))
+
+        return None
+
+
+def monitoring():
+    """ do the runners watch job outputs by default? (off unless turned on
+    with `set_monitoring`)
+    """
+    return _MONITORING['on']
+
+
+def set_monitoring(on):
+    """ turn default output monitoring in the runners on (or off)
+    """
+    _MONITORING['on'] = bool(on)
+
+
+def output_monitor(prog, optimization=False):
+    """ the default output monitor for a program
+
+    :param optimization: is this an optimization? (if so, the energy is
+        checked too)
+    :type optimization: bool
+    :returns: the monitor, or None if there is nothing to look for in the
+        output of this program
+    :rtype: OutputMonitor
+    """
+    fatal_patterns = FATAL_PATTERNS_DCT.get(prog, ())
+    energy_pattern = (ENERGY_PATTERN_DCT.get(prog) if optimization else
+                      None)
+    if not fatal_patterns and energy_pattern is None:
+        return None
+    return OutputMonitor(fatal_patterns=fatal_patterns,
+                         energy_pattern=energy_pattern)
@@ -5,13 +5,34 @@ opts_dct = a dictionary of `optn`s by argument keyword
 opts_row = a list of `optn_dct`s for cycling to fix a particular error
 opts_mat = a list of `optn_row`s for each error
 note: options (`opts_dct`) are a subset of keyword arguments (`kwargs_dct`)
+
+The rows are walked in a fixed order. If there is an options statistics
+store (see `set_options_stats`), the runners record whether each option fixed
+the error it was tried for, and reorder the rows (see `learned`) so that the
+options most likely to fix an error for this kind of job are tried first --
+keyed by program, method, error, and molecule features (saddle point, radical).
+Options that have been tried many times without fixing anything are skipped.
+Until enough outcomes have been recorded, the fixed order is kept.
 """
+import os
+import json
+import binascii
 import itertools
+from autofile.system.model import FileLock
 try:
     from collections.abc import Sequence as _Sequence
 except ImportError:
     from collections import Sequence as _Sequence
 
+# the number of times an option must have been tried before its outcomes
+# count
+MIN_TRIES = 5
+
+# options less likely than this to fix an error are skipped
+SKIP_PROBABILITY = 0.05
+
+_OPTIONS_STATS = {'stats': None}
+
 
 def is_exhausted(opts_mat):
     """ is this options matrix exhausted?
@@ -51,6 +72,140 @@ def updated_kwargs(kwargs_dct, opts_mat):
     return kwargs_dct
 
 
+class OptionsStats():
+    """ persistent counts of how often each option fixed an error, in a JSON
+    file that can be shared by any number of processes
+    """
+
+    def __init__(self, path):
+        """
+        :param path: the statistics file
+        :type path: str
+        """
+        self.path = os.path.abspath(path)
+
+    def counts(self, case, error):
+        """ the outcomes of the options tried for an error in a case
+
+        :param case: the program, method, and molecule features (see
+            `molecule_features`)
+        :type case: (str, str, tuple[str])
+        :returns: [times fixed, times tried] by option (see `_options_key`)
+        :rtype: dict
+        """
+        return self._read().get(_case_key(case, error), {})
+
+    def record(self, case, error, opts_dct, fixed):
+        """ record whether an option fixed an error in a case
+        """
+        dir_pth = os.path.dirname(self.path)
+        os.makedirs(dir_pth, exist_ok=True)
+        with FileLock(os.path.join(
+                dir_pth, '.{}.lock'.format(os.path.basename(self.path)))):
+            stats_dct = self._read()
+            counts = stats_dct.setdefault(_case_key(case, error), {})
+            nfixed, ntried = counts.get(_options_key(opts_dct), (0, 0))
+            counts[_options_key(opts_dct)] = [nfixed + int(bool(fixed)),
+                                              ntried + 1]
+
+            tmp_pth = '{}.{}.tmp'.format(
+                self.path, binascii.hexlify(os.urandom(4)).decode())
+            with open(tmp_pth, 'w') as file_obj:
+                json.dump(stats_dct, file_obj, sort_keys=True)
+            os.replace(tmp_pth, self.path)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as file_obj:
+                return json.load(file_obj)
+        except FileNotFoundError:
+            return {}
+
+
+def options_stats():
+    """ the current options statistics store, or None if there isn't one (the
+    default)
+    """
+    return _OPTIONS_STATS['stats']
+
+
+def set_options_stats(stats):
+    """ set the options statistics store that the runners learn from (None
+    turns learning off)
+    """
+    _OPTIONS_STATS['stats'] = stats
+
+
+def molecule_features(mul, saddle=False):
+    """ the features of a molecule that the options statistics are keyed on
+    """
+    return tuple(name for name, has in (('radical', mul > 1),
+                                        ('saddle', saddle)) if has)
+
+
+def learned(opts_mat, errors, case, stats=None):
+    """ reorder the rows of an options matrix by how likely each option is to
+    fix the error for its row, from the recorded outcomes
+
+    Options are ranked by their fix probability, estimated as
+    (fixed + 1) / (tried + 2) once they have been tried `MIN_TRIES` times, and
+    as an even chance before that. Ties keep their order in the matrix, so
+    with no outcomes recorded the matrix is unchanged. Options less likely
+    than `SKIP_PROBABILITY` to fix the error are dropped, unless that would
+    empty the row.
+
+    :param errors: the error for each row
+    :param case: the program, method, and molecule features (see
+        `molecule_features`)
+    :type case: (str, str, tuple[str])
+    :param stats: the statistics store (default: the current one, if any)
+    :returns: the reordered options matrix
+    """
+    stats = options_stats() if stats is None else stats
+    if stats is None:
+        return opts_mat
+
+    assert len(errors) == len(opts_mat)
+    opts_mat_ = []
+    for error, opts_row in zip(errors, opts_mat):
+        counts = stats.counts(case, error)
+        probs = [_fix_probability(*counts.get(_options_key(opts_dct), (0, 0)))
+                 for opts_dct in opts_row]
+        ranked = sorted(zip(probs, opts_row), key=lambda x: -x[0])
+        opts_row_ = tuple(opts_dct for prob, opts_dct in ranked
+                          if prob >= SKIP_PROBABILITY)
+        if not opts_row_:
+            opts_row_ = tuple(opts_dct for _, opts_dct in ranked)
+        opts_mat_.append(opts_row_)
+    return tuple(opts_mat_)
+
+
+def record_outcome(case, error, opts_dct, fixed, stats=None):
+    """ record whether an option fixed an error, if there is a statistics
+    store
+
+    :param stats: the statistics store (default: the current one, if any)
+    """
+    stats = options_stats() if stats is None else stats
+    if stats is not None:
+        stats.record(case, error, opts_dct, fixed)
+
+
+def _fix_probability(nfixed, ntried):
+    if ntried < MIN_TRIES:
+        return 0.5
+    return (nfixed + 1.) / (ntried + 2.)
+
+
+def _case_key(case, error):
+    prog, method, features = case
+    return json.dumps([prog, method, str(error), sorted(features)])
+
+
+def _options_key(opts_dct):
+    return json.dumps(opts_dct, sort_keys=True, default=str)
+
+
 def _update_kwargs(kwargs_dct, opts_dct):
     """ update a kwargs dictionary with a dictionary of options
     where an option has already been set in kwargs, the values from `opts_dct`
@@ -5,6 +5,8 @@ import automol
 import elstruct
 import autofile
 import moldr.optsmat
+import moldr.monitor
+import moldr.submit
 from autoparse import pattern as app
 from autoparse import find as apf
 
@@ -14,10 +16,25 @@ def options_matrix_optimization(script_str, prefix,
                                 geom, chg, mul, method, basis, prog,
                                 errors=(), options_mat=(), feedback=False,
                                 frozen_coordinates=(),
-                                freeze_dummy_atoms=True,
-                                **kwargs):
+                                freeze_dummy_atoms=True, submitter=None,
+                                job_cache=None, monitor=None,
+                                options_stats=None, **kwargs):
     """ try several sets of options to generate an output file
 
+    Each run goes through a submitter (default: the current one; see
+    `moldr.submit`), unless its output is in the job cache (default: the
+    current one, if any; see `moldr.jobcache`).
+
+    If there is a monitor (default: the one for the program, if monitoring
+    has been turned on with `moldr.monitor.set_monitoring`, and none
+    otherwise; False turns monitoring off), it watches the output while the
+    job runs, and a job that is found to be hopeless is killed and retried
+    with the next set of options, as though it had hit the first error.
+
+    If there is an options statistics store (default: the current one, if
+    any; see `moldr.optsmat`), the options are tried in the order most likely
+    to fix each error, and the outcome of each one is recorded.
+
     :returns: the input string and the output string
     :rtype: (str, str)
     """
@@ -36,6 +53,18 @@ def options_matrix_optimization(script_str, prefix,
         frozen_coordinates = (tuple(frozen_coordinates) +
                               automol.zmatrix.dummy_coordinate_names(geom))
 
+    # the energy of a saddle point search is supposed to rise, so it isn't
+    # checked
+    if monitor is None and moldr.monitor.monitoring():
+        monitor = moldr.monitor.output_monitor(
+            prog, optimization=not kwargs.get('saddle', False))
+
+    case = (prog, method, moldr.optsmat.molecule_features(
+        mul, saddle=kwargs.get('saddle', False)))
+    options_mat = moldr.optsmat.learned(options_mat, errors, case,
+                                        stats=options_stats)
+    tried = None
+
     kwargs_ = dict(kwargs)
     while True:
         subrun_fs.leaf.create([macro_idx, micro_idx])
@@ -43,8 +72,10 @@ def options_matrix_optimization(script_str, prefix,
 
         with warnings.catch_warnings():
             warnings.simplefilter('ignore')
-            inp_str, out_str = elstruct.run.direct(
+            inp_str, out_str = moldr.submit.run_direct(
                 elstruct.writer.optimization, script_str, path,
+                submitter=submitter, job_cache=job_cache,
+                monitor=monitor or None,
                 # geom=geom, species_info, theory_level,
                 # basis=basis, frozen_coordinates=frozen_coordinates,
                 geom=geom, charge=chg, mult=mul, method=method,
@@ -53,6 +84,15 @@ def options_matrix_optimization(script_str, prefix,
 
         error_vals = [elstruct.reader.has_error_message(prog, error, out_str)
                       for error in errors]
+        killed = _killed_early(monitor, error_vals)
+        if tried is not None:
+            # the option only fixed the error if the retry went through; a
+            # retry that fails on another error doesn't count
+            row_idx, opts_dct = tried
+            moldr.optsmat.record_outcome(
+                case, errors[row_idx], opts_dct,
+                fixed=not (killed or any(error_vals)),
+                stats=options_stats)
 
         # Kill the while loop if we Molpro error signaling a hopeless point
         # When an MCSCF WF calculation fails to converge at some step in opt
@@ -64,13 +104,14 @@ def options_matrix_optimization(script_str, prefix,
         if apf.has_match(fail_pattern, out_str, case=False):
             break
 
-        if not any(error_vals):
+        if not any(error_vals) and not killed:
             # success
             break
-        elif not moldr.optsmat.is_exhausted(options_mat):
+        elif any(error_vals) and not moldr.optsmat.is_exhausted(options_mat):
             # try again
             micro_idx += 1
             error_row_idx = error_vals.index(True)
+            tried = (error_row_idx, options_mat[error_row_idx][0])
             kwargs_ = moldr.optsmat.updated_kwargs(kwargs, options_mat)
             options_mat = moldr.optsmat.advance(error_row_idx, options_mat)
             if feedback:
@@ -88,10 +129,25 @@ def options_matrix_optimization(script_str, prefix,
 def options_matrix_run(input_writer, script_str, prefix,
                        # geom, species_info, theory_level,
                        geom, chg, mul, method, basis, prog,
-                       errors=(), options_mat=(),
+                       errors=(), options_mat=(), submitter=None,
+                       job_cache=None, monitor=None, options_stats=None,
                        **kwargs):
     """ try several sets of options to generate an output file
 
+    Each run goes through a submitter (default: the current one; see
+    `moldr.submit`), unless its output is in the job cache (default: the
+    current one, if any; see `moldr.jobcache`).
+
+    If there is a monitor (default: the one for the program, if monitoring
+    has been turned on with `moldr.monitor.set_monitoring`, and none
+    otherwise; False turns monitoring off), it watches the output while the
+    job runs, and a job that is found to be hopeless is killed and retried
+    with the next set of options, as though it had hit the first error.
+
+    If there is an options statistics store (default: the current one, if
+    any; see `moldr.optsmat`), the options are tried in the order most likely
+    to fix each error, and the outcome of each one is recorded.
+
     :returns: the input string and the output string
     :rtype: (str, str)
     """
@@ -102,6 +158,15 @@ def options_matrix_run(input_writer, script_str, prefix,
     macro_idx = max_macro_idx + 1
     micro_idx = 0
 
+    if monitor is None and moldr.monitor.monitoring():
+        monitor = moldr.monitor.output_monitor(prog)
+
+    case = (prog, method, moldr.optsmat.molecule_features(
+        mul, saddle=kwargs.get('saddle', False)))
+    options_mat = moldr.optsmat.learned(options_mat, errors, case,
+                                        stats=options_stats)
+    tried = None
+
     kwargs_ = dict(kwargs)
     while True:
         subrun_fs.leaf.create([macro_idx, micro_idx])
@@ -109,8 +174,9 @@ def options_matrix_run(input_writer, script_str, prefix,
 
         with warnings.catch_warnings():
             warnings.simplefilter('ignore')
-            inp_str, out_str = elstruct.run.direct(
-                input_writer, script_str, path,
+            inp_str, out_str = moldr.submit.run_direct(
+                input_writer, script_str, path, submitter=submitter,
+                job_cache=job_cache, monitor=monitor or None,
                 # geom=geom, species_info, theory_level,
                 # basis=basis, prog=prog, **kwargs_)
                 geom=geom, charge=chg, mult=mul, method=method,
@@ -118,14 +184,24 @@ def options_matrix_run(input_writer, script_str, prefix,
 
         error_vals = [elstruct.reader.has_error_message(prog, error, out_str)
                       for error in errors]
-
-        if not any(error_vals):
+        killed = _killed_early(monitor, error_vals)
+        if tried is not None:
+            # the option only fixed the error if the retry went through; a
+            # retry that fails on another error doesn't count
+            row_idx, opts_dct = tried
+            moldr.optsmat.record_outcome(
+                case, errors[row_idx], opts_dct,
+                fixed=not (killed or any(error_vals)),
+                stats=options_stats)
+
+        if not any(error_vals) and not killed:
             # success
             break
-        elif not moldr.optsmat.is_exhausted(options_mat):
+        elif any(error_vals) and not moldr.optsmat.is_exhausted(options_mat):
             # try again
             micro_idx += 1
             error_row_idx = error_vals.index(True)
+            tried = (error_row_idx, options_mat[error_row_idx][0])
             kwargs_ = moldr.optsmat.updated_kwargs(kwargs, options_mat)
             options_mat = moldr.optsmat.advance(error_row_idx, options_mat)
         else:
@@ -136,3 +212,18 @@ def options_matrix_run(input_writer, script_str, prefix,
             break
 
     return inp_str, out_str
+
+
+def _killed_early(monitor, error_vals):
+    """ was the last job killed by the output monitor?
+
+    If it was, and it didn't hit any of the errors, it is treated as though
+    it had hit the first one (modifies `error_vals` in place).
+    """
+    if not monitor or monitor.reason is None:
+        return False
+
+    warnings.warn("job killed early: {}".format(monitor.reason))
+    if error_vals and not any(error_vals):
+        error_vals[0] = True
+    return True
@@ -424,6 +424,7 @@ def save_scan(scn_run_fs, scn_save_fs, coo_names, gradient=False, hessian=False)
         print("No scan to save. Skipping...")
     else:
         locs_lst = []
+        traj_lst = []
         for locs in scn_run_fs.leaf.existing([coo_names]):
             if not isinstance(locs[1][0], float):
                 continue
@@ -474,21 +475,19 @@ def save_scan(scn_run_fs, scn_save_fs, coo_names, gradient=False, hessian=False)
                             geo = hess_geometry(out_str)
                             scn_save_fs.leaf.file.geometry.write(geo, locs)
 
-        if locs_lst:
-            idxs_lst = [locs[-1] for locs in locs_lst]
-            enes = [scn_save_fs.leaf.file.energy.read(locs)
-                    for locs in locs_lst]
-            geos = [scn_save_fs.leaf.file.geometry.read(locs)
-                    for locs in locs_lst]
-
-            traj = []
-            for idxs, ene, geo in zip(idxs_lst, enes, geos):
-                comment = 'energy: {:>15.10f}, grid idxs: {}'.format(ene, idxs)
-                traj.append((comment, geo))
+                traj_lst.append((ene, geo, locs))
 
+        if locs_lst:
             traj_path = scn_save_fs.branch.file.trajectory.path([coo_names])
+            traj_store = autofile.system.traj.TrajectoryStore(traj_path)
+            # only points that are new, or have changed, are appended
+            traj_store.update(
+                (ene, locs,
+                 ('energy: {:>15.10f}, grid idxs: {}'.format(ene, locs[-1]),
+                  geo))
+                for ene, geo, locs in traj_lst)
             print("Updating scan trajectory file at {}".format(traj_path))
-            scn_save_fs.branch.file.trajectory.write(traj, [coo_names])
+            traj_store.write_sorted(locs_lst, by_energy=False)
 
 
 def infinite_separation_energy(
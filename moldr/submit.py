@@ -0,0 +1,524 @@
+""" submission of run scripts, directly or through a batch scheduler
+
+A submitter writes a run script to a run directory, submits it, and polls it
+until it has finished:
+ - `Direct` runs scripts right away, as child processes (the default)
+ - `BatchScheduler` submits them to a batch queue (see `slurm` and `pbs`),
+   from command templates
+ - `FakeScheduler` runs them locally after a random queueing delay, and
+   fails some of them, to test drivers against a batch queue
+
+`moldr.driver.run_job` (through the runners) and `moldr.util.run_script` go
+through the current submitter (see `set_submitter`). To have many batch jobs
+in flight at once, submit them with `moldr.driver.submit_job`.
+
+While a job runs, an output monitor (see `moldr.monitor`) can watch its
+output, in which case the job is killed as soon as it is found to be hopeless.
+"""
+import os
+import re
+import stat
+import time
+import random
+import shlex
+import signal
+import warnings
+import itertools
+import subprocess
+import elstruct
+import moldr.jobcache
+
+SCRIPT_NAME = 'run.sh'
+INPUT_NAME = 'run.inp'
+OUTPUT_NAME = 'run.out'
+
+# the most that the poll interval is stretched by while a batch queue can't
+# be reached, and the number of failed polls in a row to give up after
+POLL_BACKOFF_MAX = 16
+MAX_POLL_FAILURES = 20
+
+# running local processes (for Direct and FakeScheduler), by process id, and
+# queued fake jobs, by job id; jobs are dropped once they have finished
+_PROCESSES = {}
+_FAKE_JOBS = {}
+_FAKE_JOB_IDS = itertools.count(1)
+
+
+class JobState():
+    """ states of submitted jobs """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+FINISHED_STATES = (JobState.DONE, JobState.FAILED)
+
+
+class Submitter():
+    """ base class for submitters
+
+    Subclasses implement `submit()` and `poll()`.
+    """
+    # how long to wait between polls, in seconds
+    poll_interval = 1.
+    # do jobs run on this node?
+    runs_locally = True
+
+    def submit(self, script_name, run_dir):
+        """ submit a run script that has been written to a run directory
+
+        :returns: the job id
+        """
+        raise NotImplementedError
+
+    def poll(self, job_id):
+        """ the state of a submitted job (see `JobState`)
+
+        The final state of a job is only reported once, after which the
+        submitter forgets the job.
+        """
+        raise NotImplementedError
+
+    def poll_delay(self, job_id):
+        """ how long to wait before polling a job again, in seconds
+        """
+        return self.poll_interval
+
+    def kill(self, job_id):
+        """ kill a submitted job
+        """
+        raise NotImplementedError
+
+    def can_kill(self):
+        """ can this submitter kill the jobs it has submitted?
+        """
+        return False
+
+    def script(self, script_str):
+        """ the run script to submit, for a script string
+        """
+        return script_str
+
+    def wait(self, job_id, monitor=None):
+        """ wait for a submitted job to finish
+
+        :param monitor: an output monitor (see `moldr.monitor`), which has
+            been started on the run directory; if it finds that the job is
+            hopeless, the job is killed
+        :returns: the final state of the job
+        """
+        state = self.poll(job_id)
+        while state not in FINISHED_STATES:
+            if monitor is not None and monitor.check() is not None:
+                warnings.warn("killing job {}: {}"
+                              .format(job_id, monitor.reason))
+                self.kill(job_id)
+                return JobState.FAILED
+            time.sleep(self.poll_delay(job_id))
+            state = self.poll(job_id)
+        return state
+
+    def run(self, script_str, run_dir, script_name=SCRIPT_NAME,
+            monitor=None):
+        """ write a run script to a run directory, submit it, and wait for it
+        to finish
+
+        :param monitor: an output monitor (see `moldr.monitor`), to kill the
+            job early if it is hopeless (ignored if this submitter can't kill
+            jobs)
+        :returns: the final state of the job
+        """
+        write_script(self.script(script_str), run_dir, script_name)
+        job_id = self.submit(script_name, run_dir)
+        if monitor is not None and not self.can_kill():
+            monitor = None
+        if monitor is not None:
+            monitor.start(run_dir)
+        return self.wait(job_id, monitor=monitor)
+
+
+class Direct(Submitter):
+    """ runs scripts right away, as child processes
+    """
+    poll_interval = 0.1
+
+    def submit(self, script_name, run_dir):
+        # the script runs in its own process group, so that the program it
+        # starts can be killed along with it
+        proc = subprocess.Popen('./{:s}'.format(script_name), cwd=run_dir,
+                                start_new_session=True)
+        _PROCESSES[proc.pid] = proc
+        return proc.pid
+
+    def poll(self, job_id):
+        return _process_state(job_id)
+
+    def kill(self, job_id):
+        _kill_process(job_id)
+
+    def can_kill(self):
+        return True
+
+    def wait(self, job_id, monitor=None):
+        try:
+            proc = _PROCESSES[job_id]
+            if monitor is not None:
+                return super(Direct, self).wait(job_id, monitor=monitor)
+            proc.wait()
+        except BaseException:
+            # don't leave the program running if we are interrupted
+            _kill_process(job_id)
+            raise
+        return _process_state(job_id)
+
+
+class BatchScheduler(Submitter):
+    """ submits scripts to a batch queue
+
+    The queue is driven by command templates: `submit_command` is formatted
+    with the script name and run in the run directory, and the job id is
+    taken from its output; `poll_command` is formatted with the job id, and
+    the state is taken from its output.
+
+    Once the queue no longer lists a job, its final state is taken from the
+    output of `history_command` (from the accounting records). If the poll
+    command fails, or the history command doesn't know the job yet, the
+    scheduler may just be busy, so the job is taken to be still running, and
+    polled again after a growing delay. Without a history command, a job
+    that the poll command runs fine but doesn't list has finished.
+    """
+    runs_locally = False
+
+    def __init__(self, submit_command, poll_command, state_dct,
+                 job_id_pattern=r'(\S+)', state_pattern=r'(\S+)', header='',
+                 cancel_command=None, history_command=None,
+                 poll_interval=30., max_poll_failures=MAX_POLL_FAILURES):
+        """
+        :param submit_command: the submit command, e.g. 'sbatch {script}'
+        :type submit_command: str
+        :param poll_command: the poll command, e.g. 'squeue -j {job_id}'
+        :type poll_command: str
+        :param state_dct: job states (see `JobState`), by queue state
+        :type state_dct: dict
+        :param job_id_pattern: captures the job id in the submit output
+        :type job_id_pattern: str
+        :param state_pattern: captures the queue state in the poll output
+        :type state_pattern: str
+        :param header: scheduler directives to add to the top of each script
+            (after the shebang line), e.g. '#SBATCH --time=24:00:00'
+        :type header: str
+        :param cancel_command: the cancel command, e.g. 'scancel {job_id}'
+        :type cancel_command: str
+        :param history_command: the command giving the final state of a job
+            that has left the queue, e.g. 'sacct -n -X -o State -j {job_id}'
+            (its output is matched with `state_pattern`)
+        :type history_command: str
+        :param poll_interval: how long to wait between polls, in seconds
+        :type poll_interval: float
+        :param max_poll_failures: the number of polls in a row that may fail
+            to find the state of a job before giving up on it
+        :type max_poll_failures: int
+        """
+        self.submit_command = submit_command
+        self.poll_command = poll_command
+        self.state_dct = state_dct
+        self.job_id_pattern = job_id_pattern
+        self.state_pattern = state_pattern
+        self.header = header
+        self.cancel_command = cancel_command
+        self.history_command = history_command
+        self.poll_interval = poll_interval
+        self.max_poll_failures = max_poll_failures
+        self._nfailures = {}
+
+    def script(self, script_str):
+        if not self.header:
+            return script_str
+        lines = script_str.splitlines()
+        if lines and lines[0].startswith('#!'):
+            lines.insert(1, self.header.rstrip('\n'))
+        else:
+            lines.insert(0, self.header.rstrip('\n'))
+        return '\n'.join(lines) + '\n'
+
+    def submit(self, script_name, run_dir):
+        out_str = subprocess.check_output(
+            shlex.split(self.submit_command.format(script=script_name)),
+            cwd=run_dir, universal_newlines=True)
+        match = re.search(self.job_id_pattern, out_str)
+        if match is None:
+            raise RuntimeError("Couldn't find a job id in the output of "
+                               "'{}': {}".format(self.submit_command, out_str))
+        return match.group(1)
+
+    def poll(self, job_id):
+        succeeded, state = self._query(self.poll_command, job_id)
+        if state is None and self.history_command is not None:
+            _, state = self._query(self.history_command, job_id)
+        elif state is None and succeeded:
+            # the queue no longer knows about the job
+            state = JobState.DONE
+
+        if state is None:
+            nfailures = self._nfailures.get(job_id, 0) + 1
+            if nfailures > self.max_poll_failures:
+                self._nfailures.pop(job_id)
+                raise RuntimeError("Couldn't find the state of job {} in {} "
+                                   "polls".format(job_id, nfailures))
+            self._nfailures[job_id] = nfailures
+            return JobState.RUNNING
+
+        self._nfailures.pop(job_id, None)
+        return state
+
+    def poll_delay(self, job_id):
+        return self.poll_interval * min(
+            2 ** self._nfailures.get(job_id, 0), POLL_BACKOFF_MAX)
+
+    def _query(self, command, job_id):
+        """ run a poll or history command for a job
+
+        :returns: did the command succeed? and the state it gives, if any
+        :rtype: (bool, str)
+        """
+        try:
+            proc = subprocess.run(
+                shlex.split(command.format(job_id=job_id)),
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                universal_newlines=True)
+        except OSError:
+            return False, None
+        match = re.search(self.state_pattern, proc.stdout)
+        if proc.returncode != 0 or match is None:
+            return proc.returncode == 0, None
+        return True, self.state_dct.get(match.group(1), JobState.RUNNING)
+
+    def kill(self, job_id):
+        if self.cancel_command is None:
+            raise NotImplementedError("No cancel command for this queue")
+        subprocess.call(
+            shlex.split(self.cancel_command.format(job_id=job_id)))
+
+    def can_kill(self):
+        return self.cancel_command is not None
+
+
+class FakeScheduler(Submitter):
+    """ runs scripts locally, like a batch queue would
+
+    Each job waits in the queue for a random delay before it starts, and a
+    random fraction of jobs fail without running, as they would if their
+    node went down.
+    """
+
+    def __init__(self, delay=(0., 1.), failure_rate=0., seed=None,
+                 poll_interval=0.05):
+        """
+        :param delay: the range of queueing delays, in seconds
+        :type delay: (float, float)
+        :param failure_rate: the fraction of jobs that fail
+        :type failure_rate: float
+        :param seed: the random seed
+        :param poll_interval: how long to wait between polls, in seconds
+        :type poll_interval: float
+        """
+        self.delay = delay
+        self.failure_rate = failure_rate
+        self.poll_interval = poll_interval
+        self._rng = random.Random(seed)
+
+    def submit(self, script_name, run_dir):
+        job_id = next(_FAKE_JOB_IDS)
+        _FAKE_JOBS[job_id] = {
+            'script': script_name, 'dir': run_dir, 'pid': None,
+            'start': time.time() + self._rng.uniform(*self.delay),
+            'fail': self._rng.random() < self.failure_rate}
+        return job_id
+
+    def poll(self, job_id):
+        job = _FAKE_JOBS[job_id]
+        if time.time() < job['start']:
+            return JobState.PENDING
+        if job['fail']:
+            del _FAKE_JOBS[job_id]
+            return JobState.FAILED
+        if job['pid'] is None:
+            job['pid'] = Direct().submit(job['script'], job['dir'])
+        state = _process_state(job['pid'])
+        if state in FINISHED_STATES:
+            del _FAKE_JOBS[job_id]
+        return state
+
+    def kill(self, job_id):
+        job = _FAKE_JOBS.pop(job_id, None)
+        if job is not None and job['pid'] is not None:
+            _kill_process(job['pid'])
+
+    def can_kill(self):
+        return True
+
+
+def slurm(header='', poll_interval=30.):
+    """ a submitter for the SLURM batch queue
+    """
+    return BatchScheduler(
+        submit_command='sbatch --parsable {script}',
+        poll_command='squeue --noheader --format=%T --jobs={job_id}',
+        cancel_command='scancel {job_id}',
+        history_command='sacct --noheader --allocations --format=State '
+                        '--jobs={job_id}',
+        job_id_pattern=r'(\d+)',
+        state_dct={'PENDING': JobState.PENDING,
+                   'CONFIGURING': JobState.PENDING,
+                   'RUNNING': JobState.RUNNING,
+                   'COMPLETING': JobState.RUNNING,
+                   'COMPLETED': JobState.DONE,
+                   'FAILED': JobState.FAILED,
+                   'CANCELLED': JobState.FAILED,
+                   'TIMEOUT': JobState.FAILED,
+                   'NODE_FAIL': JobState.FAILED,
+                   'BOOT_FAIL': JobState.FAILED,
+                   'DEADLINE': JobState.FAILED,
+                   'PREEMPTED': JobState.FAILED,
+                   'OUT_OF_MEMORY': JobState.FAILED},
+        header=header, poll_interval=poll_interval)
+
+
+def pbs(header='', poll_interval=30.):
+    """ a submitter for the PBS/Torque batch queue
+    """
+    return BatchScheduler(
+        submit_command='qsub {script}',
+        poll_command='qstat -f {job_id}',
+        cancel_command='qdel {job_id}',
+        # PBS Pro keeps finished jobs for `qstat -x`; Torque lists them (in
+        # XML) for a while after they finish
+        history_command='qstat -x -f {job_id}',
+        state_pattern=r'job_state\s*(?:=\s*|>)(\w)',
+        state_dct={'Q': JobState.PENDING,
+                   'H': JobState.PENDING,
+                   'W': JobState.PENDING,
+                   'R': JobState.RUNNING,
+                   'E': JobState.RUNNING,
+                   'C': JobState.DONE,
+                   'F': JobState.DONE},
+        header=header, poll_interval=poll_interval)
+
+
+_SUBMITTER = {'submitter': Direct()}
+
+
+def submitter():
+    """ the current submitter (by default, `Direct`)
+    """
+    return _SUBMITTER['submitter']
+
+
+def set_submitter(submitter_):
+    """ set the submitter that run scripts go through
+    """
+    _SUBMITTER['submitter'] = submitter_
+
+
+def run_direct(input_writer, script_str, run_dir, submitter=None,
+               job_cache=None, monitor=None, **kwargs):
+    """ write an input file, run it through a submitter, and read the output
+    file (like `elstruct.run.direct`)
+
+    :param input_writer: an elstruct input writer
+    :type input_writer: callable
+    :param submitter: the submitter (default: the current one)
+    :param job_cache: the cache to look the output up in, and to store it in
+        if the program has to be run (default: the current one, if any; see
+        `moldr.jobcache`)
+    :param monitor: an output monitor, to kill the job early if it is
+        hopeless (see `moldr.monitor`)
+    :param kwargs: the arguments of the input writer
+    :returns: the input string and the output string (which is empty if the
+        job didn't write an output file)
+    :rtype: (str, str)
+    """
+    if submitter is None:
+        submitter = _SUBMITTER['submitter']
+    if job_cache is None:
+        job_cache = moldr.jobcache.job_cache()
+    prog = kwargs.get('prog', '')
+
+    inp_str = input_writer(**kwargs)
+    with open(os.path.join(run_dir, INPUT_NAME), 'w') as inp_obj:
+        inp_obj.write(inp_str)
+
+    # reset the monitor first, so that it doesn't report a job it killed on
+    # an earlier attempt if this one is taken from the cache
+    if monitor is not None:
+        monitor.start(run_dir)
+
+    out_pth = os.path.join(run_dir, OUTPUT_NAME)
+    out_str = (None if job_cache is None else
+               job_cache.get(inp_str, prog, script_str=script_str))
+    if out_str is not None:
+        # the same input has been run before, so use its output
+        with open(out_pth, 'w') as out_obj:
+            out_obj.write(out_str)
+        return inp_str, out_str
+
+    # an output left over from an earlier run would be mistaken for this one
+    _remove_if_exists(out_pth)
+    state = submitter.run(script_str, run_dir, monitor=monitor)
+
+    out_str = ''
+    if os.path.isfile(out_pth):
+        with open(out_pth) as out_obj:
+            out_str = out_obj.read()
+
+    # only complete outputs are cached, since a job that was cut short
+    # might not be next time
+    if (job_cache is not None and state == JobState.DONE and prog
+            and elstruct.reader.has_normal_exit_message(prog, out_str)):
+        job_cache.put(inp_str, prog, out_str, script_str=script_str)
+    return inp_str, out_str
+
+
+def write_script(script_str, run_dir, script_name=SCRIPT_NAME):
+    """ write an executable run script to a run directory
+    """
+    script_pth = os.path.join(run_dir, script_name)
+    if os.path.exists(script_pth):
+        os.remove(script_pth)
+    with open(script_pth, 'w') as script_obj:
+        script_obj.write(script_str)
+    os.chmod(script_pth, mode=os.stat(script_pth).st_mode | stat.S_IEXEC)
+
+
+def _remove_if_exists(pth):
+    try:
+        os.remove(pth)
+    except FileNotFoundError:
+        pass
+
+
+def _kill_process(pid):
+    """ kill a local job, and the programs it has started, by process id
+    """
+    proc = _PROCESSES.get(pid)
+    if proc is None:
+        return
+    if proc.poll() is None:
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        proc.wait()
+    _process_state(pid)
+
+
+def _process_state(pid):
+    """ the state of a local job, by process id
+    """
+    ret = _PROCESSES[pid].poll()
+    if ret is None:
+        return JobState.RUNNING
+    # the job has finished, so forget it
+    del _PROCESSES[pid]
+    return JobState.DONE if ret == 0 else JobState.FAILED
@@ -77,21 +77,14 @@ def run_tau(
     nsamp0 = nsamp
     inf_obj = autofile.system.info.tau_trunk(0, tors_range_dct)
     while True:
-        if tau_save_fs.trunk.file.info.exists():
-            inf_obj_s = tau_save_fs.trunk.file.info.read()
-            nsampd = inf_obj_s.nsamp
-        elif tau_save_fs.trunk.file.info.exists():
-            inf_obj_r = tau_save_fs.trunk.file.info.read()
-            nsampd = inf_obj_r.nsamp
-        else:
-            nsampd = 0
-
-        nsamp = nsamp0 - nsampd
-        if nsamp <= 0:
+        nsampd = moldr.util.claim_sample(
+            tau_save_fs, tau_run_fs, nsamp0, inf_obj)
+        if nsampd is None:
             print('Reached requested number of samples. '
                   'Tau sampling complete.')
             break
         else:
+            nsamp = nsamp0 - nsampd
             print("    New nsamp is {:d}.".format(nsamp))
 
             samp_zma, = automol.zmatrix.samples(zma, 1, tors_range_dct)
@@ -115,11 +108,6 @@ def run_tau(
                 **kwargs
             )
 
-            nsampd += 1
-            inf_obj.nsamp = nsampd
-            tau_save_fs.trunk.file.info.write(inf_obj)
-            tau_run_fs.trunk.file.info.write(inf_obj)
-
 
 def save_tau(tau_run_fs, tau_save_fs):
     """ save the tau dependent geometries that have been found so far
@@ -0,0 +1,487 @@
+""" test moldr
+"""
+import os
+import time
+import tempfile
+import functools
+import multiprocessing
+import concurrent.futures
+import pytest
+import elstruct
+import autofile
+import moldr.driver
+import moldr.engine
+import moldr.submit
+import moldr.jobcache
+import moldr.monitor
+import moldr.optsmat
+import moldr.runner
+
+PREFIX = tempfile.mkdtemp()
+print(PREFIX)
+
+JobState = moldr.submit.JobState
+
+
+def _timed_sleep(seconds):
+    start = time.time()
+    time.sleep(seconds)
+    return start, time.time()
+
+
+def _rendezvous(dir_pth, name, count, timeout=30.):
+    """ wait for `count` jobs to have checked in at a directory
+
+    :returns: did they all check in before the timeout?
+    """
+    open(os.path.join(dir_pth, name), 'w').close()
+    deadline = time.time() + timeout
+    while len(os.listdir(dir_pth)) < count:
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _settings_seen():
+    return (autofile.system.model.SETTINGS.array_sidecars,
+            moldr.monitor.monitoring())
+
+
+def _record_outcomes(stats, case, nrecords):
+    for _ in range(nrecords):
+        moldr.optsmat.record_outcome(case, 'error', {}, True, stats=stats)
+
+
+def _run_dir(name):
+    run_dir = os.path.join(PREFIX, name)
+    os.makedirs(run_dir)
+    return run_dir
+
+
+class _ManualEngine():
+    """ an engine that leaves its jobs for the test to finish
+    """
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, function, ncores=1, memory=0.):
+        """ queue a job, without running it
+        """
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        self.jobs.append((future, function, ncores, memory))
+        return future
+
+
+def test__engine():
+    """ test moldr.engine.LocalEngine
+    """
+    eng = moldr.engine.LocalEngine(ncores=2, memory=4.)
+    try:
+        # jobs that need all of the cores run one at a time
+        futures = [eng.submit(functools.partial(_timed_sleep, 0.2), ncores=2)
+                   for _ in range(3)]
+        spans = sorted(future.result(timeout=60) for future in futures)
+        assert all(end <= next_start + 0.01
+                   for (_, end), (next_start, _) in zip(spans, spans[1:]))
+
+        # and so do jobs that need most of the memory
+        futures = [eng.submit(functools.partial(_timed_sleep, 0.2),
+                              memory=3.)
+                   for _ in range(2)]
+        (_, end), (next_start, _) = sorted(
+            future.result(timeout=60) for future in futures)
+        assert end <= next_start + 0.01
+
+        # jobs that fit run at the same time
+        meet_dir = _run_dir('engine_meet')
+        futures = [eng.submit(functools.partial(_rendezvous, meet_dir,
+                                                str(idx), 2),
+                              memory=1.)
+                   for idx in range(2)]
+        assert all(future.result(timeout=60) for future in futures)
+
+        # jobs start in the order they were submitted, so a small job
+        # doesn't get ahead of a big one that is waiting for cores
+        futures = [eng.submit(functools.partial(_timed_sleep, 0.5)),
+                   eng.submit(functools.partial(_timed_sleep, 0.), ncores=2),
+                   eng.submit(functools.partial(_timed_sleep, 0.))]
+        (_, end1), (start2, _), (start3, _) = [
+            future.result(timeout=60) for future in futures]
+        assert end1 <= start2 + 0.01
+        assert start2 <= start3 + 0.01
+
+        # jobs run with the settings from when they were submitted
+        autofile.system.model.set_array_sidecars(True)
+        moldr.monitor.set_monitoring(True)
+        try:
+            future = eng.submit(_settings_seen)
+        finally:
+            autofile.system.model.set_array_sidecars(False)
+            moldr.monitor.set_monitoring(False)
+        assert future.result(timeout=60) == (True, True)
+        assert eng.submit(_settings_seen).result(timeout=60) == (False, False)
+
+        # a job that asks for more than the node has gets the whole node
+        future = eng.submit(functools.partial(_timed_sleep, 0.), ncores=8,
+                            memory=100.)
+        assert future.result(timeout=60)
+
+        # exceptions are passed on
+        future = eng.submit(functools.partial(_timed_sleep, 'x'))
+        with pytest.raises(TypeError):
+            future.result(timeout=60)
+    finally:
+        eng.shutdown()
+
+
+def test__engine__job_resources():
+    """ test moldr.engine.job_resources
+    """
+    kwargs = {'memory': 20, 'machine_options': ['%NProcShared=10']}
+    assert moldr.engine.job_resources('', kwargs) == (10, 20.)
+    assert moldr.engine.job_resources('molpro -n 4 run.inp', {}) == (4, 0.)
+    assert moldr.engine.job_resources(
+        'molpro -n 4 run.inp', kwargs, submitter=moldr.submit.Direct()
+    ) == (10, 20.)
+
+    # Molpro takes the memory per process
+    assert moldr.engine.job_resources(
+        'molpro -n 4 run.inp', {'memory': 5}, prog='molpro2015') == (4, 20.)
+
+    # batch jobs don't take up this node
+    assert moldr.engine.job_resources(
+        'molpro -n 4 run.inp', kwargs, submitter=moldr.submit.slurm()
+    ) == (1, 0.)
+
+
+def test__driver__submit_job():
+    """ test moldr.driver.submit_job
+    """
+    prefix = _run_dir('submit_job')
+    run_fs = autofile.fs.run(prefix)
+    job = elstruct.Job.ENERGY
+    geom = (('H', (0., 0., 0.)), ('H', (0., 0., 1.4)))
+    spc_info = ('InChI=1S/H2/h1H', 0, 1)
+    thy_level = ['molpro2015', 'hf', 'sto-3g', 'RR']
+    engine = _ManualEngine()
+
+    # the job is submitted with the resources it needs, and recorded as
+    # running until it finishes
+    future = moldr.driver.submit_job(
+        job, 'molpro -n 4 run.inp', run_fs, geom, spc_info, thy_level,
+        engine=engine, memory=5)
+    job_future, _, ncores, memory = engine.jobs[-1]
+    assert (ncores, memory) == (4, 20.)
+    assert run_fs.leaf.file.info.read([job]).status == (
+        autofile.system.RunStatus.RUNNING)
+    assert not future.done()
+
+    # a job that fails is recorded as failed
+    job_future.set_exception(RuntimeError('node lost'))
+    with pytest.raises(RuntimeError):
+        future.result(timeout=1)
+    assert run_fs.leaf.file.info.read([job]).status == (
+        autofile.system.RunStatus.FAILURE)
+
+    # a job that was run before isn't submitted again
+    run_fs.leaf.file.info.write(
+        autofile.system.info.run(
+            job=job, prog=thy_level[0], version='', method=thy_level[1],
+            basis=thy_level[2], status=autofile.system.RunStatus.SUCCESS),
+        [job])
+    assert moldr.driver.submit_job(
+        job, 'molpro -n 4 run.inp', run_fs, geom, spc_info, thy_level,
+        engine=engine).result(timeout=1) is None
+
+    # the future is resolved even if the failure can't be recorded
+    future = moldr.driver.submit_job(
+        job, 'molpro -n 4 run.inp', run_fs, geom, spc_info, thy_level,
+        engine=engine, overwrite=True)
+    job_future, _, _, _ = engine.jobs[-1]
+
+    def _fail(*_):
+        raise OSError('disk full')
+
+    run_fs.leaf.file.info.write = _fail
+    job_future.set_exception(RuntimeError('node lost'))
+    with pytest.raises(RuntimeError):
+        future.result(timeout=1)
+
+
+def test__submit():
+    """ test moldr.submit.Direct and moldr.submit.FakeScheduler
+    """
+    run_dir = _run_dir('submit')
+
+    direct = moldr.submit.Direct()
+    assert direct.run('#!/bin/sh\necho ok > run.out\n', run_dir) == (
+        JobState.DONE)
+    assert direct.run('#!/bin/sh\nexit 3\n', run_dir) == JobState.FAILED
+
+    fake = moldr.submit.FakeScheduler(delay=(0., 0.05), failure_rate=0.5,
+                                      seed=1)
+    states = [fake.run('#!/bin/sh\ntrue\n', run_dir) for _ in range(10)]
+    assert set(states) == {JobState.DONE, JobState.FAILED}
+
+    # finished jobs are forgotten
+    assert not moldr.submit._PROCESSES
+    assert not moldr.submit._FAKE_JOBS
+
+
+def test__submit__batch_scheduler():
+    """ test moldr.submit.BatchScheduler
+    """
+    run_dir = _run_dir('batch_scheduler')
+    queue_dir = _run_dir('batch_scheduler_queue')
+    state_dct = {'R': JobState.RUNNING, 'C': JobState.DONE,
+                 'F': JobState.FAILED}
+
+    def _set_state(name, job_id, state):
+        with open(os.path.join(queue_dir, name + job_id), 'w') as file_obj:
+            file_obj.write(state)
+
+    batch = moldr.submit.BatchScheduler(
+        'echo 5', 'cat ' + os.path.join(queue_dir, 'q{job_id}'), state_dct,
+        history_command='cat ' + os.path.join(queue_dir, 'h{job_id}'),
+        poll_interval=1., max_poll_failures=3)
+    assert not batch.can_kill()
+
+    # while the queue can't be reached, the job is taken to be running, and
+    # polled less and less often
+    assert batch.poll('5') == JobState.RUNNING
+    assert batch.poll('5') == JobState.RUNNING
+    assert batch.poll_delay('5') == 4.
+    _set_state('q', '5', 'R')
+    assert batch.poll('5') == JobState.RUNNING
+    assert batch.poll_delay('5') == 1.
+
+    # once the job has left the queue, its state comes from its history
+    os.remove(os.path.join(queue_dir, 'q5'))
+    _set_state('h', '5', 'F')
+    assert batch.poll('5') == JobState.FAILED
+
+    # the scheduler gives up on jobs it can't find for too long
+    with pytest.raises(RuntimeError):
+        for _ in range(4):
+            batch.poll('6')
+
+    # without a history, a job the queue doesn't list has finished
+    assert moldr.submit.BatchScheduler(
+        'echo 5', 'true', {}).poll('5') == JobState.DONE
+    assert moldr.submit.BatchScheduler(
+        'echo 5', 'false', {}).poll('5') == JobState.RUNNING
+
+    # a queue without a cancel command runs jobs to the end, even if they
+    # are monitored
+    batch = moldr.submit.BatchScheduler('sh {script}', 'true', {},
+                                        poll_interval=0.01)
+    monitor = moldr.monitor.OutputMonitor(
+        fatal_patterns=(('FATAL', 1),), interval=0.)
+    script_str = '#!/bin/sh\necho FATAL > run.out\necho 7\n'
+    assert batch.run(script_str, run_dir, monitor=monitor) == JobState.DONE
+    assert batch.script('#!/bin/sh\necho 7\n') == '#!/bin/sh\necho 7\n'
+    assert moldr.submit.BatchScheduler(
+        'echo 5', 'true', {}, header='#SBATCH -t 1'
+    ).script('#!/bin/sh\necho 7\n') == '#!/bin/sh\n#SBATCH -t 1\necho 7\n'
+
+
+def test__monitor():
+    """ test moldr.monitor
+    """
+    # hopeless jobs are killed
+    for submitter in (moldr.submit.Direct(),
+                      moldr.submit.FakeScheduler(delay=(0., 0.05))):
+        run_dir = _run_dir('monitor_{}'.format(type(submitter).__name__))
+        monitor = moldr.monitor.OutputMonitor(
+            fatal_patterns=(('FATAL', 1),), interval=0.)
+        script_str = '#!/bin/sh\necho FATAL > run.out\nsleep 60\n'
+        start = time.time()
+        assert submitter.run(script_str, run_dir, monitor=monitor) == (
+            JobState.FAILED)
+        assert time.time() - start < 30.
+        assert 'FATAL' in monitor.reason
+    assert not moldr.submit._PROCESSES
+    assert not moldr.submit._FAKE_JOBS
+
+    # rising energies only make optimizations hopeless, not saddle-point
+    # searches
+    run_dir = _run_dir('monitor_energy')
+    with open(os.path.join(run_dir, 'run.out'), 'w') as file_obj:
+        file_obj.write(''.join(' SCF Done:  E(RHF) =  -10.{:d}\n'.format(ene)
+                               for ene in range(9, 0, -1)))
+    opt_monitor = moldr.monitor.output_monitor('gaussian09',
+                                               optimization=True)
+    sadpt_monitor = moldr.monitor.output_monitor('gaussian09',
+                                                 optimization=False)
+    for monitor in (opt_monitor, sadpt_monitor):
+        monitor.interval = 0.
+        monitor.max_rising_cycles = 5
+        monitor.start(run_dir)
+    assert opt_monitor.check() is not None
+    assert sadpt_monitor.check() is None
+    assert moldr.monitor.output_monitor('psi4') is None
+
+
+def test__runner__monitor():
+    """ test output monitoring in moldr.runner
+    """
+    prefix = _run_dir('runner')
+    script_str = ('#!/bin/sh\n'
+                  + 'echo " Convergence criterion not met" >> run.out\n' * 3
+                  + 'sleep 1\necho done >> run.out\n')
+    run_kwargs = {'geom': None, 'chg': 0, 'mul': 1, 'method': 'hf',
+                  'basis': 'sto-3g', 'prog': 'gaussian09',
+                  'submitter': moldr.submit.Direct()}
+
+    # by default, jobs aren't monitored, so they run to the end
+    assert not moldr.monitor.monitoring()
+    _, out_str = moldr.runner.options_matrix_run(
+        lambda **_: 'inp', script_str, prefix, **run_kwargs)
+    assert out_str.endswith('done\n')
+
+    # a monitor kills them as soon as they are hopeless
+    monitor = moldr.monitor.output_monitor('gaussian09')
+    monitor.interval = 0.
+    _, out_str = moldr.runner.options_matrix_run(
+        lambda **_: 'inp', script_str, prefix, monitor=monitor, **run_kwargs)
+    assert 'done' not in out_str
+    assert monitor.reason is not None
+
+
+def test__submit__run_direct():
+    """ test moldr.submit.run_direct
+    """
+    run_dir = _run_dir('run_direct')
+    job_cache = moldr.jobcache.JobCache(os.path.join(PREFIX, 'run_cache'))
+    script_str = '#!/bin/sh\necho ran > run.out\n'
+    job_cache.put('inp', 'molpro2015', 'cached\n', script_str=script_str,
+                  version='2015.1')
+
+    # a cached output is used without running the job, and a monitor that
+    # killed an earlier attempt is reset
+    monitor = moldr.monitor.output_monitor('molpro2015')
+    monitor.reason = 'killed before'
+    assert moldr.submit.run_direct(
+        lambda **_: 'inp', script_str, run_dir,
+        submitter=moldr.submit.Direct(), job_cache=job_cache,
+        monitor=monitor, prog='molpro2015') == ('inp', 'cached\n')
+    assert monitor.reason is None
+
+    # an output from an earlier run isn't taken for this one
+    assert moldr.submit.run_direct(
+        lambda **_: 'other inp', '#!/bin/sh\nexit 1\n', run_dir,
+        submitter=moldr.submit.Direct(), job_cache=job_cache,
+        prog='molpro2015') == ('other inp', '')
+
+
+def test__jobcache():
+    """ test moldr.jobcache.JobCache
+    """
+    job_cache = moldr.jobcache.JobCache(os.path.join(PREFIX, 'cache'),
+                                        max_size=20)
+
+    # inputs are matched regardless of resources and whitespace
+    job_cache.put('%NProcShared=1\n\nhf/sto-3g\ngeom a\n', 'g09', 'output a',
+                  version='')
+    assert job_cache.get(
+        '%NProcShared=8\n%mem=4GB\nhf/sto-3g  \ngeom a\n\n', 'g09'
+    ) == 'output a'
+    assert job_cache.get('hf/sto-3g\ngeom a\n', 'molpro2015') is None
+    assert job_cache.get('hf/sto-3g\ngeom b\n', 'g09') is None
+
+    # and so are scripts, regardless of the cores they ask for, but not
+    # other scripts or program versions
+    job_cache.put('hf/sto-3g\ngeom a\n', 'molpro2015', 'output m',
+                  script_str='molpro -n 4 run.inp', version='2015.1')
+    assert job_cache.program_version(
+        'molpro2015', 'molpro -n 8 run.inp') == '2015.1'
+    assert job_cache.get('hf/sto-3g\ngeom a\n', 'molpro2015',
+                         script_str='molpro -n 8 run.inp') == 'output m'
+    assert job_cache.get('hf/sto-3g\ngeom a\n', 'molpro2015',
+                         script_str='molpro2 -n 8 run.inp') is None
+    assert job_cache.get('hf/sto-3g\ngeom a\n', 'molpro2015',
+                         script_str='molpro -n 8 run.inp',
+                         version='2015.2') is None
+    job_cache.evict(0)
+    assert job_cache.size() == 0
+
+    # the least recently used outputs are evicted
+    job_cache.put('%NProcShared=1\n\nhf/sto-3g\ngeom a\n', 'g09', 'output a',
+                  version='')
+    job_cache.put('hf/sto-3g\ngeom b\n', 'g09', 'output b', version='')
+    for dir_pth, _, file_names in os.walk(job_cache.path):
+        for file_name in file_names:
+            os.utime(os.path.join(dir_pth, file_name), (1000., 1000.))
+    assert job_cache.get('hf/sto-3g\ngeom a\n', 'g09') == 'output a'
+    job_cache.put('hf/sto-3g\ngeom c\n', 'g09', 'output c', version='')
+    assert job_cache.size() <= 20
+    # the running total agrees with a scan
+    with open(os.path.join(job_cache.path,
+                           moldr.jobcache.SIZE_FILE_NAME)) as file_obj:
+        assert int(file_obj.read()) == job_cache.size()
+    assert job_cache.get('hf/sto-3g\ngeom a\n', 'g09') == 'output a'
+    assert job_cache.get('hf/sto-3g\ngeom b\n', 'g09') is None
+    assert job_cache.get('hf/sto-3g\ngeom c\n', 'g09') == 'output c'
+
+
+def test__optsmat():
+    """ test moldr.optsmat
+    """
+    stats = moldr.optsmat.OptionsStats(
+        os.path.join(PREFIX, 'optsmat', 'stats.json'))
+    opts_mat = [[{}, {'job_options': ('calcfc',)},
+                 {'job_options': ('calcall',)}]]
+    ref_opts_mat = tuple(map(tuple, opts_mat))
+    case = ('gaussian09', 'b3lyp',
+            moldr.optsmat.molecule_features(2, saddle=True))
+    assert case[2] == ('radical', 'saddle')
+
+    # without outcomes, the order is kept
+    assert moldr.optsmat.learned(opts_mat, ['error'], case) is opts_mat
+    assert moldr.optsmat.learned(
+        opts_mat, ['error'], case, stats=stats) == ref_opts_mat
+
+    # options are ranked by how often they fixed the error, and options
+    # that hardly ever did are dropped
+    for _ in range(30):
+        moldr.optsmat.record_outcome(case, 'error', {}, False, stats=stats)
+    for idx in range(6):
+        moldr.optsmat.record_outcome(
+            case, 'error', {'job_options': ('calcfc',)}, idx > 0,
+            stats=stats)
+    assert moldr.optsmat.learned(
+        opts_mat, ['error'], case, stats=stats) == (
+            ({'job_options': ('calcfc',)}, {'job_options': ('calcall',)}),)
+
+    # other cases are kept apart
+    assert moldr.optsmat.learned(
+        opts_mat, ['error'], ('gaussian09', 'b3lyp', ()), stats=stats
+    ) == ref_opts_mat
+
+    # outcomes recorded by several processes at once are all kept
+    ctx = multiprocessing.get_context('fork')
+    case = ('molpro2015', 'caspt2', ())
+    procs = [ctx.Process(target=_record_outcomes, args=(stats, case, 5))
+             for _ in range(4)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    assert stats.counts(case, 'error') == {
+        moldr.optsmat._options_key({}): [20, 20]}
+
+
+if __name__ == '__main__':
+    test__engine()
+    test__engine__job_resources()
+    test__driver__submit_job()
+    test__submit()
+    test__submit__batch_scheduler()
+    test__monitor()
+    test__runner__monitor()
+    test__submit__run_direct()
+    test__jobcache()
+    test__optsmat()
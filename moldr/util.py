@@ -1,12 +1,12 @@
 """ utilites
 """
 import os
-import stat
-import subprocess
 import warnings
+import numpy
 import autofile
 import automol
 import elstruct
+import moldr.submit
 
 
 def run_qchem_par(prog, method, saddle=False):
@@ -255,11 +255,15 @@ def geometry_dictionary(geom_path):
 
 def min_energy_conformer_locators(cnf_save_fs):
     """ locators for minimum energy conformer """
+    min_cnf_locs = autofile.system.index.min_value_locators(
+        cnf_save_fs.leaf.file.energy)
+    if min_cnf_locs is not None:
+        return min_cnf_locs
+
     cnf_locs_lst = cnf_save_fs.leaf.existing()
     if cnf_locs_lst:
-        cnf_enes = [cnf_save_fs.leaf.file.energy.read(locs)
-                    for locs in cnf_locs_lst]
-        min_cnf_locs = cnf_locs_lst[cnf_enes.index(min(cnf_enes))]
+        cnf_enes = cnf_save_fs.leaf.file.energy.read_many(cnf_locs_lst)
+        min_cnf_locs = cnf_locs_lst[int(numpy.argmin(cnf_enes))]
     else:
         min_cnf_locs = None
     return min_cnf_locs
@@ -306,33 +310,45 @@ def min_dist_conformer_zma_geo(dist_coords, cnf_save_fs):
 def locs_sort(save_fs):
     """ sort trajectory file according to energies
     """
+    sorted_locs = autofile.system.index.sorted_locators(
+        save_fs.leaf.file.energy)
+    if sorted_locs:
+        return sorted_locs
+
     locs_lst = save_fs.leaf.existing()
     if locs_lst:
-        enes = [save_fs.leaf.file.energy.read(locs)
-                for locs in locs_lst]
-        sorted_locs = []
-        for _, loc in sorted(zip(enes, locs_lst), key=lambda x: x[0]):
-            sorted_locs.append(loc)
+        enes = save_fs.leaf.file.energy.read_many(locs_lst)
+        sorted_locs = [locs_lst[idx]
+                       for idx in numpy.argsort(enes, kind='stable')]
     return sorted_locs
 
 
 def traj_sort(save_fs):
     """ sort trajectory file according to energies
+
+    Geometries are kept in an append-only store next to the trajectory
+    file, so only the geometries of leaves that are new, or whose energy has
+    changed, are read, and the trajectory file is only rewritten once it has
+    gone stale.
     """
     locs_lst = save_fs.leaf.existing()
     if locs_lst:
-        enes = [save_fs.leaf.file.energy.read(locs)
-                for locs in locs_lst]
-        geos = [save_fs.leaf.file.geometry.read(locs)
-                for locs in locs_lst]
-        traj = []
-        traj_sort_data = sorted(zip(enes, geos, locs_lst), key=lambda x: x[0])
-        for ene, geo, locs in traj_sort_data:
-            comment = 'energy: {0:>15.10f} \t {1}'.format(ene, locs[0])
-            traj.append((comment, geo))
         traj_path = save_fs.trunk.file.trajectory.path()
-        print("Updating trajectory file at {}".format(traj_path))
-        save_fs.trunk.file.trajectory.write(traj)
+        traj_store = autofile.system.traj.TrajectoryStore(traj_path)
+        enes = save_fs.leaf.file.energy.read_many(locs_lst)
+        upd_locs_lst = traj_store.changed(locs_lst, enes)
+        if upd_locs_lst:
+            ene_dct = dict(zip(map(tuple, locs_lst), enes))
+            upd_enes = [ene_dct[tuple(locs)] for locs in upd_locs_lst]
+            geos = save_fs.leaf.file.geometry.read_many(upd_locs_lst)
+            # only the entries that are new, or have changed, are appended
+            traj_store.update(
+                (ene, locs,
+                 ('energy: {0:>15.10f} \t {1}'.format(ene, locs[0]), geo))
+                for ene, geo, locs in zip(upd_enes, geos, upd_locs_lst))
+        if traj_store.is_stale(locs_lst):
+            print("Updating trajectory file at {}".format(traj_path))
+            traj_store.write_sorted(locs_lst)
 
 
 def nsamp_init(nsamp_par, ntaudof):
@@ -345,6 +361,43 @@ def nsamp_init(nsamp_par, ntaudof):
     return nsamp
 
 
+def claim_sample(save_fs, run_fs, nsamp0, inf_obj):
+    """ atomically claim the next of `nsamp0` samples for a sampling trunk
+
+    The sample count is read from the save trunk info (or the run trunk info,
+    if nothing has been saved yet), incremented, and written back to both
+    under a lock, so that concurrent workers on the same trunk never take the
+    same sample or overshoot the requested number. Samples are claimed before
+    they are run, so one that crashes isn't retried.
+
+    :param inf_obj: the trunk information object to record the count in
+    :returns: the number of samples taken before this one, or None if all of
+        them have been taken
+    :rtype: int
+    """
+    save_fs.trunk.create()
+    run_fs.trunk.create()
+    with save_fs.trunk.file.info.lock():
+        # another worker may have claimed a sample within the timestamp
+        # resolution of the read cache, so read the counts from disk
+        save_fs.trunk.file.info.invalidate()
+        run_fs.trunk.file.info.invalidate()
+        if save_fs.trunk.file.info.exists():
+            nsampd = save_fs.trunk.file.info.read().nsamp
+        elif run_fs.trunk.file.info.exists():
+            nsampd = run_fs.trunk.file.info.read().nsamp
+        else:
+            nsampd = 0
+
+        if nsampd >= nsamp0:
+            return None
+
+        inf_obj.nsamp = nsampd + 1
+        save_fs.trunk.file.info.write(inf_obj)
+        run_fs.trunk.file.info.write(inf_obj)
+    return nsampd
+
+
 def reaction_energy(save_prefix, rxn_ich, rxn_chg, rxn_mul, thy_level):
     """ reaction energy """
     rct_ichs, prd_ichs = rxn_ich
@@ -410,41 +463,15 @@ def ts_mul_from_reaction_muls(rcts, prds, spc_dct):
     return ts_mul_low, ts_mul_high, rad_rad
 
 
-def run_script(script_str, run_dir):
+def run_script(script_str, run_dir, submitter=None):
     """ run a program from a script
-    """
-
-    script_name = 'build.sh'
-    with _EnterDirectory(run_dir):
-        # write the submit script to the run directory
-        try:
-            os.remove('build.sh')
-            with open(script_name, 'w') as script_obj:
-                script_obj.write(script_str)
-        except:
-            with open(script_name, 'w') as script_obj:
-                script_obj.write(script_str)
-
-        # make the script executable
-        os.chmod(script_name, mode=os.stat(script_name).st_mode | stat.S_IEXEC)
-
-        # call the program
-        try:
-            subprocess.check_call('./{:s}'.format(script_name))
-        except subprocess.CalledProcessError as err:
-            # if the program failed, continue with a warning
-            warnings.warn("run failed in {}".format(run_dir))
 
-
-class _EnterDirectory():
-
-    def __init__(self, directory):
-        assert os.path.isdir(directory)
-        self.directory = directory
-        self.working_directory = os.getcwd()
-
-    def __enter__(self):
-        os.chdir(self.directory)
-
-    def __exit__(self, _exc_type, _exc_value, _traceback):
-        os.chdir(self.working_directory)
+    :param submitter: the submitter to run it through (default: the current
+        one; see `moldr.submit`)
+    """
+    if submitter is None:
+        submitter = moldr.submit.submitter()
+    state = submitter.run(script_str, run_dir, script_name='build.sh')
+    if state != moldr.submit.JobState.DONE:
+        # if the program failed, continue with a warning
+        warnings.warn("run failed in {}".format(run_dir))